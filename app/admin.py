@@ -0,0 +1,98 @@
+# Import necessary libraries
+import plotly.express as px      # Interactive data visualization
+import streamlit as st           # Web app framework for data apps
+from bgp import instrument       # Whether payload sizes are measured
+from bgp import metrics          # Performance metrics recorded by the other pages
+
+# Bytes per mebibyte, for display
+MIB = 1024 * 1024
+
+
+# Size in MiB for display ("-" when the platform doesn't report it)
+def mebibytes(size: int | None) -> str:
+    return "-" if size is None else f"{size / MIB:,.0f} MiB"
+
+
+#################################################
+### USER INTERFACE SETUP
+#################################################
+# Everything shown here is recorded in this process since its start (or the last
+# reset) by every session: stage timings and payloads by the pages, cache lookups
+# and dataset sizes by the data layer (see bgp/metrics.py)
+st.title("⏱️ Performance")
+st.text("Stage timings, cache lookups, memory and payload sizes of the dashboard process")
+
+admin_columns = st.columns([1, 1, 4])
+with admin_columns[0]:
+    st.download_button("Download metrics.prom", metrics.prometheus_text(), "metrics.prom", "text/plain")
+with admin_columns[1]:
+    if st.button("Reset metrics"):
+        metrics.reset()
+        st.rerun()
+
+timings_df = metrics.timings_frame()
+caches_df = metrics.caches_frame()
+memory_df = metrics.memory_frame()
+payloads_df = metrics.payloads_frame()
+
+process_metrics = st.columns(4)
+with process_metrics[0]:
+    with st.container(border=True):
+        st.metric("Resident Memory", mebibytes(metrics.resident_bytes()))
+with process_metrics[1]:
+    with st.container(border=True):
+        st.metric("Peak Resident Memory", mebibytes(metrics.peak_resident_bytes()))
+with process_metrics[2]:
+    with st.container(border=True):
+        requests = int(caches_df["requests"].sum())
+        st.metric("Cache Hit Ratio", f"{int(caches_df['hits'].sum()) / requests:.1%}" if requests else "-")
+with process_metrics[3]:
+    with st.container(border=True):
+        st.metric("Payload Sent", f"{int(payloads_df['total_bytes'].sum()) / MIB:,.1f} MiB")
+
+#################################################
+### STAGE TIMINGS
+#################################################
+st.subheader("Wall Time per Stage")
+if timings_df.empty:
+    st.caption("Nothing recorded yet; open the other pages first.")
+else:
+    fig = px.bar(timings_df, x="page", y="total_seconds", color="stage",
+                 category_orders={"stage": list(metrics.STAGES)}, hover_data=["count", "mean_seconds", "max_seconds"],
+                 title="Total Wall Time per Page and Stage")
+    fig.update_layout(xaxis_title="Page", yaxis_title="Seconds")
+    st.plotly_chart(fig)
+    st.dataframe(timings_df, hide_index=True)
+
+#################################################
+### CACHES
+#################################################
+st.subheader("Data Caches")
+st.text("Calls of the cached loaders in bgp/data.py; a miss loads or computes the entry")
+st.dataframe(caches_df, hide_index=True, column_config={"hit_ratio": st.column_config.NumberColumn(format="%.3f")})
+
+#################################################
+### MEMORY
+#################################################
+st.subheader("Memory per Dataset")
+st.text("Frame and derived views (packed prefixes, indexes, cached filters) of every loaded dataset")
+memory_df["MiB"] = memory_df["bytes"] / MIB
+st.dataframe(memory_df, hide_index=True, column_config={"MiB": st.column_config.NumberColumn(format="%.1f")})
+
+#################################################
+### PAYLOADS
+#################################################
+st.subheader("Payload per Chart and Table")
+if not instrument.MEASURE_PAYLOADS:
+    st.caption("Payload sizes are not measured; start the app with BGP_MEASURE_PAYLOADS=1 to record them.")
+elif payloads_df.empty:
+    st.caption("Nothing recorded yet; open the other pages first.")
+else:
+    fig = px.bar(payloads_df.sort_values("last_bytes", ascending=False), x="element", y="last_bytes", color="page",
+                 title="Bytes Sent for the Latest Render")
+    fig.update_layout(xaxis_title="Chart or Table", yaxis_title="Bytes")
+    st.plotly_chart(fig)
+    st.dataframe(payloads_df, hide_index=True)
+
+with st.expander("Prometheus Export"):
+    st.code(metrics.prometheus_text(), language="text")
@@ -1,10 +1,21 @@
+import time
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
+from bgp import cache, data, density, instrument, metrics
+
+# Name of the page in the performance metrics (see bgp/metrics.py)
+PAGE = "ai_implementation"
 
 def load_ai_results():
-    data = pd.read_csv("data/ai_results.csv")
-    return data
+    # Routes scored in the app by the saved model (see bgp/anomaly.py), computed
+    # once per table version and model and shared by every session
+    return data.load_anomaly_results()
+
+# CSV of the results, built once per table version and model; the encoded bytes are
+# shared by every session rather than copied out of st.cache_data per rerun
+@st.cache_resource(max_entries=2, show_spinner=False)
+def results_csv(table_digest: str, model_digest: str) -> bytes:
+    return load_ai_results().frame.to_csv(index=False).encode()
 
 # Title of the app
 st.title("Anomaly Detection in Network Data")
@@ -42,55 +53,113 @@ with st.expander("See Approach to Solution"):
       - **Color Coding**: Anomalies were highlighted in red, and normal data points were shown in blue.
 
     ### 5. Results
-    The detected anomalies were saved to a CSV file for further analysis and reporting. This systematic approach ensures comprehensive analysis and accurate detection of anomalies in the network data.
+    The model is trained inside the app on the current routing table, on request. It is saved next to the data and reused when routes are added, so new routes are scored without retraining. This systematic approach ensures comprehensive analysis and accurate detection of anomalies in the network data.
 
     This comprehensive approach ensures accurate detection and effective visualization of anomalies in network routing data, providing valuable insights for maintaining and improving network performance.
     """)
 
 
-# Read the CSV file into a DataFrame
-df = load_ai_results()
+# Train the model on the current routing table (the model is only ever trained
+# here or with python -m bgp.anomaly, never while loading the page)
+def train_model() -> None:
+    with st.spinner("Training anomaly model..."):
+        trained = data.train_anomaly_model()
+    if trained is None:
+        st.info("Fewer than two routes of the saved transit providers have a Metric, so there is nothing to train "
+                "the anomaly model on. Select the transit providers on the analytics page, or load more routes.")
+    else:
+        st.rerun()
+
+# Score the current routing table
+with metrics.timed(PAGE, metrics.LOAD):
+    model = data.load_anomaly_model()
+    results = load_ai_results()
+
+if model is None:
+    st.info("No anomaly model has been trained for this routing table yet.")
+    if st.button("Train model"):
+        train_model()
+    st.stop()
+
+model_columns = st.columns([4, 1])
+with model_columns[0]:
+    if model.digest == data.load_route_dataset().digest:
+        st.caption("Model trained on the current routing table")
+    else:
+        st.caption("Model trained on an earlier version of the routing table; new routes are scored with it as is")
+    if set(model.transit_as) != set(data.load_transit_asns()):
+        st.caption("Model trained for another set of transit providers; retrain it to use the saved set")
+with model_columns[1]:
+    if st.button("Retrain model"):
+        train_model()
 
 st.write("Data Cleaning:")
 st.write("\t1. Only Data with IP prefixes from transit providers is considered")
 st.write("\t2. Data with null Metric values where removed")
 
-st.write(f" Total Number of prefixes after data cleaning: *{len(df)}*")
+st.write(f" Total Number of prefixes after data cleaning: *{len(results)}*")
 
-normal_prefixes = df[df['Anomaly'] == 'Normal']
+# Row slices of the shared results (normal routes first), not per-session copies
+with metrics.timed(PAGE, metrics.FILTER):
+    normal_prefixes = results.normal
+    anomalous_prefixes = results.anomalous
 st.write(f" Normal Prefixes: *{len(normal_prefixes)}*")
 
-anomalous_prefixes = df[df['Anomaly'] == 'Anomaly']
 st.write(f" Anomalous Prefixes: *{len(anomalous_prefixes)}*")
 
 st.subheader("_Results_")
 
-# Create an interactive scatter plot
-fig = px.scatter(df, x='hop_count', y='LocPrf', color='Anomaly',
-                 color_discrete_map={'Anomaly': 'red', 'Normal': 'blue'},
-                 labels={'Next Hop': 'Next Hop', 'Metric': 'Metric', 'LocPrf': 'LocPrf', 'hop_count': 'Hop Count', 'Anomaly': 'Data Type'},
-                 title='Anomaly vs. Normal Data Points')
-
-# Update legend titles
-fig.update_layout(legend_title_text='Data Type')
-
-# Display the Plotly figure in Streamlit
-st.plotly_chart(fig)
-
+# Normal routes are aggregated per coordinate (or binned) on the server and
+# anomalies are drawn one by one, both with WebGL, so the plots stay small and
+# fast however many routes there are (see bgp/density.py). Past
+# MAX_INDIVIDUAL_POINTS anomalies, they are aggregated like the normal routes.
+# Returns the figure and its number of markers.
+def anomaly_scatter(x: str, y: str, x_label: str, y_label: str) -> tuple[go.Figure, int]:
+    with metrics.timed(PAGE, metrics.AGGREGATE):
+        normal_points = results.normal_points(x, y)
+        individual = len(anomalous_prefixes) <= density.MAX_INDIVIDUAL_POINTS
+        anomaly_points = anomalous_prefixes if individual else results.anomaly_points(x, y)
+    start = time.perf_counter()
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=normal_points['x'], y=normal_points['y'], mode='markers', name='Normal',
+        marker=dict(color='blue', size=density.marker_sizes(normal_points['count']), opacity=0.6),
+        customdata=normal_points['count'],
+        hovertemplate=f"{x_label}: %{{x}}<br>{y_label}: %{{y}}<br>Prefixes: %{{customdata:,}}<extra></extra>",
+    ))
+    if individual:
+        fig.add_trace(go.Scattergl(
+            x=anomaly_points[x].astype('Float64'), y=anomaly_points[y].astype('Float64'), mode='markers',
+            name='Anomaly', marker=dict(color='red', size=8),
+            customdata=anomaly_points['Network'],
+            hovertemplate=f"%{{customdata}}<br>{x_label}: %{{x}}<br>{y_label}: %{{y}}<extra></extra>",
+        ))
+    else:
+        fig.add_trace(go.Scattergl(
+            x=anomaly_points['x'], y=anomaly_points['y'], mode='markers', name='Anomaly',
+            marker=dict(color='red', size=density.marker_sizes(anomaly_points['count']), opacity=0.8),
+            customdata=anomaly_points['count'],
+            hovertemplate=f"{x_label}: %{{x}}<br>{y_label}: %{{y}}<br>Anomalies: %{{customdata:,}}<extra></extra>",
+        ))
+    fig.update_layout(title='Anomaly vs. Normal Data Points', xaxis_title=x_label, yaxis_title=y_label,
+                      legend_title_text='Data Type')
+    metrics.record_stage(PAGE, metrics.FIGURE, time.perf_counter() - start)
+    return fig, len(normal_points) + len(anomaly_points)
 
 # Create an interactive scatter plot
-fig = px.scatter(df, x='hop_count', y='transit_as', color='Anomaly',
-                 color_discrete_map={'Anomaly': 'red', 'Normal': 'blue'},
-                 labels={'transit_as': 'Transit AS', 'hop_count': 'Hop Count'},
-                 title='Anomaly vs. Normal Data Points')
+fig, markers = anomaly_scatter('hop_count', 'LocPrf', 'Hop Count', 'LocPrf')
+instrument.plotly_chart(PAGE, "scatter_locprf", fig)
+st.caption(f"{len(results):,} routes drawn as {markers:,} markers")
 
-# Update legend titles
-fig.update_layout(legend_title_text='Data Type')
-
-# Display the Plotly figure in Streamlit
-st.plotly_chart(fig)
+# Create an interactive scatter plot
+fig, markers = anomaly_scatter('hop_count', 'transit_as', 'Hop Count', 'Transit AS')
+instrument.plotly_chart(PAGE, "scatter_transit_as", fig)
+st.caption(f"{len(results):,} routes drawn as {markers:,} markers")
 
 st.subheader("Anomaly Detection Results - _Tabular View_ ")
 
-# Display the DataFrame
-st.dataframe(df)
+# Display the anomalous routes (the full results are downloadable)
+instrument.dataframe(PAGE, "anomalies", anomalous_prefixes)
+model_digest = cache.file_digest(data.anomaly_model_path())
+st.download_button("Download all results as CSV", results_csv(data.load_route_dataset().digest, model_digest),
+                   "ai_results.csv", "text/csv")
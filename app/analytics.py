@@ -1,20 +1,37 @@
 # Import necessary libraries
+import time                      # Formatting the live feed's update time
 import pandas as pd              # Data manipulation and analysis
 import plotly.express as px      # Interactive data visualization
 import streamlit as st           # Web app framework for data apps
 import plotly.graph_objects as go # Advanced plotting capabilities
-import io
+from bgp import cube             # Statistics cube of the drill-down
+from bgp import data             # Shared data layer used by every page
+from bgp import instrument       # Timed charts and tables
+from bgp import metrics          # Stage timings
+from bgp import prefix           # Address families of packed prefixes
+from bgp import profiler         # Column profile of the Basic Data Analysis
 
 #################################################
 ### DATA LOADING
 #################################################
-# Cached function to load data efficiently
-# @st.cache_data ensures the data is loaded only once and reused
-@st.cache_data(max_entries=5)
-def load_data():
-    # Read the CSV file containing IP prefix data
-    data = pd.read_csv("data/data.csv")
-    return data
+# The page renders from the precomputed summary of the route table (see
+# bgp/summary.py), so a rerun never scans the table itself. With a live feed
+# configured (BGP_LIVE_SOURCE, see bgp/live.py) the charts show the feed's RIB
+# instead and refresh on their own.
+
+# Seconds between refreshes of the charts when a live feed is configured
+LIVE_REFRESH_SECONDS = 1.0
+
+# Name of the page in the performance metrics (see bgp/metrics.py)
+PAGE = "analytics"
+
+# Largest number of row and of column labels of a drill-down drawn in the chart
+MAX_PIVOT_LABELS = 30
+
+# Columns choice of the drill-down without a second dimension
+NO_COLUMNS = "(none)"
+
+live_feed = data.load_live_feed()
 
 #################################################
 ### USER INTERFACE SETUP
@@ -22,133 +39,299 @@ def load_data():
 # Set the title of the Streamlit web application
 st.title("📊 BGP IP Prefixes Analytics")
 
-# Load the data
-IPV4_IPV6_df = load_data()
-
-# Separate IPv4 and IPv6 networks based on address format
-# IPv4 addresses contain dots (.)
-IPV4_df = IPV4_IPV6_df[IPV4_IPV6_df['Network'].str.contains(r'\.', regex=True)]
-# IPv6 addresses contain colons (:)
-IPV6_df = IPV4_IPV6_df[IPV4_IPV6_df['Network'].str.contains(r'\:', regex=True)]
-
-# Read transit Autonomous System (AS) numbers from a text file
-# These are specific network provider AS numbers
-with open('./data/transitASN.txt', 'r') as file:
-    transit_as_numbers = [int(line.strip()) for line in file]
-
-# Filter dataframes to include only transit provider networks
-transit_IPV4_df = IPV4_df[IPV4_df['transit_as'].isin(transit_as_numbers)]
-transit_IPV6_df = IPV6_df[IPV6_df['transit_as'].isin(transit_as_numbers)]
-
-# Calculate various prefix count metrics
-count_number_ipv4_ipv6_prefixes = len(IPV4_IPV6_df)     # Total IP prefixes
-count_number_ipv4_prefixes = len(IPV4_df)               # Total IPv4 prefixes
-count_number_ipv6_prefixes = len(IPV6_df)               # Total IPv6 prefixes
-count_number_ipv4_transit_prefixes = len(transit_IPV4_df)  # IPv4 prefixes from transit providers
-count_number_ipv6_transit_prefixes = len(transit_IPV6_df)  # IPv6 prefixes from transit providers
-
-# Total transit provider prefixes
-count_number_ipv4_ipv6_transit_prefixes = count_number_ipv4_transit_prefixes + count_number_ipv6_transit_prefixes
-
-# Create three-column layout for high-level metrics
-row_metrics = st.columns(3)
-
-# Display total number of IP prefixes in the first column
-with row_metrics[0]:
-    with st.container(border=True):
-        st.metric(
-            "Total Number of IP Prefixes",
-            f"{count_number_ipv4_ipv6_prefixes:,}",  # Format with comma separator
-        )
-
-# Display total number of IPv4 prefixes in the second column
-with row_metrics[1]:
-    with st.container(border=True):
-        st.metric(
-            "Total Number of IPV4 Prefixes",
-            f"{count_number_ipv4_prefixes:,}",  # Format with comma separator
-        )
-
-# Display total number of IPv6 prefixes in the third column
-with row_metrics[2]:
-    with st.container(border=True):
-        st.metric(
-            "Total Number of IPV6 Prefixes",
-            f"{count_number_ipv6_prefixes:,}",  # Format with comma separator
-        )
-
-# Define color scheme for visualizations
-colors = ['#FFD700', '#1E90FF']
-
-# Add descriptive text
-st.text("IP prefixes coming from transit providers versus external providers - Visualization")
-
-# Create three-column layout for pie charts
-pie_chart_metrics = st.columns(3)
-
-# First pie chart: Overall IPv4 and IPv6 transit vs non-transit prefixes
-with pie_chart_metrics[0]:
-    with st.container():
-        values = [count_number_ipv4_ipv6_transit_prefixes, count_number_ipv4_ipv6_prefixes - count_number_ipv4_ipv6_transit_prefixes]
-        fig = go.Figure(data=[go.Pie(labels=['IPV4 and IPV6 prefixes coming from transit providers', 'Other IPV4 and IPV6 prefixes'], values=values, hole=.3, marker=dict(colors=colors), showlegend=True, textinfo='value')])
-        fig.update_layout(title_text='IPV4 and IPV6', title_x=0.35, legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5))
-        st.plotly_chart(fig)
-
-# Second pie chart: IPv4 transit vs non-transit prefixes
-with pie_chart_metrics[1]:
-    with st.container():
-        values = [count_number_ipv4_transit_prefixes, count_number_ipv4_prefixes - count_number_ipv4_transit_prefixes]
-        fig = go.Figure(data=[go.Pie(labels=['IPV4 prefixes coming from transit providers', 'Other IPV4 prefixes'], values=values, hole=.3, marker=dict(colors=colors), showlegend=True, textinfo='value')])
-        fig.update_layout(title_text='IPV4', title_x=0.45, legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5))
-        st.plotly_chart(fig)
-
-# Third pie chart: IPv6 transit vs non-transit prefixes
-with pie_chart_metrics[2]:
-    with st.container():
-        values = [count_number_ipv6_transit_prefixes, count_number_ipv6_prefixes - count_number_ipv6_transit_prefixes]
-        fig = go.Figure(data=[go.Pie(labels=['IPV6 prefixes coming from transit providers', 'Other IPV6 prefixes'], values=values, hole=.3, marker=dict(colors=colors), showlegend=True, textinfo='value')])
-        fig.update_layout(title_text='IPV6', title_x=0.45, legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5))
-        st.plotly_chart(fig)
-
-# Analyze hop count distribution
-# Count the number of IP prefixes for each hop count
-hop_count_distribution = IPV4_IPV6_df['hop_count'].value_counts().sort_index()
-
-# Convert hop count distribution to a DataFrame for better visualization
-hop_count_df = hop_count_distribution.reset_index()
-hop_count_df.columns = ['No. of Hops', 'Count of IP Prefixes']
-
-# Remove the first row (likely representing 0 hops)
-hop_count_df = hop_count_df.iloc[1:, :]
-
-# Create bar chart of IP prefixes by number of hops
-fig = px.bar(hop_count_df, x='No. of Hops', y='Count of IP Prefixes',
-             labels={'No. of Hops': 'No. of Hops', 'Count of IP Prefixes': 'Count of IP Prefixes'},
-             title="Count of IP Prefixes by Number of Hops")
-st.plotly_chart(fig)
-
-# Display hop count distribution as a table
-st.subheader("Count of IP Prefixes by Number of Hops - _Tabular View_ ")
-st.table(hop_count_df)
+with metrics.timed(PAGE, metrics.LOAD):
+    # Load the summary of the data
+    route_summary = data.load_route_summary()
+
+    # Read transit Autonomous System (AS) numbers from a text file
+    # These are specific network provider AS numbers
+    saved_transit_as_numbers = data.load_transit_asns()
+
+# Editable transit set in the sidebar
+# Candidates are the saved transit ASNs plus every transit_as seen in the data,
+# the largest first; changing the selection only re-sums the summary's group table
+transit_as_prefix_counts = route_summary.transit_as_counts()
+candidate_transit_as_numbers = list(dict.fromkeys(saved_transit_as_numbers + [int(asn) for asn in transit_as_prefix_counts.index]))
+with st.sidebar:
+    st.subheader("Transit Providers")
+    transit_as_numbers = st.multiselect(
+        "Transit AS numbers",
+        candidate_transit_as_numbers,
+        default=saved_transit_as_numbers,
+        format_func=lambda asn: f"AS{asn} ({int(transit_as_prefix_counts.get(asn, 0)):,} prefixes)",
+        key="transit_as_numbers",
+    )
+    transit_set_changed = set(transit_as_numbers) != set(saved_transit_as_numbers)
+    if st.button("Save to transitASN.txt", disabled=not transit_set_changed or not transit_as_numbers):
+        data.save_transit_asns(transit_as_numbers)
+        st.toast("Transit AS numbers saved")
+    if not transit_as_numbers:
+        st.caption("Select at least one transit AS to save the set")
+
+# Charts drawn from the summary, in a fragment so the live feed can refresh them
+# every LIVE_REFRESH_SECONDS without rerunning the rest of the page
+@st.fragment(run_every=LIVE_REFRESH_SECONDS if live_feed is not None else None)
+def prefix_charts(transit_as_numbers: list[int]) -> None:
+    # The latest summary published by the live feed, or the route table's
+    if live_feed is None:
+        current_summary = route_summary
+    else:
+        current_summary, feed_stats = live_feed.published
+        if live_feed.error is not None:
+            st.error(f"Live feed {data.LIVE_SOURCE} stopped: {live_feed.error}")
+        elif not feed_stats.published_at:
+            st.info(f"Waiting for the live feed {data.LIVE_SOURCE}...")
+        else:
+            st.caption(f"🔴 Live from {data.LIVE_SOURCE} ({'connected' if feed_stats.connected else 'disconnected'}): "
+                       f"{feed_stats.updates:,} updates, {feed_stats.updates_per_second:,.0f}/s, "
+                       f"as of {time.strftime('%H:%M:%S', time.localtime(feed_stats.published_at))}")
+
+    # Count the prefixes from transit providers in each family
+    # (a sum over the per family and transit_as counts)
+    with metrics.timed(PAGE, metrics.AGGREGATE):
+        transit_ipv4_count, transit_ipv6_count = current_summary.transit_counts(transit_as_numbers)
+
+    # Calculate various prefix count metrics
+    count_number_ipv4_ipv6_prefixes = current_summary.rows                         # Total IP prefixes
+    count_number_ipv4_prefixes = current_summary.family_count(prefix.IPV4)         # Total IPv4 prefixes
+    count_number_ipv6_prefixes = current_summary.family_count(prefix.IPV6)         # Total IPv6 prefixes
+    count_number_ipv4_transit_prefixes = transit_ipv4_count  # IPv4 prefixes from transit providers
+    count_number_ipv6_transit_prefixes = transit_ipv6_count  # IPv6 prefixes from transit providers
+
+    # Total transit provider prefixes
+    count_number_ipv4_ipv6_transit_prefixes = count_number_ipv4_transit_prefixes + count_number_ipv6_transit_prefixes
+
+    # Create three-column layout for high-level metrics
+    row_metrics = st.columns(3)
+
+    # Display total number of IP prefixes in the first column
+    with row_metrics[0]:
+        with st.container(border=True):
+            st.metric(
+                "Total Number of IP Prefixes",
+                f"{count_number_ipv4_ipv6_prefixes:,}",  # Format with comma separator
+            )
+
+    # Display total number of IPv4 prefixes in the second column
+    with row_metrics[1]:
+        with st.container(border=True):
+            st.metric(
+                "Total Number of IPV4 Prefixes",
+                f"{count_number_ipv4_prefixes:,}",  # Format with comma separator
+            )
+
+    # Display total number of IPv6 prefixes in the third column
+    with row_metrics[2]:
+        with st.container(border=True):
+            st.metric(
+                "Total Number of IPV6 Prefixes",
+                f"{count_number_ipv6_prefixes:,}",  # Format with comma separator
+            )
+
+    # Define color scheme for visualizations
+    colors = ['#FFD700', '#1E90FF']
+
+    # Add descriptive text
+    st.text("IP prefixes coming from transit providers versus external providers - Visualization")
+
+    # Create three-column layout for pie charts
+    pie_chart_metrics = st.columns(3)
+
+    # First pie chart: Overall IPv4 and IPv6 transit vs non-transit prefixes
+    with pie_chart_metrics[0]:
+        with st.container():
+            values = [count_number_ipv4_ipv6_transit_prefixes, count_number_ipv4_ipv6_prefixes - count_number_ipv4_ipv6_transit_prefixes]
+            with metrics.timed(PAGE, metrics.FIGURE):
+                fig = go.Figure(data=[go.Pie(labels=['IPV4 and IPV6 prefixes coming from transit providers', 'Other IPV4 and IPV6 prefixes'], values=values, hole=.3, marker=dict(colors=colors), showlegend=True, textinfo='value')])
+                fig.update_layout(title_text='IPV4 and IPV6', title_x=0.35, legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5))
+            instrument.plotly_chart(PAGE, "transit_pie_all", fig)
+
+    # Second pie chart: IPv4 transit vs non-transit prefixes
+    with pie_chart_metrics[1]:
+        with st.container():
+            values = [count_number_ipv4_transit_prefixes, count_number_ipv4_prefixes - count_number_ipv4_transit_prefixes]
+            with metrics.timed(PAGE, metrics.FIGURE):
+                fig = go.Figure(data=[go.Pie(labels=['IPV4 prefixes coming from transit providers', 'Other IPV4 prefixes'], values=values, hole=.3, marker=dict(colors=colors), showlegend=True, textinfo='value')])
+                fig.update_layout(title_text='IPV4', title_x=0.45, legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5))
+            instrument.plotly_chart(PAGE, "transit_pie_ipv4", fig)
+
+    # Third pie chart: IPv6 transit vs non-transit prefixes
+    with pie_chart_metrics[2]:
+        with st.container():
+            values = [count_number_ipv6_transit_prefixes, count_number_ipv6_prefixes - count_number_ipv6_transit_prefixes]
+            with metrics.timed(PAGE, metrics.FIGURE):
+                fig = go.Figure(data=[go.Pie(labels=['IPV6 prefixes coming from transit providers', 'Other IPV6 prefixes'], values=values, hole=.3, marker=dict(colors=colors), showlegend=True, textinfo='value')])
+                fig.update_layout(title_text='IPV6', title_x=0.45, legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5))
+            instrument.plotly_chart(PAGE, "transit_pie_ipv6", fig)
+
+    # Prefix length distribution per address family
+    # Counted per family and prefix length when the summary was built
+    prefix_length_metrics = st.columns(2)
+    for column, family, family_name in ((prefix_length_metrics[0], prefix.IPV4, 'IPV4'), (prefix_length_metrics[1], prefix.IPV6, 'IPV6')):
+        with column:
+            with metrics.timed(PAGE, metrics.AGGREGATE):
+                histogram = current_summary.length_histogram(family)
+                prefix_length_df = pd.DataFrame({'Prefix Length': range(len(histogram)), 'Count of IP Prefixes': histogram})
+                prefix_length_df = prefix_length_df[prefix_length_df['Count of IP Prefixes'] > 0]
+            with metrics.timed(PAGE, metrics.FIGURE):
+                fig = px.bar(prefix_length_df, x='Prefix Length', y='Count of IP Prefixes',
+                             title=f"Count of {family_name} Prefixes by Prefix Length")
+            instrument.plotly_chart(PAGE, f"prefix_lengths_{family_name.lower()}", fig)
+
+    # Analyze hop count distribution
+    with metrics.timed(PAGE, metrics.AGGREGATE):
+        # Count the number of IP prefixes for each hop count (kept in the summary)
+        hop_count_distribution = current_summary.value_counts('hop_count')
+
+        # Convert hop count distribution to a DataFrame for better visualization
+        hop_count_df = hop_count_distribution.reset_index()
+        hop_count_df.columns = ['No. of Hops', 'Count of IP Prefixes']
+
+        # Remove the first row (likely representing 0 hops)
+        hop_count_df = hop_count_df.iloc[1:, :]
+
+    # Create bar chart of IP prefixes by number of hops
+    with metrics.timed(PAGE, metrics.FIGURE):
+        fig = px.bar(hop_count_df, x='No. of Hops', y='Count of IP Prefixes',
+                     labels={'No. of Hops': 'No. of Hops', 'Count of IP Prefixes': 'Count of IP Prefixes'},
+                     title="Count of IP Prefixes by Number of Hops")
+    instrument.plotly_chart(PAGE, "hop_count", fig)
+
+    # Display hop count distribution as a table
+    st.subheader("Count of IP Prefixes by Number of Hops - _Tabular View_ ")
+    instrument.table(PAGE, "hop_count_table", hop_count_df)
+
+
+prefix_charts(transit_as_numbers)
+
+#################################################
+### DRILL-DOWN
+#################################################
+# Route counts by one or two dimensions of the statistics cube (see bgp/cube.py),
+# restricted by filters on any of them. Each view is a bincount over the cube's
+# cells rather than a groupby over the routes, so it is answered in milliseconds.
+# Selecting bars and drilling in turns the selection into filters and breaks it
+# down by the next unfiltered dimension. Only the filters and the chosen
+# dimensions are kept per session.
+with metrics.timed(PAGE, metrics.LOAD):
+    route_cube = data.load_route_cube()
+
+
+def cube_filter_key(dimension: str) -> str:
+    return f"cube_filter_{dimension}"
+
+
+# Filter on the selected labels and break them down by the next dimension
+def drill_down(rows: str, columns: str, points: list[dict]) -> None:
+    for position, dimension in enumerate((rows, columns)):
+        if dimension != NO_COLUMNS:
+            st.session_state[cube_filter_key(dimension)] = list(dict.fromkeys(point["customdata"][position]
+                                                                                for point in points))
+    remaining = [dimension for dimension in cube.DIMENSIONS
+                 if dimension not in (rows, columns) and not st.session_state.get(cube_filter_key(dimension))]
+    if remaining:
+        st.session_state["cube_rows"] = remaining[0]
+        st.session_state["cube_columns"] = rows if columns == NO_COLUMNS else columns
+
+
+def clear_cube_filters() -> None:
+    for dimension in cube.DIMENSIONS:
+        st.session_state[cube_filter_key(dimension)] = []
+
+
+st.subheader("Drill-down")
+pivot_columns = st.columns([1, 1, 2])
+with pivot_columns[0]:
+    rows_dimension = st.selectbox("Rows", cube.DIMENSIONS, index=cube.DIMENSIONS.index("hop_count"),
+                                  format_func=cube.DIMENSION_NAMES.get, key="cube_rows")
+with pivot_columns[1]:
+    columns_dimension = st.selectbox("Columns", [NO_COLUMNS] + cube.DIMENSIONS,
+                                     format_func=lambda dimension: cube.DIMENSION_NAMES.get(dimension, dimension),
+                                     key="cube_columns")
+# Rows and columns by the same dimension are just rows
+if columns_dimension == rows_dimension:
+    columns_dimension = NO_COLUMNS
+
+with st.expander("Drill-down filters", expanded=any(st.session_state.get(cube_filter_key(dimension))
+                                                    for dimension in cube.DIMENSIONS)):
+    filter_columns = st.columns(3)
+    for position, dimension in enumerate(cube.DIMENSIONS):
+        with filter_columns[position % 3]:
+            st.multiselect(cube.DIMENSION_NAMES[dimension], route_cube.labels[dimension].tolist(),
+                           format_func=lambda value, dimension=dimension: cube.label_text(dimension, [value])[0],
+                           key=cube_filter_key(dimension))
+    st.button("Clear filters", on_click=clear_cube_filters)
+cube_filters = {dimension: st.session_state.get(cube_filter_key(dimension), []) for dimension in cube.DIMENSIONS}
+
+start = time.perf_counter()
+with metrics.timed(PAGE, metrics.AGGREGATE):
+    pivot_df = route_cube.pivot(rows_dimension, None if columns_dimension == NO_COLUMNS else columns_dimension,
+                                cube_filters)
+elapsed = time.perf_counter() - start
+filter_text = "; ".join(f"{cube.DIMENSION_NAMES[dimension]} in {', '.join(cube.label_text(dimension, values))}"
+                        for dimension, values in cube_filters.items() if values)
+st.caption(f"{int(pivot_df.to_numpy().sum()):,} routes{' with ' + filter_text if filter_text else ''} · "
+           f"answered from {len(route_cube):,} cells in {elapsed * 1000:.2f} ms")
+
+if pivot_df.empty:
+    st.info("No routes match these filters.")
+else:
+    # Largest rows and columns only in the chart; the table below has them all
+    with metrics.timed(PAGE, metrics.FIGURE):
+        chart_df = pivot_df.loc[pivot_df.sum(axis=1).nlargest(MAX_PIVOT_LABELS).index.sort_values()]
+        chart_df = chart_df[chart_df.sum().nlargest(MAX_PIVOT_LABELS).index.sort_values()]
+        long_df = chart_df.rename_axis(columns="column").stack().rename("Routes").reset_index()
+        long_df = long_df[long_df["Routes"] > 0]
+        long_df["row_label"] = cube.label_text(rows_dimension, long_df[rows_dimension])
+        if columns_dimension == NO_COLUMNS:
+            fig = px.bar(long_df, x="row_label", y="Routes", custom_data=[rows_dimension],
+                         title=f"Routes by {cube.DIMENSION_NAMES[rows_dimension]}")
+        else:
+            long_df["column_label"] = cube.label_text(columns_dimension, long_df["column"])
+            fig = px.bar(long_df, x="row_label", y="Routes", color="column_label",
+                         custom_data=[rows_dimension, "column"],
+                         title=f"Routes by {cube.DIMENSION_NAMES[rows_dimension]} "
+                               f"and {cube.DIMENSION_NAMES[columns_dimension]}")
+        fig.update_layout(xaxis_title=cube.DIMENSION_NAMES[rows_dimension], xaxis_type="category",
+                          legend_title_text=cube.DIMENSION_NAMES.get(columns_dimension, ""))
+    if len(chart_df) < len(pivot_df) or len(chart_df.columns) < len(pivot_df.columns):
+        st.caption(f"Chart shows the {len(chart_df)} largest rows and {len(chart_df.columns)} largest columns")
+    selection = instrument.plotly_chart(PAGE, "drill_down", fig, on_select="rerun", selection_mode=("points", "box"),
+                                        key=f"cube_chart_{rows_dimension}_{columns_dimension}")
+    selected_points = selection.selection.points if selection else []
+    st.button(f"Drill into {len(selected_points)} selected bars" if selected_points
+              else "Select bars in the chart to drill into them", disabled=not selected_points,
+              on_click=drill_down, args=(rows_dimension, columns_dimension, selected_points))
+
+    table_df = pivot_df.copy()
+    table_df.index = cube.label_text(rows_dimension, table_df.index)
+    table_df.index.name = cube.DIMENSION_NAMES[rows_dimension]
+    if columns_dimension != NO_COLUMNS:
+        table_df.columns = cube.label_text(columns_dimension, table_df.columns)
+    instrument.dataframe(PAGE, "drill_down_table", table_df)
 
 # Expandable section for basic data analysis
+# With the columnar backend the statistics come from the column profile, built in
+# one streaming pass over the table and cached per file version (see
+# bgp/profiler.py); database backends use the summary computed in the database
 with st.expander("Basic Data Analysis"):
+    with metrics.timed(PAGE, metrics.LOAD):
+        column_stats = data.load_profile() if data.BACKEND == "columnar" else route_summary
+
     # Display the shape of the DataFrame (rows and columns)
     st.subheader('DataFrame Shape')
-    st.write(IPV4_IPV6_df.shape)
-
+    st.write((column_stats.rows, len(column_stats.info())))
 
-    # Redirect the output of IPV4_IPV6_df.info() to a string 
-    buffer = io.StringIO() 
-    IPV4_IPV6_df.info(buf=buffer) 
-    s = buffer.getvalue() 
-    # Print the string in Streamlit 
-    st.text(s)
+    # Non-null count and type of each column, as shown by DataFrame.info()
+    st.table(column_stats.info())
 
     # Check for missing values
     st.subheader('Missing Values')
-    st.table(IPV4_IPV6_df.isnull().sum())
+    st.table(pd.Series(column_stats.nulls))
 
-    # Display descriptive statistics
+    # Display descriptive statistics (derived from the per-value counts or sketches)
     st.subheader('Descriptive Statistics')
-    st.table(IPV4_IPV6_df.describe())
+    st.table(column_stats.describe())
+    if column_stats is not route_summary and column_stats.approximate_columns():
+        st.caption(f"Quartiles of {', '.join(column_stats.approximate_columns())} are approximate "
+                   f"(within {profiler.SKETCH_ACCURACY:.0%})")
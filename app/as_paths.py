@@ -0,0 +1,121 @@
+# Import necessary libraries
+import time                      # Measuring query time
+import numpy as np               # Array operations on route rows
+import plotly.express as px      # Interactive data visualization
+import streamlit as st           # Web app framework for data apps
+from bgp import data             # Shared data layer used by every page
+from bgp import instrument       # Timed charts and tables
+from bgp import metrics          # Stage timings
+
+# Columns shown for matched routes
+RESULT_COLUMNS = ['Network', 'NextHop', 'Metric', 'LocPrf', 'Weight', 'Path', 'hop_count', 'transit_as']
+
+# Rows of a result rendered in the browser (the full result is downloadable)
+MAX_DISPLAY_ROWS = 1000
+
+# Where the ASN must appear in the path
+POSITIONS = ["Anywhere in the path", "First AS (transit)", "Last AS (origin)"]
+
+# Name of the page in the performance metrics (see bgp/metrics.py)
+PAGE = "as_paths"
+
+#################################################
+### DATA LOADING
+#################################################
+# The parsed paths of the configured backend's route table and the ASN index are
+# built once per table version and shared by all sessions (see bgp/data.py)
+with metrics.timed(PAGE, metrics.LOAD):
+    dataset = data.load_route_dataset()
+IPV4_IPV6_df = dataset.frame
+result_columns = [column for column in RESULT_COLUMNS if column in IPV4_IPV6_df]
+
+with st.spinner("Indexing AS paths..."):
+    as_paths = dataset.paths
+    asn_index = dataset.asn_index
+
+
+# CSV of the given rows, kept across reruns since results can be large (shared
+# bytes, so sessions downloading the same rows don't each hold a copy)
+@st.cache_resource(max_entries=8, show_spinner=False)
+def routes_csv(digest: str, rows: np.ndarray) -> bytes:
+    return IPV4_IPV6_df.iloc[rows][result_columns].to_csv(index=False).encode()
+
+
+# Show matched rows with a download of all of them
+def show_routes(rows: np.ndarray, file_name: str, element: str) -> None:
+    instrument.dataframe(PAGE, element, IPV4_IPV6_df.iloc[rows[:MAX_DISPLAY_ROWS]][result_columns], hide_index=True)
+    if len(rows) > MAX_DISPLAY_ROWS:
+        st.caption(f"Showing the first {MAX_DISPLAY_ROWS:,} of {len(rows):,} routes")
+    st.download_button("Download routes as CSV", routes_csv(dataset.digest, rows), file_name, "text/csv",
+                       key=file_name)
+
+
+#################################################
+### USER INTERFACE SETUP
+#################################################
+st.title("🛣️ AS Paths")
+st.text("Autonomous Systems seen in the AS paths of the routing table")
+
+prepended = as_paths.prepended
+path_metrics = st.columns(3)
+with path_metrics[0]:
+    with st.container(border=True):
+        st.metric("Routes", f"{len(as_paths):,}")
+with path_metrics[1]:
+    with st.container(border=True):
+        st.metric("Distinct ASNs", f"{len(asn_index.keys):,}")
+with path_metrics[2]:
+    with st.container(border=True):
+        st.metric("Paths with Prepending", f"{int(prepended.sum()):,}")
+
+#################################################
+### TOP ASNS
+#################################################
+st.subheader("Top ASNs by Prefix Count")
+top_count = st.slider("Number of ASNs", min_value=5, max_value=100, value=20, step=5)
+
+# Each route counts once per ASN in its path, however often the ASN is prepended
+with metrics.timed(PAGE, metrics.AGGREGATE):
+    top_asn_df = asn_index.route_counts().head(top_count).reset_index()
+    top_asn_df.columns = ['ASN', 'Count of IP Prefixes']
+    top_asn_df['ASN'] = 'AS' + top_asn_df['ASN'].astype(str)
+with metrics.timed(PAGE, metrics.FIGURE):
+    fig = px.bar(top_asn_df, x='ASN', y='Count of IP Prefixes',
+                 title="Count of IP Prefixes with the ASN in their AS Path")
+instrument.plotly_chart(PAGE, "top_asns", fig)
+
+#################################################
+### PREFIXES THROUGH AN ASN
+#################################################
+st.subheader("Prefixes Through an ASN")
+asn_columns = st.columns(2)
+with asn_columns[0]:
+    asn = st.number_input("AS number", min_value=0, max_value=0xFFFFFFFF, value=None, step=1,
+                          placeholder="e.g. 3356")
+with asn_columns[1]:
+    position = st.radio("Position", POSITIONS, horizontal=True)
+
+if asn is not None:
+    start = time.perf_counter()
+    rows = asn_index.routes(int(asn))
+    # The first and last AS filters only narrow the rows already found in the index
+    if position == POSITIONS[1]:
+        rows = rows[as_paths.transit_as[rows] == asn]
+    elif position == POSITIONS[2]:
+        rows = rows[as_paths.origin_as[rows] == asn]
+    elapsed = time.perf_counter() - start
+    metrics.record_stage(PAGE, metrics.FILTER, elapsed)
+
+    if len(rows):
+        st.write(f"**{len(rows):,}** routes ({IPV4_IPV6_df['Network'].iloc[rows].nunique():,} distinct prefixes) "
+                 f"found in {elapsed * 1000:.1f} ms")
+        show_routes(rows, f"routes_AS{asn}.csv", "asn_routes")
+    else:
+        st.warning(f"No route has AS{asn} at this position in its path")
+
+#################################################
+### PREPENDING
+#################################################
+st.subheader("Paths with Prepending")
+st.text("Routes whose AS path repeats an ASN back to back, usually to make the path less preferred")
+show_routes(np.flatnonzero(prepended), "prepended_routes.csv", "prepended_routes")
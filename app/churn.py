@@ -0,0 +1,135 @@
+# Import necessary libraries
+import pandas as pd              # Data manipulation and analysis
+import plotly.express as px      # Interactive data visualization
+import streamlit as st           # Web app framework for data apps
+from bgp import data             # Shared data layer used by every page
+from bgp import instrument       # Timed charts and tables
+from bgp import metrics          # Stage timings
+from bgp import snapshot         # Snapshot tables and change types
+
+# Rows of a snapshot's changes rendered in the browser
+MAX_DISPLAY_ROWS = 1000
+
+# Seconds the snapshot list is reused before asking the database again
+SNAPSHOTS_TTL = 60
+
+# Colors of the change types
+CHANGE_COLORS = {snapshot.ADD: "#2ca02c", snapshot.WITHDRAW: "#d62728", snapshot.CHANGE: "#ff7f0e"}
+
+# Name of the page in the performance metrics (see bgp/metrics.py)
+PAGE = "churn"
+
+#################################################
+### DATA LOADING
+#################################################
+# Snapshots are written by `python -m bgp.snapshot` into the database of the
+# SQL backend; only their per-snapshot counts and the selected snapshot's
+# changes are read from it
+snapshot_backend = data.load_snapshot_backend()
+
+
+@st.cache_data(ttl=SNAPSHOTS_TTL, show_spinner=False)
+def load_snapshots(backend_name: str) -> pd.DataFrame:
+    snapshots = snapshot_backend.snapshots()
+    snapshots["taken_at"] = pd.to_datetime(snapshots["taken_at"])
+    return snapshots
+
+
+@st.cache_data(ttl=SNAPSHOTS_TTL, show_spinner=False)
+def load_change_counts(backend_name: str, snapshot_id: int, column: str) -> pd.DataFrame:
+    return snapshot_backend.change_counts(snapshot_id, column)
+
+
+@st.cache_data(ttl=SNAPSHOTS_TTL, show_spinner=False)
+def load_changes(backend_name: str, snapshot_id: int) -> pd.DataFrame:
+    return snapshot_backend.changes(snapshot_id, MAX_DISPLAY_ROWS)
+
+
+#################################################
+### USER INTERFACE SETUP
+#################################################
+st.title("🔁 Routing Churn")
+st.text("Routes added, withdrawn and changed between RIB snapshots")
+
+with metrics.timed(PAGE, metrics.LOAD):
+    snapshots_df = load_snapshots(data.BACKEND)
+if snapshots_df.empty:
+    st.info("No snapshots recorded yet. Ingest RIB dumps with "
+            "`python -m bgp.snapshot <dump files> --database <database>`, one run per dump.")
+    st.stop()
+
+# The first snapshot is the base (every route added), so it is left out of the churn
+deltas_df = snapshots_df.iloc[1:].copy()
+deltas_df["churn"] = deltas_df[["added", "withdrawn", "changed"]].sum(axis=1)
+latest = snapshots_df.iloc[-1]
+
+churn_metrics = st.columns(4)
+with churn_metrics[0]:
+    with st.container(border=True):
+        st.metric("Snapshots", f"{len(snapshots_df):,}")
+with churn_metrics[1]:
+    with st.container(border=True):
+        st.metric("Current Routes", f"{int(latest['routes']):,}")
+with churn_metrics[2]:
+    with st.container(border=True):
+        st.metric("Latest Changes", f"{int(deltas_df['churn'].iloc[-1]):,}" if len(deltas_df) else "-")
+with churn_metrics[3]:
+    with st.container(border=True):
+        latest_rate = deltas_df['churn'].iloc[-1] / max(int(latest['routes']), 1) if len(deltas_df) else None
+        st.metric("Latest Churn Rate", f"{latest_rate:.2%}" if latest_rate is not None else "-")
+
+#################################################
+### CHURN OVER TIME
+#################################################
+st.subheader("Churn over Time")
+if deltas_df.empty:
+    st.caption("Only the base snapshot is recorded; churn appears from the second snapshot on.")
+else:
+    churn_long_df = deltas_df.melt(id_vars=["snapshot_id", "taken_at"], value_vars=["added", "withdrawn", "changed"],
+                                   var_name="Change", value_name="Routes")
+    fig = px.bar(churn_long_df, x="taken_at", y="Routes", color="Change",
+                 color_discrete_map={"added": CHANGE_COLORS[snapshot.ADD],
+                                     "withdrawn": CHANGE_COLORS[snapshot.WITHDRAW],
+                                     "changed": CHANGE_COLORS[snapshot.CHANGE]},
+                 hover_data=["snapshot_id"], title="Routes Added, Withdrawn and Changed per Snapshot")
+    fig.update_layout(xaxis_title="Snapshot Time")
+    instrument.plotly_chart(PAGE, "churn_over_time", fig)
+
+fig = px.line(snapshots_df, x="taken_at", y="routes", markers=True, title="Routes in the Table per Snapshot")
+fig.update_layout(xaxis_title="Snapshot Time", yaxis_title="Routes")
+instrument.plotly_chart(PAGE, "routes_over_time", fig)
+
+with st.expander("Snapshots"):
+    instrument.dataframe(PAGE, "snapshots", snapshots_df, hide_index=True)
+
+#################################################
+### CHANGES OF A SNAPSHOT
+#################################################
+st.subheader("Changes of a Snapshot")
+snapshot_id = st.selectbox(
+    "Snapshot", snapshots_df["snapshot_id"].tolist()[::-1],
+    format_func=lambda value: f"#{value} ({snapshots_df.set_index('snapshot_id').at[value, 'taken_at']})",
+)
+
+with metrics.timed(PAGE, metrics.LOAD):
+    transit_counts_df = load_change_counts(data.BACKEND, snapshot_id, "transit_as")
+if transit_counts_df.empty:
+    st.caption("No routes changed in this snapshot.")
+    st.stop()
+
+# Transit providers with the most changes
+transit_totals = transit_counts_df.groupby("transit_as")["count"].sum().nlargest(20)
+top_transit_df = transit_counts_df[transit_counts_df["transit_as"].isin(transit_totals.index)].copy()
+top_transit_df["transit_as"] = "AS" + top_transit_df["transit_as"].astype("Int64").astype(str)
+fig = px.bar(top_transit_df, x="transit_as", y="count", color="change_type",
+             color_discrete_map=CHANGE_COLORS, title="Changes per Transit AS (top 20)",
+             category_orders={"transit_as": ["AS" + str(int(asn)) for asn in transit_totals.index]})
+fig.update_layout(xaxis_title="Transit AS", yaxis_title="Routes")
+instrument.plotly_chart(PAGE, "changes_per_transit_as", fig)
+
+with metrics.timed(PAGE, metrics.LOAD):
+    changes_df = load_changes(data.BACKEND, snapshot_id)
+instrument.dataframe(PAGE, "changes", changes_df, hide_index=True)
+total_changes = int(transit_counts_df["count"].sum())
+if total_changes > len(changes_df):
+    st.caption(f"Showing the first {len(changes_df):,} of {total_changes:,} changes")
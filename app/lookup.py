@@ -0,0 +1,103 @@
+# Import necessary libraries
+import re                        # Splitting pasted address lists
+import time                      # Measuring lookup throughput
+import numpy as np               # Array operations on lookup results
+import pandas as pd              # Data manipulation and analysis
+import streamlit as st           # Web app framework for data apps
+from bgp import data             # Shared data layer used by every page
+from bgp import instrument       # Timed charts and tables
+from bgp import lpm              # Longest prefix match
+from bgp import metrics          # Stage timings
+from bgp import prefix           # Packed addresses
+
+# Columns shown for a matched route
+RESULT_COLUMNS = ['Network', 'NextHop', 'Metric', 'LocPrf', 'Weight', 'Path', 'hop_count', 'transit_as']
+
+# Rows of a batch result rendered in the browser (the full result is downloadable)
+MAX_DISPLAY_ROWS = 1000
+
+# Name of the page in the performance metrics (see bgp/metrics.py)
+PAGE = "lookup"
+
+#################################################
+### DATA LOADING
+#################################################
+# The route table of the configured backend and its prefix index are built once
+# per table version and shared by all sessions (see bgp/data.py)
+with metrics.timed(PAGE, metrics.LOAD):
+    dataset = data.load_route_dataset()
+IPV4_IPV6_df = dataset.frame
+result_columns = [column for column in RESULT_COLUMNS if column in IPV4_IPV6_df]
+
+with st.spinner("Building prefix index..."):
+    prefix_index = dataset.prefix_index
+
+#################################################
+### USER INTERFACE SETUP
+#################################################
+st.title("🔎 Route Lookup")
+st.text("Find the longest prefix in the routing table that covers an IPv4 or IPv6 address")
+
+#################################################
+### SINGLE LOOKUP
+#################################################
+st.subheader("Single Address")
+address = st.text_input("IP address", placeholder="e.g. 8.8.8.8 or 2001:4860:4860::8888")
+
+if address:
+    packed_address = prefix.pack(pd.Series([address.strip()], dtype=object))
+    row = int(prefix_index.lookup(packed_address)[0])
+    if packed_address.family[0] == 0:
+        st.error(f"*{address}* is not a valid IP address")
+    elif row == lpm.NO_ROUTE:
+        st.warning(f"No route covers *{address}*")
+    else:
+        network = IPV4_IPV6_df['Network'].iloc[row]
+        length = int(dataset.networks.length[row])
+        st.write(f"*{address}* is covered by **{network}**")
+        # Show every path to the matched prefix (additional paths share the Network),
+        # found by comparing the packed prefixes rather than the strings
+        paths = IPV4_IPV6_df.iloc[np.flatnonzero(prefix.within(dataset.networks, network, length, length))]
+        instrument.dataframe(PAGE, "single_result", paths[result_columns], hide_index=True)
+
+#################################################
+### BATCH LOOKUP
+#################################################
+st.subheader("Batch Lookup")
+pasted = st.text_area("IP addresses (one per line, or separated by spaces or commas)")
+uploaded = st.file_uploader("...or upload a text file of addresses", type=["txt", "csv"])
+
+text = uploaded.getvalue().decode("utf-8", errors="replace") if uploaded is not None else pasted
+addresses = [value for value in re.split(r"[\s,;]+", text) if value]
+
+if addresses:
+    # Parse and look up all addresses in one vectorized pass
+    start = time.perf_counter()
+    packed = prefix.pack(pd.Series(addresses, dtype=object))
+    rows = prefix_index.lookup(packed)
+    elapsed = time.perf_counter() - start
+    metrics.record_stage(PAGE, metrics.FILTER, elapsed)
+
+    matched = rows != lpm.NO_ROUTE
+    batch_metrics = st.columns(3)
+    with batch_metrics[0]:
+        with st.container(border=True):
+            st.metric("Addresses", f"{len(addresses):,}")
+    with batch_metrics[1]:
+        with st.container(border=True):
+            st.metric("Covered by a route", f"{int(matched.sum()):,}")
+    with batch_metrics[2]:
+        with st.container(border=True):
+            st.metric("Lookups per second", f"{len(addresses) / elapsed:,.0f}" if elapsed else "-")
+
+    # Build the result table from the matched rows only; unmatched and invalid
+    # addresses have empty route columns
+    result_df = IPV4_IPV6_df.iloc[np.where(matched, rows, 0)][result_columns].reset_index(drop=True)
+    result_df.loc[~matched, :] = None
+    result_df.insert(0, 'Address', addresses)
+    result_df.insert(1, 'Valid', packed.family > 0)
+
+    instrument.dataframe(PAGE, "batch_result", result_df.head(MAX_DISPLAY_ROWS), hide_index=True)
+    if len(result_df) > MAX_DISPLAY_ROWS:
+        st.caption(f"Showing the first {MAX_DISPLAY_ROWS:,} of {len(result_df):,} results")
+    st.download_button("Download results as CSV", result_df.to_csv(index=False), "lookup_results.csv", "text/csv")
@@ -1,50 +1,75 @@
+import time
 import streamlit as st
-import pandas as pd
-import mysql.connector
-from mysql.connector import errorcode
-
-@st.cache_data(max_entries=5)
-def load_data():
-    data = pd.read_csv("data/data.csv")
-    # Select the first five columns
-    return data.iloc[:, :6]
-
-# Uncomment following code to read data from MySQL Database. Make appropriate changes to the config credentials.
-# @st.cache_data(max_entries=5)
-# def load_data(query: str):
-#     # Function to get data from MySQL
-#     config = {
-#         'host':'mysql-server.mysql.database.azure.com',
-#         'user':'AzureAdminNebuhan',
-#         'password':'86',
-#         'database':'etisalat_project'
-#     }
-
-#     # Construct connection string
-
-#     try:
-#         sql_connection = mysql.connector.connect(**config)
-#         print("Connection established")
-#     except mysql.connector.Error as err:
-#         if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
-#             print("Something is wrong with the user name or password")
-#         elif err.errno == errorcode.ER_BAD_DB_ERROR:
-#             print("Database does not exist")
-#         else:
-#             print(err)
-
-#     data = pd.read_sql(
-#         query,
-#         sql_connection
-#     )
-
-#     return data
+from bgp import data, instrument, metrics, parser, prefix, query
+
+# Name of the page in the performance metrics (see bgp/metrics.py)
+PAGE = "view_data"
+
+# The route table comes from the configured backend (see bgp/data.py and
+# bgp/backend.py): the columnar cache of data/data.csv by default, or the SQLite /
+# MySQL database written by bgp.ingest. Database connections are pooled and every
+# filter below runs in the backend, so only the visible page is transferred.
+route_backend = data.load_backend()
+
+# Values offered by a filter on a column, reused for a minute
+@st.cache_data(ttl=60, show_spinner=False)
+def filter_options(backend_name: str, column: str) -> list:
+    return route_backend.distinct_values(column)
 
 st.header("🛢️ Raw Data as in Database")
 
-IPV4_IPV6_df = load_data()
+# Filters are pushed down to the backend and only the current page of matching
+# rows is materialized and sent to the browser
+with st.expander("Filters", expanded=True):
+    filter_columns = st.columns(3)
+    with filter_columns[0]:
+        family_name = st.selectbox("Address family", ["All", "IPv4", "IPv6"])
+    with filter_columns[1]:
+        transit_as = st.multiselect("transit_as", filter_options(data.BACKEND, 'transit_as'))
+    with filter_columns[2]:
+        next_hops = st.multiselect("NextHop", filter_options(data.BACKEND, 'NextHop'))
+
+    range_columns = st.columns(3)
+    with range_columns[0]:
+        min_length, max_length = st.slider("Prefix length", 0, 128, (0, 128))
+    with range_columns[1]:
+        min_locprf = st.number_input("Minimum LocPrf", min_value=0, value=None, step=1)
+    with range_columns[2]:
+        max_locprf = st.number_input("Maximum LocPrf", min_value=0, value=None, step=1)
+
+route_filter = query.RouteFilter(
+    family={"All": None, "IPv4": prefix.IPV4, "IPv6": prefix.IPV6}[family_name],
+    transit_as=tuple(transit_as),
+    next_hops=tuple(next_hops),
+    min_length=min_length,
+    max_length=max_length,
+    min_locprf=min_locprf,
+    max_locprf=max_locprf,
+)
 
-st.dataframe(IPV4_IPV6_df)
+page_columns = st.columns([1, 1, 4])
+with page_columns[0]:
+    page_size = st.selectbox("Rows per page", query.PAGE_SIZES, index=1)
+
+start = time.perf_counter()
+with metrics.timed(PAGE, metrics.FILTER):
+    matching_count = route_backend.count(route_filter)
+elapsed = time.perf_counter() - start
+page_count = query.page_count(matching_count, page_size)
+
+# Go back to the first page whenever the filter or the page size changes
+if st.session_state.get("raw_data_query") != (route_filter, page_size):
+    st.session_state["raw_data_query"] = (route_filter, page_size)
+    st.session_state["raw_data_page"] = 1
+with page_columns[1]:
+    page_number = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="raw_data_page")
+
+with metrics.timed(PAGE, metrics.LOAD):
+    page_df = route_backend.page(route_filter, page_number - 1, page_size)
+instrument.dataframe(PAGE, "page", page_df, column_order=parser.COLUMNS)
+first_row = (page_number - 1) * page_size
+st.caption(f"Rows {min(first_row + 1, matching_count):,}–{first_row + len(page_df):,} of {matching_count:,} matching "
+           f"routes, page {page_number:,} of {page_count:,} · counted in {elapsed * 1000:.1f} ms")
 
 st.markdown("""
 # Data Extraction and Insertion Approach
@@ -0,0 +1,5 @@
+# BGP routing table processing shared by the Streamlit pages and the ingest scripts.
+#
+# The modules in this package are plain Python so they can be used from the command
+# line as well as from the dashboard pages; only bgp.data (the pages' shared data
+# layer) depends on Streamlit.
@@ -0,0 +1,319 @@
+# Anomaly scoring of routes with an Isolation Forest
+#
+# The model of the original offline analysis (LocPrf and hop_count of transit
+# routes with a Metric, 25 trees, contamination 0.0015), implemented on NumPy so
+# it runs inside the app without extra dependencies. Trees are stored as flat
+# node arrays, and scoring walks every tree for a whole batch of rows at once:
+# one NumPy step per tree level instead of one Python call per row.
+#
+# Usage:
+#   python -m bgp.anomaly data/data.csv --transit-asns data/transitASN.txt
+#
+# Rows with equal features always get equal scores, so only the distinct feature
+# rows are scored (a handful for LocPrf/hop_count); large sets of distinct rows
+# are scored in batches on a process pool. A fitted model is saved next to the
+# CSV and reused for later versions of the table, so appended routes are scored
+# without refitting. The scores of the distinct feature rows seen so far are
+# saved next to the model (ScoredFeatures): a new version of the table only
+# scores the rows whose features the model hasn't scored before.
+#
+# Models are only trained on request (the AI/ML page's Retrain button or this
+# command), and files are written to a temporary file and moved in place, so
+# readers and concurrent writers never see a partial file.
+import argparse
+import math
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bgp import cache, pools
+
+# Columns used as features
+FEATURES = ["LocPrf", "hop_count"]
+
+# Parameters of the original model
+N_ESTIMATORS = 25
+MAX_SAMPLES = 256
+CONTAMINATION = 0.0015
+RANDOM_STATE = 42
+
+# Fewest rows a model can be trained on
+MIN_TRAINING_ROWS = 2
+
+# Distinct feature rows scored per process pool task
+SCORE_BATCH_ROWS = 250_000
+
+# Extension of the model file written next to the CSV
+MODEL_EXTENSION = ".model.npz"
+
+# Extension of the scored feature rows written next to the model
+SCORES_EXTENSION = ".scores.npz"
+
+# Labels of the Anomaly column
+ANOMALY = "Anomaly"
+NORMAL = "Normal"
+
+_EULER_GAMMA = 0.5772156649015329
+
+
+# Location of the model file for a CSV file (data/data.csv -> data/data.model.npz)
+def model_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + MODEL_EXTENSION
+
+
+# Location of the scored feature rows of a model (data/data.model.npz ->
+# data/data.scores.npz)
+def scores_path(model_file: str) -> str:
+    return model_file.removesuffix(MODEL_EXTENSION) + SCORES_EXTENSION
+
+
+# Write arrays to an .npz file through a temporary file of its own in the same
+# directory, moved in place
+def _save_arrays(path: str, **arrays) -> None:
+    descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp.npz", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+# Average path length of an unsuccessful search in a binary search tree of n
+# points, used to normalize path lengths and to extend leaves holding several rows
+def _average_path_length(n: np.ndarray) -> np.ndarray:
+    n = np.asarray(n, dtype=np.float64)
+    result = np.zeros_like(n)
+    result[n == 2] = 1.0
+    larger = n > 2
+    result[larger] = 2.0 * (np.log(n[larger] - 1.0) + _EULER_GAMMA) - 2.0 * (n[larger] - 1.0) / n[larger]
+    return result
+
+
+# Grow one isolation tree on a sample; returns its node arrays
+# Leaves have feature -1 and store their depth plus the expected depth of the
+# rows they still hold
+def _grow_tree(sample: np.ndarray, height_limit: int, rng: np.random.Generator) -> tuple[list, ...]:
+    feature, threshold, left, right, leaf_depth = [], [], [], [], []
+
+    def add_node() -> int:
+        for values in (feature, left, right):
+            values.append(-1)
+        threshold.append(0.0)
+        leaf_depth.append(0.0)
+        return len(feature) - 1
+
+    stack = [(add_node(), np.arange(len(sample)), 0)]
+    while stack:
+        node, rows, depth = stack.pop()
+        values = sample[rows]
+        low, high = values.min(axis=0), values.max(axis=0)
+        candidates = np.flatnonzero(high > low)
+        if depth >= height_limit or len(rows) <= 1 or not len(candidates):
+            leaf_depth[node] = depth + float(_average_path_length(len(rows)))
+            continue
+        split_feature = int(rng.choice(candidates))
+        split = rng.uniform(low[split_feature], high[split_feature])
+        goes_left = values[:, split_feature] < split
+        feature[node], threshold[node] = split_feature, split
+        left[node], right[node] = add_node(), add_node()
+        stack.append((left[node], rows[goes_left], depth + 1))
+        stack.append((right[node], rows[~goes_left], depth + 1))
+    return feature, threshold, left, right, leaf_depth
+
+
+# Fitted forest; every array has one row per tree, padded to the largest tree
+@dataclass
+class IsolationForest:
+    feature: np.ndarray     # int32, split feature or -1 for leaves
+    threshold: np.ndarray   # float64, rows with value < threshold go left
+    left: np.ndarray        # int32 child nodes
+    right: np.ndarray
+    leaf_depth: np.ndarray  # float64, path length assigned at leaves
+    sample_size: int        # rows drawn per tree
+    offset: float           # scores above this are anomalies
+    # Content hash of the table version the model was trained on
+    digest: str = ""
+    # Transit AS numbers whose routes formed the training set
+    transit_as: tuple[int, ...] = ()
+
+    @classmethod
+    def fit(cls, features: np.ndarray, n_estimators: int = N_ESTIMATORS, max_samples: int = MAX_SAMPLES,
+            contamination: float = CONTAMINATION, random_state: int = RANDOM_STATE, **metadata) -> "IsolationForest":
+        if len(features) < MIN_TRAINING_ROWS:
+            raise ValueError(f"At least {MIN_TRAINING_ROWS} rows are needed to train the anomaly model")
+        rng = np.random.default_rng(random_state)
+        sample_size = min(max_samples, len(features))
+        height_limit = math.ceil(math.log2(max(sample_size, 2)))
+        trees = [_grow_tree(features[rng.choice(len(features), sample_size, replace=False)], height_limit, rng)
+                 for _ in range(n_estimators)]
+
+        nodes = max(len(tree[0]) for tree in trees)
+        arrays = []
+        for position, (dtype, fill) in enumerate([(np.int32, -1), (np.float64, 0.0), (np.int32, -1),
+                                                   (np.int32, -1), (np.float64, 0.0)]):
+            array = np.full((n_estimators, nodes), fill, dtype=dtype)
+            for tree_number, tree in enumerate(trees):
+                array[tree_number, :len(tree[position])] = tree[position]
+            arrays.append(array)
+        model = cls(*arrays, sample_size=sample_size, offset=np.inf, **metadata)
+        # Threshold at the contamination quantile of the training scores
+        model.offset = float(np.quantile(score(model, features), 1.0 - contamination))
+        return model
+
+    # Average path length of each row over all trees
+    def path_lengths(self, features: np.ndarray) -> np.ndarray:
+        rows = np.arange(len(features))
+        total = np.zeros(len(features))
+        for tree in range(len(self.feature)):
+            feature, threshold = self.feature[tree], self.threshold[tree]
+            left, right = self.left[tree], self.right[tree]
+            node = np.zeros(len(features), dtype=np.int32)
+            # Every row moves one level down per step; rows at a leaf stay there
+            while True:
+                split_feature = feature[node]
+                internal = split_feature >= 0
+                if not internal.any():
+                    break
+                goes_left = features[rows, np.maximum(split_feature, 0)] < threshold[node]
+                node = np.where(internal, np.where(goes_left, left[node], right[node]), node)
+            total += self.leaf_depth[tree, node]
+        return total / len(self.feature)
+
+    # Anomaly score in (0, 1]; higher is more anomalous
+    def score_samples(self, features: np.ndarray) -> np.ndarray:
+        return 2.0 ** (-self.path_lengths(features) / _average_path_length(self.sample_size))
+
+    # Save to an .npz file (written to a temporary file and moved in place)
+    def save(self, path: str) -> None:
+        _save_arrays(path, feature=self.feature, threshold=self.threshold, left=self.left,
+                     right=self.right, leaf_depth=self.leaf_depth, sample_size=self.sample_size,
+                     offset=self.offset, digest=self.digest, transit_as=np.array(self.transit_as, dtype=np.int64))
+
+    # Load a saved model, or None if the file is missing or unreadable
+    @classmethod
+    def load(cls, path: str) -> "IsolationForest | None":
+        try:
+            with np.load(path) as arrays:
+                return cls(arrays["feature"], arrays["threshold"], arrays["left"], arrays["right"],
+                           arrays["leaf_depth"], sample_size=int(arrays["sample_size"]),
+                           offset=float(arrays["offset"]), digest=str(arrays["digest"]),
+                           transit_as=tuple(int(asn) for asn in arrays["transit_as"]))
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+# Scores of distinct feature rows under one model, identified by the content hash
+# of its file (`model_digest`)
+@dataclass
+class ScoredFeatures:
+    features: np.ndarray  # float64, one distinct feature row per row
+    scores: np.ndarray    # float64, score of each row
+    model_digest: str = ""
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    # Save to an .npz file (written to a temporary file and moved in place)
+    def save(self, path: str) -> None:
+        _save_arrays(path, features=self.features, scores=self.scores, model_digest=self.model_digest)
+
+    # Load saved scores, or None if the file is missing or unreadable
+    @classmethod
+    def load(cls, path: str) -> "ScoredFeatures | None":
+        try:
+            with np.load(path) as arrays:
+                return cls(arrays["features"], arrays["scores"], str(arrays["model_digest"]))
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+# Feature matrix of a frame (float64, NaN for missing values)
+def features(frame: pd.DataFrame) -> np.ndarray:
+    return np.column_stack([frame[column].to_numpy(dtype=np.float64, na_value=np.nan) for column in FEATURES])
+
+
+# Rows used for training and scoring: routes of the transit providers with a
+# Metric and every feature present (the cleaning of the original analysis)
+def eligible_rows(frame: pd.DataFrame, transit_as_numbers) -> np.ndarray:
+    transit = frame["transit_as"].isin([int(asn) for asn in transit_as_numbers]).to_numpy(dtype=bool, na_value=False)
+    has_metric = frame["Metric"].notna().to_numpy()
+    return np.flatnonzero(transit & has_metric & ~np.isnan(features(frame)).any(axis=1))
+
+
+# Score feature rows, scoring each distinct row once
+# With workers > 1, large sets of distinct rows are split over a process pool
+def score(model: IsolationForest, feature_rows: np.ndarray, workers: int = 1) -> np.ndarray:
+    return score_incremental(model, feature_rows, None, workers)[0]
+
+
+# Score feature rows, taking the scores of the rows in `known` (scored before by
+# the same model) from there and scoring only the distinct rows it lacks.
+# Returns the scores and `known` extended by the newly scored rows.
+def score_incremental(model: IsolationForest, feature_rows: np.ndarray, known: ScoredFeatures | None,
+                      workers: int = 1) -> tuple[np.ndarray, ScoredFeatures]:
+    if known is None:
+        known = ScoredFeatures(np.zeros((0, len(FEATURES))), np.zeros(0))
+    if not len(feature_rows):
+        return np.zeros(0), known
+    # Group numbers by first appearance (a hash grouping, much faster than
+    # np.unique over rows), then the first row of each group
+    frame = pd.DataFrame(feature_rows)
+    groups = frame.groupby(list(frame.columns), sort=False, dropna=False).ngroup().to_numpy()
+    distinct = feature_rows[np.unique(groups, return_index=True)[1]]
+    positions = pd.MultiIndex.from_arrays(list(known.features.T)).get_indexer(
+        pd.MultiIndex.from_arrays(list(distinct.T))) if len(known) else np.full(len(distinct), -1)
+    new = distinct[positions < 0]
+    if workers > 1 and len(new) > SCORE_BATCH_ROWS:
+        batches = [new[start:start + SCORE_BATCH_ROWS] for start in range(0, len(new), SCORE_BATCH_ROWS)]
+        with pools.process_pool(workers) as pool:
+            new_scores = np.concatenate(list(pool.map(model.score_samples, batches)))
+    else:
+        new_scores = model.score_samples(new) if len(new) else np.zeros(0)
+    scores = known.scores[np.maximum(positions, 0)] if len(known) else np.zeros(len(distinct))
+    scores[positions < 0] = new_scores
+    if len(new):
+        known = ScoredFeatures(np.concatenate([known.features, new]), np.concatenate([known.scores, new_scores]),
+                               known.model_digest)
+    return scores[groups], known
+
+
+# Anomaly flag of each eligible row
+def predict(model: IsolationForest, feature_rows: np.ndarray, workers: int = 1) -> np.ndarray:
+    return score(model, feature_rows, workers) > model.offset
+
+
+# Train a model on the eligible routes of a route frame; None when fewer than
+# MIN_TRAINING_ROWS routes are eligible
+def train(frame: pd.DataFrame, transit_as_numbers, digest: str = "") -> IsolationForest | None:
+    rows = eligible_rows(frame, transit_as_numbers)
+    if len(rows) < MIN_TRAINING_ROWS:
+        return None
+    return IsolationForest.fit(features(frame.iloc[rows]), digest=digest,
+                               transit_as=tuple(int(asn) for asn in transit_as_numbers))
+
+
+def main(argv: list[str] | None = None) -> None:
+    argument_parser = argparse.ArgumentParser(description="Train the anomaly model of a route CSV")
+    argument_parser.add_argument("csv", help="route CSV, e.g. data/data.csv")
+    argument_parser.add_argument("--transit-asns", default="data/transitASN.txt",
+                                 help="file of transit AS numbers, one per line")
+    args = argument_parser.parse_args(argv)
+
+    with open(args.transit_asns) as file:
+        transit_as_numbers = [int(line) for line in file if line.strip()]
+    start = time.perf_counter()
+    model = train(cache.load_table(args.csv), transit_as_numbers, cache.file_digest(args.csv))
+    if model is None:
+        argument_parser.error(f"fewer than {MIN_TRAINING_ROWS} routes of the transit providers have a Metric")
+    model.save(model_path(args.csv))
+    print(f"{model_path(args.csv)} trained in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# AS paths as ragged integer arrays, with an inverted index from ASN to routes
+#
+# The Path column ("174 3356 {64512,64513} 13335 i") is parsed once into a CSR
+# layout: one uint32 array with the ASNs of every path back to back, and an offsets
+# array where path i is asns[offsets[i]:offsets[i + 1]]. AS_SET members are kept in
+# order and flagged, the origin code (i/e/?) is dropped, and asdot ASNs ("1.10")
+# are converted to their 32 bit value. hop_count, transit_as and prepending are
+# then NumPy operations over these arrays, and the inverted index answers "which
+# routes contain AS X" with one binary search.
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# transit_as / origin value for routes with an empty path
+NO_ASN = -1
+
+
+# AS paths of one Path column, one entry per row
+@dataclass(frozen=True)
+class ASPaths:
+    offsets: np.ndarray  # int64, len(rows) + 1
+    asns: np.ndarray     # uint32, every ASN of every path in order
+    in_set: np.ndarray   # bool per ASN, True for AS_SET members
+    set_count: np.ndarray  # int32 per row, number of AS_SET segments
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    # ASNs of one path
+    def path(self, row: int) -> np.ndarray:
+        return self.asns[self.offsets[row]:self.offsets[row + 1]]
+
+    # Number of ASNs in each path, counting prepended ASNs
+    @cached_property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    # Row of every ASN in `asns`
+    @cached_property
+    def rows(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.lengths)
+
+    # Path length as used in best path selection: one per AS_SEQUENCE ASN
+    # (prepends included) and one per AS_SET
+    @cached_property
+    def hop_count(self) -> np.ndarray:
+        in_set = np.bincount(self.rows[self.in_set], minlength=len(self))
+        return (self.lengths - in_set + self.set_count).astype(np.int64)
+
+    # First ASN of each path (the neighbouring AS), NO_ASN for empty paths
+    @cached_property
+    def transit_as(self) -> np.ndarray:
+        return self._asn_at(self.offsets[:-1])
+
+    # Last ASN of each path (the originating AS), NO_ASN for empty paths
+    @cached_property
+    def origin_as(self) -> np.ndarray:
+        return self._asn_at(self.offsets[1:] - 1)
+
+    def _asn_at(self, positions: np.ndarray) -> np.ndarray:
+        present = self.lengths > 0
+        values = np.full(len(self), NO_ASN, dtype=np.int64)
+        values[present] = self.asns[positions[present]]
+        return values
+
+    # Whether each path repeats an ASN back to back (AS path prepending)
+    @cached_property
+    def prepended(self) -> np.ndarray:
+        repeat = np.flatnonzero(self.asns[1:] == self.asns[:-1]) + 1
+        # Only repeats inside one path count
+        repeat = repeat[self.rows[repeat] == self.rows[repeat - 1]]
+        result = np.zeros(len(self), dtype=bool)
+        result[self.rows[repeat]] = True
+        return result
+
+    # Make every array read-only (paths are shared between sessions)
+    def freeze(self) -> "ASPaths":
+        for array in (self.offsets, self.asns, self.in_set, self.set_count):
+            array.setflags(write=False)
+        return self
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.offsets, self.asns, self.in_set, self.set_count))
+
+
+# Parse a Path column
+def parse(paths: pd.Series) -> ASPaths:
+    strings = pa.array(paths, type=pa.string(), from_pandas=True)
+    # Commas separate AS_SET members; literal splits are much faster than a regex,
+    # and the empty tokens of repeated separators are dropped with the origin code
+    strings = pc.replace_substring(pc.fill_null(strings, ""), ",", " ")
+    tokens = pc.split_pattern(strings, " ")
+    token_counts = pc.list_value_length(tokens).to_numpy(zero_copy_only=False)
+    flat = pc.list_flatten(tokens)
+
+    # "{" opens and "}" closes an AS_SET; sets don't nest, so a token is a member
+    # when more sets have been opened than closed before it in its own path (the
+    # running depth restarts at each path, so an unclosed set in a malformed path
+    # doesn't spill into the next ones)
+    opens = pc.starts_with(flat, "{").to_numpy(zero_copy_only=False)
+    closes = pc.ends_with(flat, "}").to_numpy(zero_copy_only=False)
+    token_rows = np.repeat(np.arange(len(paths), dtype=np.int64), token_counts)
+    depth = np.cumsum(opens.astype(np.int64) - closes)
+    token_starts = np.concatenate([[0], np.cumsum(token_counts)[:-1]]).astype(np.int64)
+    depth_before = np.concatenate([[0], depth])[token_starts]
+    in_set = (depth - depth_before[token_rows] + closes) > 0
+
+    values = _asn_values(pc.utf8_trim(flat, "{}"))
+    keep = values >= 0
+    offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(token_rows[keep], minlength=len(paths)), out=offsets[1:])
+    set_count = np.bincount(token_rows[opens], minlength=len(paths)).astype(np.int32)
+    return ASPaths(offsets, values[keep].astype(np.uint32), in_set[keep], set_count)
+
+
+# ASN of each token: asplain ("4200000000") or asdot ("64086.59904"), -1 otherwise
+def _asn_values(tokens: pa.Array) -> np.ndarray:
+    plain = pc.and_(pc.ascii_is_decimal(tokens), pc.less_equal(pc.utf8_length(tokens), 10))
+    values = pc.cast(pc.if_else(plain, tokens, pa.scalar("-1")), pa.int64()).to_numpy(zero_copy_only=False).copy()
+    if pc.any(pc.match_substring(tokens, ".")).as_py():
+        dotted = pc.match_substring_regex(tokens, r"^\d{1,5}\.\d{1,5}$").to_numpy(zero_copy_only=False)
+        rows = np.flatnonzero(dotted)
+        parts = pc.split_pattern(tokens.take(pa.array(rows)), ".")
+        numbers = pc.cast(pc.list_flatten(parts), pa.int64()).to_numpy().reshape(-1, 2)
+        values[rows] = (numbers[:, 0] << 16) | numbers[:, 1]
+    values[values > 0xFFFFFFFF] = -1
+    return values
+
+
+# Add hop_count and transit_as derived from Path where the frame doesn't have them
+def add_derived_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    if "Path" not in frame or ("hop_count" in frame and "transit_as" in frame):
+        return frame
+    paths = parse(frame["Path"])
+    frame = frame.copy()
+    if "hop_count" not in frame:
+        frame["hop_count"] = pd.array(paths.hop_count, dtype="Int64")
+    if "transit_as" not in frame:
+        frame["transit_as"] = pd.array(paths.transit_as, dtype="Int64")
+        frame.loc[paths.transit_as == NO_ASN, "transit_as"] = pd.NA
+    return frame
+
+
+# Inverted index from ASN to the rows whose path contains it
+# Each row is listed once per ASN, however often the ASN is prepended
+class ASNIndex:
+    def __init__(self, paths: ASPaths):
+        rows = paths.rows
+        order = np.lexsort((rows, paths.asns))
+        asns, rows = paths.asns[order], rows[order]
+        first = np.ones(len(asns), dtype=bool)
+        first[1:] = (asns[1:] != asns[:-1]) | (rows[1:] != rows[:-1])
+        asns, rows = asns[first], rows[first]
+
+        self.keys, starts = np.unique(asns, return_index=True)
+        self.starts = np.append(starts, len(rows)).astype(np.int64)
+        self.rows = rows
+        for array in (self.keys, self.starts, self.rows):
+            array.setflags(write=False)
+
+    # Rows whose path contains the ASN, in row order
+    def routes(self, asn: int) -> np.ndarray:
+        position = int(np.searchsorted(self.keys, asn))
+        if position == len(self.keys) or self.keys[position] != asn:
+            return self.rows[:0]
+        return self.rows[self.starts[position]:self.starts[position + 1]]
+
+    # Number of routes containing each ASN, largest first
+    def route_counts(self) -> pd.Series:
+        counts = pd.Series(np.diff(self.starts), index=pd.Index(self.keys.astype(np.int64), name="ASN"))
+        return counts.sort_values(ascending=False, kind="stable")
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.keys, self.starts, self.rows))
@@ -0,0 +1,280 @@
+# Storage backends behind the page loaders
+#
+# A backend answers the questions the pages ask of the route table: a summary of
+# aggregates (see bgp/summary.py), the number of rows matching a filter and one
+# page of those rows. SQL backends also return the rows in bounded chunks, from
+# which bgp.data assembles the in-memory table of the pages that index it. Two
+# implementations cover the three storages:
+#
+#   ColumnarBackend  the CSV through its memory-mapped Arrow cache (the default)
+#   SQLBackend       a database filled by bgp.ingest: SQLite locally (sqlite_pool)
+#                    or MySQL in production (mysql_pool)
+#
+# SQL backends run filters as parameterized WHERE clauses with LIMIT/OFFSET and
+# compute every aggregate with GROUP BY in the database (the summary, and the
+# cells of the statistics cube), so only counts and the visible page are
+# transferred. Connections come from a ConnectionPool and are
+# reused across queries and sessions instead of being opened per call.
+#
+# SQL backends also read the snapshots and route changes written by bgp.snapshot.
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+import pandas as pd
+
+from bgp import cache, cube, ingest, parser, query, snapshot, summary
+
+# Connections kept open per pool
+DEFAULT_POOL_SIZE = 4
+
+# Seconds to wait for a free connection before giving up
+POOL_TIMEOUT = 30
+
+# Rows fetched from the database at a time when reading chunks
+DEFAULT_FETCH_SIZE = 10_000
+
+# Columns returned for table rows
+TABLE_COLUMNS = parser.COLUMNS + ["hop_count", "transit_as"]
+
+
+# Pool of open DB-API connections, created on demand up to `size`
+class ConnectionPool:
+    def __init__(self, connect: Callable[[], object], size: int = DEFAULT_POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self._connect = connect
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._timeout = timeout
+
+    # Borrow a connection for the duration of a `with` block
+    # A connection that raised is closed rather than returned, since it may be
+    # left in a broken transaction or lost its server session
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise TimeoutError("No free database connection")
+        try:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+            try:
+                yield connection
+            except BaseException:
+                connection.close()
+                raise
+            self._idle.put(connection)
+        finally:
+            self._slots.release()
+
+    # Close every idle connection
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# Placeholder style and cursor options of a database driver
+@dataclass(frozen=True)
+class Dialect:
+    placeholder: str
+    # Column giving the insertion order, so pages are stable (None if there is none)
+    order_by: str | None = None
+    # Keyword arguments for connection.cursor(), e.g. server-side prepared statements
+    cursor_options: tuple[tuple[str, object], ...] = ()
+
+
+SQLITE = Dialect("?", order_by="rowid")
+MYSQL = Dialect("%s", order_by="id", cursor_options=(("prepared", True),))
+
+
+# WHERE clause and parameters for a filter
+def where_clause(route_filter: query.RouteFilter, placeholder: str) -> tuple[str, list]:
+    conditions, parameters = [], []
+
+    def add(condition: str, *values) -> None:
+        conditions.append(condition)
+        parameters.extend(values)
+
+    def any_of(column: str, values: tuple) -> None:
+        add(f"{column} IN ({', '.join([placeholder] * len(values))})", *values)
+
+    if route_filter.family is not None:
+        add(f"family = {placeholder}", route_filter.family)
+    if route_filter.min_length > 0:
+        add(f"prefix_length >= {placeholder}", route_filter.min_length)
+    if route_filter.max_length < 128:
+        add(f"prefix_length <= {placeholder}", route_filter.max_length)
+    if route_filter.transit_as:
+        any_of("transit_as", tuple(int(asn) for asn in route_filter.transit_as))
+    if route_filter.next_hops:
+        any_of("NextHop", route_filter.next_hops)
+    if route_filter.min_locprf is not None:
+        add(f"LocPrf >= {placeholder}", route_filter.min_locprf)
+    if route_filter.max_locprf is not None:
+        add(f"LocPrf <= {placeholder}", route_filter.max_locprf)
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", parameters
+
+
+# Route table in a database written by bgp.ingest
+class SQLBackend:
+    def __init__(self, pool: ConnectionPool, dialect: Dialect, table: str = ingest.TABLE):
+        self.pool = pool
+        self.dialect = dialect
+        self.table = table
+
+    # Run a query and return all result rows
+    def _fetch_all(self, sql: str, parameters: list | tuple = ()) -> list[tuple]:
+        with self.pool.connection() as connection:
+            cursor = connection.cursor(**dict(self.dialect.cursor_options))
+            try:
+                cursor.execute(sql, tuple(parameters))
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def _order_by(self) -> str:
+        return f" ORDER BY {self.dialect.order_by}" if self.dialect.order_by else ""
+
+    # Number of rows matching a filter
+    def count(self, route_filter: query.RouteFilter = query.RouteFilter()) -> int:
+        where, parameters = where_clause(route_filter, self.dialect.placeholder)
+        return int(self._fetch_all(f"SELECT COUNT(*) FROM {self.table}{where}", parameters)[0][0])
+
+    # One page of the rows matching a filter
+    def page(self, route_filter: query.RouteFilter, number: int, size: int) -> pd.DataFrame:
+        where, parameters = where_clause(route_filter, self.dialect.placeholder)
+        placeholder = self.dialect.placeholder
+        rows = self._fetch_all(
+            f"SELECT {', '.join(TABLE_COLUMNS)} FROM {self.table}{where}{self._order_by()}"
+            f" LIMIT {placeholder} OFFSET {placeholder}",
+            parameters + [size, number * size],
+        )
+        return pd.DataFrame(rows, columns=TABLE_COLUMNS)
+
+    # Rows matching a filter in DataFrames of at most `chunk_size` rows
+    # Rows are fetched from the cursor as they are consumed, so memory stays bounded
+    def iter_chunks(self, chunk_size: int = DEFAULT_FETCH_SIZE,
+                    route_filter: query.RouteFilter = query.RouteFilter()) -> Iterator[pd.DataFrame]:
+        where, parameters = where_clause(route_filter, self.dialect.placeholder)
+        with self.pool.connection() as connection:
+            cursor = connection.cursor(**dict(self.dialect.cursor_options))
+            try:
+                cursor.execute(f"SELECT {', '.join(TABLE_COLUMNS)} FROM {self.table}{where}{self._order_by()}",
+                               tuple(parameters))
+                while rows := cursor.fetchmany(chunk_size):
+                    yield pd.DataFrame(rows, columns=TABLE_COLUMNS)
+            finally:
+                cursor.close()
+
+    # Sorted distinct values of a column
+    def distinct_values(self, column: str) -> list:
+        rows = self._fetch_all(f"SELECT DISTINCT {column} FROM {self.table} WHERE {column} IS NOT NULL ORDER BY {column}")
+        return [row[0] for row in rows]
+
+    # Count of rows per combination of the given columns, with NULL as -1
+    def group_counts(self, columns: list[str], where: str = "") -> list[list[int]]:
+        keys = ", ".join(f"COALESCE({column}, -1)" for column in columns)
+        rows = self._fetch_all(f"SELECT {keys}, COUNT(*) FROM {self.table}{where} GROUP BY {keys}")
+        return [[int(value) for value in row] for row in rows]
+
+    # Snapshots recorded by bgp.snapshot, oldest first
+    def snapshots(self) -> pd.DataFrame:
+        columns = ["snapshot_id", "taken_at", "source", "routes", "added", "withdrawn", "changed"]
+        rows = self._fetch_all(f"SELECT {', '.join(columns)} FROM {snapshot.SNAPSHOTS_TABLE} ORDER BY snapshot_id")
+        return pd.DataFrame(rows, columns=columns)
+
+    # Number of changes of a snapshot per change type and value of a column
+    def change_counts(self, snapshot_id: int, column: str) -> pd.DataFrame:
+        placeholder = self.dialect.placeholder
+        rows = self._fetch_all(
+            f"SELECT change_type, {column}, COUNT(*) FROM {snapshot.CHANGES_TABLE}"
+            f" WHERE snapshot_id = {placeholder} GROUP BY change_type, {column}", (snapshot_id,))
+        return pd.DataFrame(rows, columns=["change_type", column, "count"])
+
+    # Changes of a snapshot, at most `limit` rows
+    def changes(self, snapshot_id: int, limit: int) -> pd.DataFrame:
+        placeholder = self.dialect.placeholder
+        columns = ["change_type"] + TABLE_COLUMNS
+        rows = self._fetch_all(
+            f"SELECT {', '.join(columns)} FROM {snapshot.CHANGES_TABLE}"
+            f" WHERE snapshot_id = {placeholder} LIMIT {placeholder}", (snapshot_id, limit))
+        return pd.DataFrame(rows, columns=columns)
+
+    # Aggregates of the table, computed with GROUP BY queries in the database
+    def summary(self) -> summary.Summary:
+        null_counts = ", ".join(f"SUM(CASE WHEN {column} IS NULL THEN 1 ELSE 0 END)" for column in TABLE_COLUMNS)
+        rows, *nulls = self._fetch_all(f"SELECT COUNT(*), {null_counts} FROM {self.table}")[0]
+        values = {column: self.group_counts([column], f" WHERE {column} >= 0") for column in summary.VALUE_COLUMNS}
+        return summary.Summary.from_dict({
+            "rows": int(rows),
+            "dtypes": {column: cache.CSV_DTYPES[column] for column in TABLE_COLUMNS},
+            "nulls": {column: int(count or 0) for column, count in zip(TABLE_COLUMNS, nulls)},
+            "groups": self.group_counts(["family", "transit_as"]),
+            "prefix_lengths": self.group_counts(["family", "prefix_length"]),
+            "values": values,
+            "digest": "",
+        })
+
+    # Route counts per combination of the cube's dimensions (see bgp/cube.py)
+    def cube(self) -> cube.Cube:
+        keys = ("family, COALESCE(transit_as, -1), COALESCE(NextHop, ''), COALESCE(LocPrf, -1), "
+                "COALESCE(hop_count, -1), prefix_length")
+        rows = self._fetch_all(f"SELECT {keys}, COUNT(*) FROM {self.table} GROUP BY {keys}")
+        groups = pd.DataFrame(rows, columns=cube.DIMENSIONS + ["count"])
+        return cube.Cube.from_groups(groups.astype({dimension: "int64" for dimension in cube.DIMENSIONS
+                                                    if dimension != "NextHop"}))
+
+
+# Route table in the CSV file, read through its memory-mapped columnar cache
+# The shared bgp.data.Dataset and Summary of the file are fetched from the given
+# loaders on use, so a page asking only for the summary never loads the table
+class ColumnarBackend:
+    def __init__(self, load_dataset: Callable[[], object], load_summary: Callable[[], summary.Summary]):
+        self.load_dataset = load_dataset
+        self.load_summary = load_summary
+
+    def count(self, route_filter: query.RouteFilter = query.RouteFilter()) -> int:
+        return len(self.load_dataset().filter_rows(route_filter))
+
+    def page(self, route_filter: query.RouteFilter, number: int, size: int) -> pd.DataFrame:
+        dataset = self.load_dataset()
+        return query.page(dataset.frame, dataset.filter_rows(route_filter), number, size)
+
+    # Sorted distinct values of a column (the categories of categorical columns)
+    def distinct_values(self, column: str) -> list:
+        values = self.load_dataset().frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return sorted(values.cat.categories.tolist())
+        return sorted(values.dropna().unique().tolist())
+
+    def summary(self) -> summary.Summary:
+        return self.load_summary()
+
+
+# Pool of connections to a SQLite database
+# Connections may be used by any thread, one at a time (the pool guarantees that)
+def sqlite_pool(database: str = ingest.DEFAULT_DATABASE, size: int = DEFAULT_POOL_SIZE) -> ConnectionPool:
+    # Create the tables once, so queries work on an empty database
+    snapshot.connect_sqlite(database).close()
+    return ConnectionPool(lambda: sqlite3.connect(database, check_same_thread=False), size)
+
+
+# Pool of connections to a MySQL database; `config` holds the connect() arguments
+# (host, user, password, database). Needs the mysql-connector-python package.
+def mysql_pool(config: dict, size: int = DEFAULT_POOL_SIZE) -> ConnectionPool:
+    import mysql.connector
+
+    # Create or migrate the tables once (see ingest.prepare_mysql)
+    connection = mysql.connector.connect(**config)
+    try:
+        ingest.prepare_mysql(connection)
+        snapshot.create_tables(connection)
+    finally:
+        connection.close()
+    return ConnectionPool(lambda: mysql.connector.connect(**config), size)
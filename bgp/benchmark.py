@@ -0,0 +1,254 @@
+# End-to-end benchmarks of the data layer and the page computations
+#
+# Usage:
+#   python -m bgp.benchmark --routes 100000 1000000 --output benchmarks/run.json
+#   python -m bgp.benchmark --compare benchmarks/before.json benchmarks/after.json
+#
+# For every size a synthetic dump is generated (bgp.synthetic, so runs with the
+# same seed measure the same data) into a temporary directory. Each stage is then
+# run `repeats` times on fresh objects, so no stage is served from a cache filled
+# by an earlier run of itself:
+#
+#   parse             bgp.parser on the .RR dump
+#   ingest            loading the .RR dump into a new SQLite table (bgp.ingest)
+#   parallel_ingest   the same on INGEST_WORKERS processes
+#   cache_build       the Arrow cache of the CSV (bgp.cache)
+#   load              reading the cache and ordering rows by family (bgp.data)
+#   family_split      packing Network and slicing the IPv4/IPv6 rows
+#   transit_filter    rows and per-family counts of the transit providers
+#   hop_histogram     routes per hop_count
+#   summary_build     the summary behind the analytics page (bgp.summary)
+#   profile_build     the column profile of its Basic Data Analysis (bgp.profiler)
+#   cube_build        the statistics cube of its drill-down (bgp.cube)
+#   cube_pivot        one filtered two-dimensional drill-down of the cube
+#   analytics_page    what analytics.py computes from the summary
+#   view_data_page    a filtered count and one page, as view_data.py asks for them
+#   anomaly_fit       fitting the Isolation Forest (bgp.anomaly)
+#   anomaly_score     scoring the eligible routes
+#   ai_page           the aggregated scatter plot data of ai_implementation.py
+#
+# Results are written as JSON with every run's seconds, their minimum and median,
+# and the environment; --compare reports the ratio of the medians of two result
+# files and exits with status 1 when a stage got slower than the threshold. Only
+# a slowdown beyond the noise counts: the stage takes at least
+# MIN_COMPARED_SECONDS and every run after is slower than every run before. The
+# single generate run is not compared.
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from bgp import anomaly, cache, cube, data, density, ingest, parser, prefix, profiler, query, summary, synthetic
+
+# Sizes benchmarked by default
+DEFAULT_ROUTES = [100_000, 1_000_000]
+
+# Runs per stage
+DEFAULT_REPEATS = 3
+
+# Relative slowdown of a median reported as a regression by --compare
+DEFAULT_THRESHOLD = 0.10
+
+# Stages whose median is below this in both files are never regressions (timer
+# and scheduling noise alone exceed the threshold at that scale)
+MIN_COMPARED_SECONDS = 0.010
+
+# Stages left out of --compare (generate runs once, and is not a page computation)
+UNCOMPARED_STAGES = {"generate"}
+
+# Processes of the parallel_ingest stage
+INGEST_WORKERS = os.cpu_count() or 1
+
+# Transit providers of the synthetic dumps (see bgp.synthetic)
+TRANSIT_AS_NUMBERS = [3356, 174, 1299, 2914, 3257, 6762]
+
+# Filter of the view_data_page stage
+VIEW_FILTER = query.RouteFilter(family=prefix.IPV4, transit_as=(3356, 174), min_length=24)
+VIEW_PAGE_SIZE = 100
+
+# Filters of the cube_pivot stage
+CUBE_FILTERS = {"family": [prefix.IPV6], "transit_as": [3356]}
+
+
+# Run a stage `repeats` times; `setup` builds the argument of each run untimed
+def _time(stage: Callable, repeats: int, setup: Callable | None = None) -> dict:
+    seconds = []
+    for _ in range(repeats):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        stage(argument) if setup else stage()
+        seconds.append(time.perf_counter() - start)
+    return {"seconds": seconds, "min": min(seconds), "median": statistics.median(seconds)}
+
+
+# A Dataset with no derived views computed yet
+def _fresh_dataset(csv_path: str, frame: pd.DataFrame) -> data.Dataset:
+    return data.Dataset(csv_path, "", frame)
+
+
+def _analytics_page(route_summary: summary.Summary) -> None:
+    route_summary.transit_as_counts()
+    route_summary.transit_counts(TRANSIT_AS_NUMBERS)
+    for family in (prefix.IPV4, prefix.IPV6):
+        route_summary.family_count(family)
+        route_summary.length_histogram(family)
+    route_summary.value_counts("hop_count")
+    route_summary.info()
+    route_summary.describe()
+
+
+# Ingest a dump into a new SQLite database in `directory`
+def _ingest(rr_path: str, directory: str, workers: int) -> None:
+    database = os.path.join(directory, "ingest.db")
+    connection = ingest.connect_sqlite(database)
+    try:
+        ingest.ingest_files([rr_path], connection, workers=workers)
+    finally:
+        connection.close()
+        os.remove(database)
+
+
+def _view_data_page(dataset: data.Dataset) -> None:
+    rows = dataset.filter_rows(VIEW_FILTER)
+    query.page_count(len(rows), VIEW_PAGE_SIZE)
+    query.page(dataset.frame, rows, 0, VIEW_PAGE_SIZE)
+
+
+# Benchmark every stage on a generated dump of `routes` routes
+def run(routes: int, repeats: int = DEFAULT_REPEATS, seed: int = 0, directory: str | None = None) -> dict:
+    with tempfile.TemporaryDirectory(dir=directory) as temporary:
+        rr_path = os.path.join(temporary, "routes.RR")
+        csv_path = os.path.join(temporary, "routes.csv")
+        start = time.perf_counter()
+        synthetic.write(routes, rr_path, csv_path, seed)
+        results = {"generate": {"seconds": [time.perf_counter() - start]}}
+
+        results["parse"] = _time(lambda: parser.parse_file(rr_path), repeats)
+        results["ingest"] = _time(lambda: _ingest(rr_path, temporary, 1), repeats)
+        results["parallel_ingest"] = _time(lambda: _ingest(rr_path, temporary, INGEST_WORKERS), repeats)
+        results["cache_build"] = _time(lambda: cache.build_cache(csv_path), repeats)
+
+        def load() -> data.Dataset:
+            frame, networks = data._order_by_family(cache.load_table(csv_path))
+            return data.Dataset(csv_path, "", frame, networks)
+
+        results["load"] = _time(load, repeats)
+        frame = load().frame
+
+        def family_split(dataset: data.Dataset) -> None:
+            dataset.ipv4, dataset.ipv6
+
+        results["family_split"] = _time(family_split, repeats, lambda: _fresh_dataset(csv_path, frame))
+        dataset = load()
+        results["transit_filter"] = _time(lambda d: d.transit_counts(TRANSIT_AS_NUMBERS), repeats,
+                                          lambda: data.Dataset(csv_path, "", dataset.frame, dataset.networks))
+        results["hop_histogram"] = _time(lambda: dataset.frame["hop_count"].value_counts().sort_index(), repeats)
+        results["summary_build"] = _time(lambda: summary.build(csv_path), repeats)
+        results["profile_build"] = _time(lambda: profiler.build(csv_path), repeats)
+        results["cube_build"] = _time(lambda: cube.build(csv_path), repeats)
+        route_cube = cube.build(csv_path)
+        results["cube_pivot"] = _time(lambda: route_cube.pivot("hop_count", "LocPrf", CUBE_FILTERS), repeats)
+        route_summary = summary.build(csv_path)
+        results["analytics_page"] = _time(_analytics_page, repeats, lambda: summary.Summary.from_dict(route_summary.to_dict()))
+        results["view_data_page"] = _time(_view_data_page, repeats,
+                                          lambda: data.Dataset(csv_path, "", dataset.frame, dataset.networks))
+
+        eligible = anomaly.eligible_rows(dataset.frame, TRANSIT_AS_NUMBERS)
+        features = anomaly.features(dataset.frame.iloc[eligible])
+        results["anomaly_fit"] = _time(lambda: anomaly.IsolationForest.fit(features), repeats)
+        model = anomaly.IsolationForest.fit(features)
+        results["anomaly_score"] = _time(lambda: anomaly.score(model, features), repeats)
+        scored = dataset.frame.iloc[eligible]
+        anomalous = anomaly.score(model, features) > model.offset
+        results["ai_page"] = _time(lambda: density.aggregate(scored["LocPrf"][~anomalous],
+                                                             scored["hop_count"][~anomalous]), repeats)
+
+    for result in results.values():
+        result.setdefault("min", min(result["seconds"]))
+        result.setdefault("median", statistics.median(result["seconds"]))
+    return results
+
+
+def environment() -> dict:
+    return {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+# Whether a stage result got slower than `threshold` beyond the noise
+def _regressed(before: dict, after: dict, threshold: float) -> bool:
+    if max(before["median"], after["median"]) < MIN_COMPARED_SECONDS:
+        return False
+    if after["median"] <= before["median"] * (1 + threshold):
+        return False
+    return min(after["seconds"]) > max(before["seconds"])
+
+
+# Median seconds of every stage present in both result files, as (size, stage,
+# before, after, ratio, regressed) rows, and whether any stage regressed
+def compare(before: dict, after: dict, threshold: float = DEFAULT_THRESHOLD) -> tuple[list[tuple], bool]:
+    rows = []
+    for size, stages in after["results"].items():
+        for stage, result in stages.items():
+            previous = before["results"].get(size, {}).get(stage)
+            if previous is None or stage in UNCOMPARED_STAGES:
+                continue
+            ratio = result["median"] / previous["median"] if previous["median"] else float("inf")
+            rows.append((size, stage, previous["median"], result["median"], ratio,
+                         _regressed(previous, result, threshold)))
+    return rows, any(row[-1] for row in rows)
+
+
+def main(argv: list[str] | None = None) -> None:
+    argument_parser = argparse.ArgumentParser(description="Benchmark the data layer and page computations")
+    argument_parser.add_argument("--routes", type=int, nargs="+", default=DEFAULT_ROUTES, help="dump sizes")
+    argument_parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="runs per stage")
+    argument_parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic dumps")
+    argument_parser.add_argument("--directory", help="where to write the temporary dumps")
+    argument_parser.add_argument("--output", help="JSON file to write the results to")
+    argument_parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    argument_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                 help="slowdown reported as a regression (0.10 = 10%%)")
+    args = argument_parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as before_file, open(args.compare[1]) as after_file:
+            rows, regressed = compare(json.load(before_file), json.load(after_file), args.threshold)
+        for size, stage, before, after, ratio, flagged in rows:
+            flag = "  REGRESSION" if flagged else ""
+            print(f"{size:>10} {stage:<16} {before:9.3f}s -> {after:9.3f}s  x{ratio:.2f}{flag}")
+        sys.exit(1 if regressed else 0)
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "seed": args.seed,
+        "repeats": args.repeats,
+        "environment": environment(),
+        "results": {},
+    }
+    for routes in args.routes:
+        report["results"][str(routes)] = results = run(routes, args.repeats, args.seed, args.directory)
+        for stage, result in results.items():
+            print(f"{routes:>10} {stage:<16} {result['median']:9.3f}s")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
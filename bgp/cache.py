@@ -0,0 +1,183 @@
+# Columnar on-disk cache for the route CSV files
+#
+# Usage (run once after the CSV is produced, the pages also rebuild it when stale):
+#   python -m bgp.cache data/data.csv
+#
+# The CSV is read once with explicit column types, converted to compact dtypes and
+# written next to it as an uncompressed Arrow IPC (Feather v2) file. Loading
+# memory-maps that file and reads only the requested columns; strings stay in the
+# mapped Arrow buffers instead of being copied into Python objects.
+import argparse
+import hashlib
+import os
+import time
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from bgp import aspath
+
+# Extension of the cache file written next to the CSV
+CACHE_EXTENSION = ".arrow"
+
+# Types used to read the route CSV without inference
+# Integer columns are read wide and narrowed in compact()
+CSV_DTYPES = {
+    "Network": "string[pyarrow]",
+    "NextHop": "string[pyarrow]",
+    "Metric": "Int64",
+    "LocPrf": "Int64",
+    "Weight": "Int64",
+    "Path": "string[pyarrow]",
+    "hop_count": "Int64",
+    "transit_as": "Int64",
+}
+
+# Columns narrowed to the smallest integer type that holds their values
+SMALL_INT_COLUMNS = ["LocPrf", "Weight", "hop_count"]
+
+# Low-cardinality columns stored as categoricals
+CATEGORY_COLUMNS = ["NextHop", "transit_as"]
+
+# Candidate integer types, smallest first
+_SMALL_INT_DTYPES = ["UInt8", "Int8", "UInt16", "Int16", "UInt32", "Int32", "Int64"]
+
+# Arrow types converted to pandas dtypes when loading, so columns keep the same
+# dtype whether or not they contain nulls
+_PANDAS_TYPES = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+    pa.uint8(): pd.UInt8Dtype(),
+    pa.uint16(): pd.UInt16Dtype(),
+    pa.uint32(): pd.UInt32Dtype(),
+    pa.uint64(): pd.UInt64Dtype(),
+    pa.string(): pd.StringDtype("pyarrow"),
+    pa.large_string(): pd.StringDtype("pyarrow"),
+}
+
+
+# Content hash of each file, keyed by (path, mtime, size)
+_digests: dict[tuple[str, int, int], str] = {}
+
+
+# Hash of the file content, recomputed only when mtime or size change
+def file_digest(path: str) -> str:
+    status = os.stat(path)
+    key = (path, status.st_mtime_ns, status.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+        # Forget older versions of the same file
+        for old_key in [old_key for old_key in _digests if old_key[0] == path]:
+            del _digests[old_key]
+        _digests[key] = digest
+    return digest
+
+
+# Location of the cache file for a CSV file (data/data.csv -> data/data.arrow)
+def cache_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + CACHE_EXTENSION
+
+
+# Smallest nullable integer dtype that holds every value of the column
+def _small_int_dtype(column: pd.Series) -> str:
+    if column.notna().sum() == 0:
+        return _SMALL_INT_DTYPES[0]
+    low, high = int(column.min()), int(column.max())
+    for dtype in _SMALL_INT_DTYPES:
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return dtype
+    return "Int64"
+
+
+# Convert the route columns to compact dtypes
+# Categorical NextHop/transit_as, narrow integers, nullable Metric, Arrow strings
+def compact(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = frame.copy()
+    for column, dtype in CSV_DTYPES.items():
+        if column not in frame:
+            continue
+        if column in CATEGORY_COLUMNS:
+            frame[column] = frame[column].astype(dtype).astype("category")
+        elif column in SMALL_INT_COLUMNS:
+            values = frame[column].astype("Int64")
+            frame[column] = values.astype(_small_int_dtype(values))
+        elif column == "Metric":
+            frame[column] = frame[column].astype("Int64").astype("UInt32")
+        else:
+            frame[column] = frame[column].astype(dtype)
+    return frame
+
+
+# Write a DataFrame to a cache file (written to a temporary file and moved in place
+# so a page never maps a half-written cache)
+def write_cache(frame: pd.DataFrame, path: str) -> None:
+    table = pa.Table.from_pandas(compact(frame), preserve_index=False)
+    temporary_path = path + ".tmp"
+    feather.write_feather(table, temporary_path, compression="uncompressed")
+    os.replace(temporary_path, path)
+
+
+# Memory-map a cache file and read only the given columns
+def read_cache(path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas(types_mapper=_PANDAS_TYPES.get)
+
+
+# Check whether the cache file exists and is newer than the CSV
+def is_fresh(csv_path: str) -> bool:
+    path = cache_path(csv_path)
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(csv_path)
+
+
+# Read the CSV with explicit types and write its cache file
+# hop_count and transit_as are derived from Path when the CSV doesn't have them
+def build_cache(csv_path: str) -> str:
+    header = pd.read_csv(csv_path, nrows=0).columns
+    dtypes = {column: dtype for column, dtype in CSV_DTYPES.items() if column in header}
+    frame = aspath.add_derived_columns(pd.read_csv(csv_path, dtype=dtypes))
+    path = cache_path(csv_path)
+    write_cache(frame, path)
+    return path
+
+
+# Load a route CSV through its cache, rebuilding the cache when the CSV is newer
+def load_table(csv_path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    if not is_fresh(csv_path):
+        build_cache(csv_path)
+    return read_cache(cache_path(csv_path), columns)
+
+
+# Iterate over a route CSV in DataFrame chunks of `rows` rows, through its cache
+# Only one chunk at a time is converted out of the memory-mapped file
+def iter_table(csv_path: str, rows: int, columns: list[str] | None = None) -> Iterator[pd.DataFrame]:
+    if not is_fresh(csv_path):
+        build_cache(csv_path)
+    table = feather.read_table(cache_path(csv_path), columns=columns, memory_map=True)
+    for start in range(0, table.num_rows, rows):
+        yield table.slice(start, rows).to_pandas(types_mapper=_PANDAS_TYPES.get)
+
+
+def main(argv: list[str] | None = None) -> None:
+    argument_parser = argparse.ArgumentParser(description="Build the columnar cache for route CSV files")
+    argument_parser.add_argument("files", nargs="+", help="CSV files, e.g. data/data.csv")
+    args = argument_parser.parse_args(argv)
+
+    for csv_path in args.files:
+        start = time.perf_counter()
+        path = build_cache(csv_path)
+        print(f"{csv_path} -> {path} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
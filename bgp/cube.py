@@ -0,0 +1,214 @@
+# Precomputed route counts over several dimensions, for drill-down and pivoting
+#
+# Usage (after the CSV is produced; the analytics page also builds it when stale):
+#   python -m bgp.cube data/data.csv
+#
+# The cube holds the number of routes per distinct combination (cell) of address
+# family, transit_as, NextHop, LocPrf, hop_count and prefix length. Each dimension
+# is stored as its sorted distinct values (labels) plus one small integer code per
+# cell, so a question like "IPv6 routes via AS X by hop count and LocPrf" is a mask
+# over the code arrays and one bincount over the cells: milliseconds, whatever the
+# number of routes. Missing values are -1 ("" for NextHop). The cube is built
+# chunk by chunk from the columnar cache and stored as a .npz file next to the CSV,
+# tagged with the CSV content hash.
+import argparse
+import os
+import time
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from bgp import cache, prefix, summary
+
+# Extension of the cube file written next to the CSV
+CUBE_EXTENSION = ".cube.npz"
+
+# Dimensions of the cube, in drill-down order
+DIMENSIONS = ["family", "transit_as", "NextHop", "LocPrf", "hop_count", "length"]
+
+# Names shown for the dimensions
+DIMENSION_NAMES = {
+    "family": "Address family",
+    "transit_as": "Transit AS",
+    "NextHop": "Next hop",
+    "LocPrf": "LocPrf",
+    "hop_count": "Hop count",
+    "length": "Prefix length",
+}
+
+# Names shown for the address families
+FAMILY_NAMES = {prefix.IPV4: "IPv4", prefix.IPV6: "IPv6", 0: "Unparsable"}
+
+# Columns read from the columnar cache
+SOURCE_COLUMNS = ["Network", "NextHop", "LocPrf", "hop_count", "transit_as"]
+
+
+# Location of the cube file for a CSV file (data/data.csv -> data/data.cube.npz)
+def cube_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + CUBE_EXTENSION
+
+
+# Smallest unsigned integer type holding codes below `size`
+def _code_dtype(size: int) -> type:
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if size <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint64
+
+
+# Route counts per cell, with integer-coded dimensions
+class Cube:
+    def __init__(self, labels: dict[str, np.ndarray], codes: dict[str, np.ndarray], counts: np.ndarray,
+                 digest: str = ""):
+        self.labels = labels
+        self.codes = codes
+        self.counts = counts
+        self.digest = digest
+        for array in (*labels.values(), *codes.values(), counts):
+            array.setflags(write=False)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    # Number of routes in the cube
+    @property
+    def rows(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(array.nbytes for array in (*self.labels.values(), *self.codes.values(), self.counts)))
+
+    # Cube of a frame with one column per dimension (values, not codes) and a
+    # count column; repeated combinations are added up
+    @classmethod
+    def from_groups(cls, groups: pd.DataFrame, digest: str = "") -> "Cube":
+        labels, codes = {}, {}
+        for dimension in DIMENSIONS:
+            dimension_codes, dimension_labels = pd.factorize(groups[dimension], sort=True)
+            # NextHop labels as a fixed width string array, which .npz files store without pickling
+            labels[dimension] = np.asarray(dimension_labels, dtype=str if dimension == "NextHop" else np.int64)
+            codes[dimension] = dimension_codes.astype(_code_dtype(len(dimension_labels)))
+        cells = pd.DataFrame(codes).assign(count=groups["count"].to_numpy(dtype=np.int64))
+        cells = cells.groupby(DIMENSIONS, sort=True)["count"].sum().reset_index()
+        return cls(labels, {dimension: cells[dimension].to_numpy() for dimension in DIMENSIONS},
+                   cells["count"].to_numpy(dtype=np.int64), digest)
+
+    # Positions in labels[dimension] of the given values (values not in the cube are skipped)
+    def label_codes(self, dimension: str, values: Iterable) -> np.ndarray:
+        labels = self.labels[dimension]
+        values = np.asarray(list(values), dtype=labels.dtype)
+        positions = np.searchsorted(labels, values)
+        found = positions < len(labels)
+        found[found] = labels[positions[found]] == values[found]
+        return positions[found]
+
+    # Cells matching every filter ({dimension: values}; empty or missing = all)
+    def _mask(self, filters: dict[str, Iterable] | None) -> np.ndarray | None:
+        mask = None
+        for dimension, values in (filters or {}).items():
+            values = list(values)
+            if not values:
+                continue
+            selected = np.zeros(len(self.labels[dimension]), dtype=bool)
+            selected[self.label_codes(dimension, values)] = True
+            matches = selected[self.codes[dimension]]
+            mask = matches if mask is None else mask & matches
+        return mask
+
+    # Route counts of the matching cells by one dimension, or by two as a table
+    # (rows x columns); labels without routes are left out
+    def pivot(self, rows: str, columns: str | None = None,
+              filters: dict[str, Iterable] | None = None) -> pd.DataFrame:
+        mask = self._mask(filters)
+        counts = self.counts if mask is None else self.counts[mask]
+        row_codes = self.codes[rows] if mask is None else self.codes[rows][mask]
+        row_labels = self.labels[rows]
+        if columns is None or columns == rows:
+            totals = np.bincount(row_codes, weights=counts, minlength=len(row_labels)).astype(np.int64)
+            present = totals > 0
+            return pd.DataFrame({"Routes": totals[present]},
+                                index=pd.Index(row_labels[present], name=rows))
+        column_codes = self.codes[columns] if mask is None else self.codes[columns][mask]
+        column_labels = self.labels[columns]
+        keys = row_codes.astype(np.int64) * len(column_labels) + column_codes
+        table = np.bincount(keys, weights=counts, minlength=len(row_labels) * len(column_labels))
+        table = table.astype(np.int64).reshape(len(row_labels), len(column_labels))
+        present_rows, present_columns = table.any(axis=1), table.any(axis=0)
+        return pd.DataFrame(table[present_rows][:, present_columns],
+                            index=pd.Index(row_labels[present_rows], name=rows),
+                            columns=pd.Index(column_labels[present_columns], name=columns))
+
+    # Number of routes matching the filters
+    def count(self, filters: dict[str, Iterable] | None = None) -> int:
+        mask = self._mask(filters)
+        return int(self.counts.sum() if mask is None else self.counts[mask].sum())
+
+    def save(self, path: str) -> None:
+        temporary_path = path + ".tmp.npz"
+        arrays = {f"labels_{dimension}": labels for dimension, labels in self.labels.items()}
+        arrays.update({f"codes_{dimension}": codes for dimension, codes in self.codes.items()})
+        np.savez(temporary_path, counts=self.counts, digest=self.digest, **arrays)
+        os.replace(temporary_path, path)
+
+    # Load a saved cube, or None if the file is missing or unreadable
+    @classmethod
+    def load(cls, path: str) -> "Cube | None":
+        try:
+            with np.load(path) as arrays:
+                return cls({dimension: arrays[f"labels_{dimension}"] for dimension in DIMENSIONS},
+                           {dimension: arrays[f"codes_{dimension}"] for dimension in DIMENSIONS},
+                           arrays["counts"], str(arrays["digest"]))
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+# Text of dimension values for display (family names, ASxxx, "-" for missing)
+def label_text(dimension: str, values) -> list[str]:
+    if dimension == "family":
+        return [FAMILY_NAMES.get(int(value), str(value)) for value in values]
+    if dimension == "NextHop":
+        return [str(value) or "-" for value in values]
+    if dimension == "transit_as":
+        return [f"AS{int(value)}" if int(value) >= 0 else "-" for value in values]
+    return [str(int(value)) if int(value) >= 0 else "-" for value in values]
+
+
+# Dimension values of one chunk of route rows, with a count column
+def groups_of(frame: pd.DataFrame) -> pd.DataFrame:
+    networks = prefix.pack(frame["Network"])
+    values = pd.DataFrame({
+        "family": networks.family.astype(np.int64),
+        "transit_as": summary._to_int(frame["transit_as"]),
+        "NextHop": frame["NextHop"].astype(object).fillna("").to_numpy(),
+        "LocPrf": summary._to_int(frame["LocPrf"]),
+        "hop_count": summary._to_int(frame["hop_count"]),
+        "length": networks.length.astype(np.int64),
+    })
+    return values.value_counts(sort=False).reset_index(name="count")
+
+
+# Build the cube of a route CSV chunk by chunk from its columnar cache
+def build(csv_path: str, digest: str = "") -> Cube:
+    groups = [groups_of(frame) for frame in cache.iter_table(csv_path, summary.BATCH_ROWS, SOURCE_COLUMNS)]
+    if not groups:
+        groups = [pd.DataFrame({**{dimension: [] for dimension in DIMENSIONS}, "count": []})]
+    return Cube.from_groups(pd.concat(groups, ignore_index=True), digest)
+
+
+def main(argv: list[str] | None = None) -> None:
+    argument_parser = argparse.ArgumentParser(description="Build the route statistics cube of route CSV files")
+    argument_parser.add_argument("files", nargs="+", help="CSV files, e.g. data/data.csv")
+    args = argument_parser.parse_args(argv)
+
+    for csv_path in args.files:
+        start = time.perf_counter()
+        route_cube = build(csv_path, cache.file_digest(csv_path))
+        route_cube.save(cube_path(csv_path))
+        print(f"{csv_path} -> {cube_path(csv_path)} ({len(route_cube):,} cells, {route_cube.nbytes:,} bytes) "
+              f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
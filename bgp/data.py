@@ -0,0 +1,515 @@
+# Shared data access for the dashboard pages
+#
+# Every page gets its DataFrames from here. Each dataset is loaded once per
+# process with st.cache_resource, so all pages and all user sessions reference the
+# same object instead of receiving their own copy (st.cache_data pickles a copy per
+# call). A dataset is reloaded only when its file content changes: the file's
+# mtime/size are checked on every rerun, and the content hash is recomputed only
+# when those change.
+#
+# Datasets are shared: pages must treat the frames and arrays as read-only.
+#
+# Every cache counts its calls and misses, and every loaded dataset reports its
+# size, to the metrics registry (bgp/metrics.py) shown on the admin page.
+import hashlib
+import os
+import threading
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from bgp import (anomaly, aspath, backend, cache, cube, density, ingest, live, lpm, metrics, prefix, profiler, query,
+                 summary)
+
+# Storage of the route table: "columnar" (data/data.csv through its cache),
+# "sqlite" (the database written by bgp.ingest) or "mysql" (connection settings
+# in the [mysql] section of .streamlit/secrets.toml)
+BACKEND = os.environ.get("BGP_BACKEND", "columnar")
+SQLITE_DATABASE = os.environ.get("BGP_DATABASE", ingest.DEFAULT_DATABASE)
+
+# Source of live BGP updates for the analytics page: "tcp://host:port" or a file
+# to tail (see bgp/live.py); without it the page shows the route table
+LIVE_SOURCE = os.environ.get("BGP_LIVE_SOURCE")
+
+# Seconds a database summary is reused before it is queried again
+DATABASE_SUMMARY_TTL = 60
+
+# Filter results kept per dataset for the raw data view
+FILTER_CACHE_ENTRIES = 16
+
+# Transit sets whose rows are kept per dataset (the transit set is editable, so
+# every set tried would otherwise stay in memory)
+TRANSIT_CACHE_ENTRIES = 4
+
+# Files used by the pages
+DATA_CSV = "data/data.csv"
+TRANSIT_ASN_FILE = "data/transitASN.txt"
+
+# Anomaly model of a MySQL route table (the other backends keep it next to their file)
+MYSQL_MODEL_FILE = "data/mysql" + anomaly.MODEL_EXTENSION
+
+# One loaded version of a route file with lazily derived views
+# Rows are ordered IPv4 first, then IPv6, then anything unparsable, so the family
+# subsets are row slices of the shared frame rather than filtered copies. Network
+# and NextHop are also available in packed numeric form (see bgp/prefix.py), and
+# Path as ragged ASN arrays (see bgp/aspath.py).
+class Dataset:
+    def __init__(self, path: str, digest: str, frame: pd.DataFrame,
+                 networks: prefix.PackedAddresses | None = None):
+        self.path = path
+        self.digest = digest
+        self.frame = frame
+        if networks is not None:
+            # Already packed while ordering the rows
+            self.networks = networks
+        self._transit_rows: dict[frozenset[int], np.ndarray] = {}
+        self._transit_rows_lock = threading.Lock()
+        self._filtered_rows: dict[query.RouteFilter, np.ndarray] = {}
+        self._filtered_rows_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    # Bytes held by the frame and every view derived so far
+    @property
+    def nbytes(self) -> int:
+        size = int(self.frame.memory_usage(index=True, deep=True).sum())
+        for name in ("networks", "next_hops", "prefix_index", "paths", "asn_index"):
+            if name in self.__dict__:
+                size += self.__dict__[name].nbytes
+        with self._filtered_rows_lock:
+            size += sum(rows.nbytes for rows in self._filtered_rows.values())
+        with self._transit_rows_lock:
+            size += sum(rows.nbytes for rows in self._transit_rows.values())
+        return size
+
+    # Packed Network column
+    @cached_property
+    def networks(self) -> prefix.PackedAddresses:
+        return prefix.pack(self.frame["Network"]).freeze()
+
+    # Packed NextHop column
+    @cached_property
+    def next_hops(self) -> prefix.PackedAddresses:
+        return prefix.pack(self.frame["NextHop"]).freeze()
+
+    # Longest prefix match index over the Network column
+    @cached_property
+    def prefix_index(self) -> lpm.PrefixIndex:
+        return lpm.PrefixIndex(self.networks)
+
+    # Path column as ragged ASN arrays
+    @cached_property
+    def paths(self) -> aspath.ASPaths:
+        return aspath.parse(self.frame["Path"]).freeze()
+
+    # Inverted index from ASN to the rows whose path contains it
+    @cached_property
+    def asn_index(self) -> aspath.ASNIndex:
+        return aspath.ASNIndex(self.paths)
+
+    # Number of IPv4 rows at the start of the frame
+    @cached_property
+    def ipv4_count(self) -> int:
+        if "Network" not in self.frame:
+            return 0
+        return int(np.count_nonzero(self.networks.family == prefix.IPV4))
+
+    # Number of IPv6 rows, which follow the IPv4 rows
+    @cached_property
+    def ipv6_count(self) -> int:
+        if "Network" not in self.frame:
+            return 0
+        return int(np.count_nonzero(self.networks.family == prefix.IPV6))
+
+    @cached_property
+    def ipv4(self) -> pd.DataFrame:
+        return self.frame.iloc[:self.ipv4_count]
+
+    @cached_property
+    def ipv6(self) -> pd.DataFrame:
+        return self.frame.iloc[self.ipv4_count:self.ipv4_count + self.ipv6_count]
+
+    # Row slice of each family
+    @cached_property
+    def family_rows(self) -> dict[int, tuple[int, int]]:
+        ipv6_end = self.ipv4_count + self.ipv6_count
+        return {prefix.IPV4: (0, self.ipv4_count), prefix.IPV6: (self.ipv4_count, ipv6_end)}
+
+    # Positions of the rows matching a filter
+    # The most recent results are shared by every session, so paging through a
+    # result only slices the positions
+    def filter_rows(self, route_filter: query.RouteFilter) -> np.ndarray:
+        with self._filtered_rows_lock:
+            rows = self._filtered_rows.pop(route_filter, None)
+        if rows is None:
+            rows = query.matching_rows(self.frame, self.networks, self.family_rows, route_filter)
+            rows.setflags(write=False)
+        with self._filtered_rows_lock:
+            # Reinserted last, so the least recently used result is evicted first
+            self._filtered_rows[route_filter] = rows
+            while len(self._filtered_rows) > FILTER_CACHE_ENTRIES:
+                del self._filtered_rows[next(iter(self._filtered_rows))]
+        return rows
+
+    # Number of prefixes of each length for one family (index = prefix length)
+    def length_histogram(self, family: int) -> np.ndarray:
+        return prefix.length_histogram(self.networks, family)
+
+    # Positions of the rows whose transit_as is in the given set
+    # The most recently used sets are shared by every session
+    def transit_rows(self, transit_as_numbers) -> np.ndarray:
+        key = frozenset(int(asn) for asn in transit_as_numbers)
+        with self._transit_rows_lock:
+            rows = self._transit_rows.pop(key, None)
+        if rows is None:
+            rows = np.flatnonzero(self.frame["transit_as"].isin(key).to_numpy(dtype=bool, na_value=False))
+            rows.setflags(write=False)
+        with self._transit_rows_lock:
+            # Reinserted last, so the least recently used set is evicted first
+            self._transit_rows[key] = rows
+            while len(self._transit_rows) > TRANSIT_CACHE_ENTRIES:
+                del self._transit_rows[next(iter(self._transit_rows))]
+        return rows
+
+    # Number of transit rows in the IPv4 and in the IPv6 part of the frame
+    def transit_counts(self, transit_as_numbers) -> tuple[int, int]:
+        rows = self.transit_rows(transit_as_numbers)
+        ipv4_end, ipv6_end = np.searchsorted(rows, [self.ipv4_count, self.ipv4_count + self.ipv6_count])
+        return int(ipv4_end), int(ipv6_end - ipv4_end)
+
+
+# Sort key putting IPv4 rows first, then IPv6, then unparsable networks
+_FAMILY_ORDER = np.array([2, 2, 2, 2, 0, 2, 1], dtype=np.uint8)
+
+
+# Order the rows by family, keeping the file order within each family
+def _order_by_family(frame: pd.DataFrame) -> tuple[pd.DataFrame, prefix.PackedAddresses | None]:
+    if "Network" not in frame:
+        return frame, None
+    networks = prefix.pack(frame["Network"])
+    key = _FAMILY_ORDER[networks.family]
+    if (key[1:] >= key[:-1]).all():
+        return frame, networks.freeze()
+    order = np.argsort(key, kind="stable")
+    return frame.take(order).reset_index(drop=True), networks.take(order).freeze()
+
+
+# Load one version of a file; the digest is part of the cache key so a changed
+# file gets a new entry while unchanged files are never reloaded
+@metrics.cache_requests("dataset")
+@st.cache_resource(max_entries=4, show_spinner="Loading data...")
+@metrics.cache_misses("dataset")
+def _load_dataset(path: str, digest: str) -> Dataset:
+    frame, networks = _order_by_family(cache.load_table(path))
+    dataset = Dataset(path, digest, frame, networks)
+    metrics.watch("dataset", f"{path}@{digest[:12]}", dataset)
+    return dataset
+
+
+# Current version of a dataset file
+def load_dataset(path: str) -> Dataset:
+    return _load_dataset(path, cache.file_digest(path))
+
+
+# Route table behind the analytics and raw data pages
+def load_routes() -> Dataset:
+    return load_dataset(DATA_CSV)
+
+
+# Summary of one version of a route file, read from its summary file when that
+# matches the content hash, otherwise built from the columnar cache and saved
+@metrics.cache_requests("summary")
+@st.cache_resource(max_entries=4, show_spinner="Summarizing data...")
+@metrics.cache_misses("summary")
+def _load_summary(path: str, digest: str) -> summary.Summary:
+    stored = summary.read(summary.summary_path(path))
+    if stored is not None and stored.digest == digest:
+        return stored
+    built = summary.build(path, digest)
+    summary.write(built, summary.summary_path(path))
+    return built
+
+
+# Precomputed aggregates of the route table behind the analytics page
+def load_summary(path: str = DATA_CSV) -> summary.Summary:
+    return _load_summary(path, cache.file_digest(path))
+
+
+# Column profile of one version of a route file, read from its profile file when
+# that matches the content hash, otherwise built in one streaming pass and saved
+@metrics.cache_requests("profile")
+@st.cache_resource(max_entries=4, show_spinner="Profiling data...")
+@metrics.cache_misses("profile")
+def _load_profile(path: str, digest: str) -> profiler.Profile:
+    stored = profiler.read(profiler.profile_path(path))
+    if stored is not None and stored.digest == digest:
+        return stored
+    built = profiler.build(path, digest, workers=os.cpu_count() or 1)
+    profiler.write(built, profiler.profile_path(path))
+    return built
+
+
+# Counts, nulls and statistics of every column of a route file (see bgp/profiler.py)
+def load_profile(path: str = DATA_CSV) -> profiler.Profile:
+    return _load_profile(path, cache.file_digest(path))
+
+
+@metrics.cache_requests("transit_asns")
+@st.cache_data(max_entries=4)
+@metrics.cache_misses("transit_asns")
+def _read_transit_asns(path: str, digest: str) -> list[int]:
+    with open(path, "r") as file:
+        return [int(line.strip()) for line in file if line.strip()]
+
+
+# Transit Autonomous System numbers, one per line
+def load_transit_asns(path: str = TRANSIT_ASN_FILE) -> list[int]:
+    return _read_transit_asns(path, cache.file_digest(path))
+
+
+# Save the transit AS numbers, one per line (moved in place so readers never see
+# a partial file); the next load_transit_asns() picks up the new content. An empty
+# set is refused: no route would be eligible for the anomaly model.
+def save_transit_asns(transit_as_numbers, path: str = TRANSIT_ASN_FILE) -> None:
+    if not len(transit_as_numbers):
+        raise ValueError("At least one transit AS number is needed")
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w") as file:
+        file.writelines(f"{int(asn)}\n" for asn in transit_as_numbers)
+    os.replace(temporary_path, path)
+
+
+# Connection pool shared by every session
+@st.cache_resource
+def _connection_pool(kind: str) -> backend.ConnectionPool:
+    if kind == "sqlite":
+        return backend.sqlite_pool(SQLITE_DATABASE)
+    return backend.mysql_pool(dict(st.secrets["mysql"]))
+
+
+# Backend serving the route table (see BACKEND)
+def load_backend() -> backend.ColumnarBackend | backend.SQLBackend:
+    if BACKEND == "columnar":
+        return backend.ColumnarBackend(load_routes, load_summary)
+    if BACKEND not in ("sqlite", "mysql"):
+        raise ValueError(f"Unknown BGP_BACKEND {BACKEND!r}")
+    dialect = backend.SQLITE if BACKEND == "sqlite" else backend.MYSQL
+    return backend.SQLBackend(_connection_pool(BACKEND), dialect)
+
+
+# Database holding the snapshots written by bgp.snapshot: MySQL when that is the
+# backend, otherwise the local SQLite database
+def load_snapshot_backend() -> backend.SQLBackend:
+    if BACKEND == "mysql":
+        return backend.SQLBackend(_connection_pool("mysql"), backend.MYSQL)
+    return backend.SQLBackend(_connection_pool("sqlite"), backend.SQLITE)
+
+
+# Aggregates computed in the database, shared by every session for a short while
+@metrics.cache_requests("database_summary")
+@st.cache_resource(ttl=DATABASE_SUMMARY_TTL, show_spinner="Summarizing data...")
+@metrics.cache_misses("database_summary")
+def _load_database_summary(kind: str) -> summary.Summary:
+    return load_backend().summary()
+
+
+# Aggregates of the route table from the configured backend
+def load_route_summary() -> summary.Summary:
+    if BACKEND == "columnar":
+        return load_summary()
+    return _load_database_summary(BACKEND)
+
+
+# Route table of the database read in chunks, shared by every session for a short
+# while like the database summary. The digest hashes the rows, so caches keyed on
+# it (scores, downloads) are only rebuilt when the table changed.
+@metrics.cache_requests("database_dataset")
+@st.cache_resource(ttl=DATABASE_SUMMARY_TTL, show_spinner="Loading data...")
+@metrics.cache_misses("database_dataset")
+def _load_database_dataset(kind: str) -> Dataset:
+    chunks = list(load_backend().iter_chunks())
+    frame = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=backend.TABLE_COLUMNS)
+    frame = cache.compact(frame)
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    frame, networks = _order_by_family(frame)
+    dataset = Dataset(kind, hasher.hexdigest(), frame, networks)
+    metrics.watch("dataset", f"{kind}@{dataset.digest[:12]}", dataset)
+    return dataset
+
+
+# Route table held in memory for the pages that index it (lookup, AS paths, AI)
+# from the configured backend
+def load_route_dataset() -> Dataset:
+    if BACKEND == "columnar":
+        return load_routes()
+    return _load_database_dataset(BACKEND)
+
+
+# Location of the anomaly model of the configured backend's route table
+def anomaly_model_path() -> str:
+    if BACKEND == "sqlite":
+        return anomaly.model_path(SQLITE_DATABASE)
+    if BACKEND == "mysql":
+        return MYSQL_MODEL_FILE
+    return anomaly.model_path(DATA_CSV)
+
+
+# Statistics cube of one version of a route file, read from its cube file when
+# that matches the content hash, otherwise built from the columnar cache and saved
+@metrics.cache_requests("cube")
+@st.cache_resource(max_entries=4, show_spinner="Building statistics cube...")
+@metrics.cache_misses("cube")
+def _load_cube(path: str, digest: str) -> cube.Cube:
+    stored = cube.Cube.load(cube.cube_path(path))
+    if stored is not None and stored.digest == digest:
+        route_cube = stored
+    else:
+        route_cube = cube.build(path, digest)
+        route_cube.save(cube.cube_path(path))
+    metrics.watch("cube", f"{path}@{digest[:12]}", route_cube)
+    return route_cube
+
+
+# Cube computed in the database, shared by every session for a short while
+@metrics.cache_requests("database_cube")
+@st.cache_resource(ttl=DATABASE_SUMMARY_TTL, show_spinner="Building statistics cube...")
+@metrics.cache_misses("database_cube")
+def _load_database_cube(kind: str) -> cube.Cube:
+    return load_backend().cube()
+
+
+# Statistics cube of the route table from the configured backend
+def load_route_cube() -> cube.Cube:
+    if BACKEND == "columnar":
+        return _load_cube(DATA_CSV, cache.file_digest(DATA_CSV))
+    return _load_database_cube(BACKEND)
+
+
+# Live feed shared by every session, consuming LIVE_SOURCE in a background thread
+# from the first call on; None when no source is configured
+@st.cache_resource(show_spinner=False)
+def load_live_feed() -> live.LiveFeed | None:
+    if not LIVE_SOURCE:
+        return None
+    return live.LiveFeed(LIVE_SOURCE).start()
+
+
+# Train the anomaly model on the current route table and save it (see
+# anomaly_model_path); None when fewer than anomaly.MIN_TRAINING_ROWS routes are
+# eligible (transit routes with a Metric). Only called on request, never from a
+# cached loader.
+def train_anomaly_model() -> anomaly.IsolationForest | None:
+    dataset = load_route_dataset()
+    model = anomaly.train(dataset.frame, load_transit_asns(), dataset.digest)
+    if model is not None:
+        model.save(anomaly_model_path())
+    return model
+
+
+@metrics.cache_requests("anomaly_model")
+@st.cache_resource(max_entries=2)
+@metrics.cache_misses("anomaly_model")
+def _read_anomaly_model(path: str, digest: str) -> anomaly.IsolationForest | None:
+    return anomaly.IsolationForest.load(path)
+
+
+# Saved anomaly model of the route table, or None before one is trained (see
+# train_anomaly_model). A model trained on an earlier version of the table, or for
+# another transit set, is used as is, so appended routes are scored without refitting.
+def load_anomaly_model() -> anomaly.IsolationForest | None:
+    model_path = anomaly_model_path()
+    if not os.path.exists(model_path):
+        return None
+    return _read_anomaly_model(model_path, cache.file_digest(model_path))
+
+
+# Scored routes of one table version and model, shared by every session like a
+# Dataset (read-only). Rows are ordered normal first, then anomalies, each in table
+# order, so both subsets are row slices of the shared frame; the aggregated
+# scatter points are computed once per pair of columns.
+class AnomalyResults:
+    def __init__(self, frame: pd.DataFrame, normal_count: int):
+        self.frame = frame
+        self.normal_count = normal_count
+        self._points: dict[tuple[str, str, str], pd.DataFrame] = {}
+        self._points_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def normal(self) -> pd.DataFrame:
+        return self.frame.iloc[:self.normal_count]
+
+    @property
+    def anomalous(self) -> pd.DataFrame:
+        return self.frame.iloc[self.normal_count:]
+
+    # Normal routes aggregated per (x, y) coordinate (see bgp/density.py)
+    def normal_points(self, x: str, y: str) -> pd.DataFrame:
+        return self._aggregated_points("normal", x, y)
+
+    # Anomalous routes aggregated the same way, for when there are too many to
+    # draw one by one
+    def anomaly_points(self, x: str, y: str) -> pd.DataFrame:
+        return self._aggregated_points("anomalous", x, y)
+
+    def _aggregated_points(self, part: str, x: str, y: str) -> pd.DataFrame:
+        with self._points_lock:
+            points = self._points.get((part, x, y))
+        if points is None:
+            rows = getattr(self, part)
+            points = density.aggregate(rows[x], rows[y])
+            with self._points_lock:
+                self._points[(part, x, y)] = points
+        return points
+
+    @property
+    def nbytes(self) -> int:
+        with self._points_lock:
+            points = list(self._points.values())
+        return int(self.frame.memory_usage(index=True, deep=True).sum()
+                   + sum(frame.memory_usage(index=True).sum() for frame in points))
+
+
+# Anomaly results of one table version and model. Only the feature rows the model
+# hasn't scored for an earlier version are scored; the others come from the
+# scores saved next to the model (see anomaly.ScoredFeatures).
+@metrics.cache_requests("anomaly_scores")
+@st.cache_resource(max_entries=4, show_spinner="Scoring routes...")
+@metrics.cache_misses("anomaly_scores")
+def _score_routes(kind: str, digest: str, model_digest: str) -> AnomalyResults:
+    model = load_anomaly_model()
+    frame = load_route_dataset().frame
+    rows = anomaly.eligible_rows(frame, model.transit_as)
+    scores_path = anomaly.scores_path(anomaly_model_path())
+    known = anomaly.ScoredFeatures.load(scores_path)
+    if known is None or known.model_digest != model_digest:
+        known = anomaly.ScoredFeatures(np.zeros((0, len(anomaly.FEATURES))), np.zeros(0), model_digest)
+    scored_before = len(known)
+    scores, known = anomaly.score_incremental(model, anomaly.features(frame.iloc[rows]), known,
+                                              workers=os.cpu_count() or 1)
+    if len(known) > scored_before:
+        known.save(scores_path)
+    anomalous = scores > model.offset
+    order = np.argsort(anomalous, kind="stable")
+    results = frame.take(rows[order]).reset_index(drop=True)
+    results["Anomaly Score"] = scores[order]
+    results["Anomaly"] = pd.Categorical.from_codes(anomalous[order].astype(np.int8),
+                                                   categories=[anomaly.NORMAL, anomaly.ANOMALY])
+    normal_count = int(np.count_nonzero(~anomalous))
+    shared = AnomalyResults(results, normal_count)
+    metrics.watch("anomaly_results", f"{kind}@{digest[:12]}", shared)
+    return shared
+
+
+# Scored routes of the route table for the AI/ML page, with an Anomaly column;
+# None without a model (see load_anomaly_model)
+def load_anomaly_results() -> AnomalyResults | None:
+    if not os.path.exists(anomaly_model_path()):
+        return None
+    return _score_routes(BACKEND, load_route_dataset().digest, cache.file_digest(anomaly_model_path()))
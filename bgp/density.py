@@ -0,0 +1,58 @@
+# Server-side aggregation of scatter plot points
+#
+# Plotting one marker per route sends every row to the browser, although routes
+# pile up on a few integer coordinates. Points are instead reduced to one marker
+# per distinct coordinate with its count; when there are more distinct
+# coordinates than a plot should draw, they are binned on a grid and each bin is
+# drawn at the weighted mean of its points. The number of markers is bounded by
+# max_points whatever the number of routes.
+import math
+
+import numpy as np
+import pandas as pd
+
+# Largest number of aggregated markers per plot
+MAX_POINTS = 2_500
+
+# Largest number of individually drawn points (e.g. anomalies) per plot
+MAX_INDIVIDUAL_POINTS = 10_000
+
+
+# Count of points per distinct (x, y), binned when there are more than max_points
+# Returns a frame with x, y and count columns; missing coordinates are skipped
+def aggregate(x: pd.Series, y: pd.Series, max_points: int = MAX_POINTS) -> pd.DataFrame:
+    points = pd.DataFrame({
+        "x": pd.to_numeric(pd.Series(x), errors="coerce").astype(np.float64).to_numpy(),
+        "y": pd.to_numeric(pd.Series(y), errors="coerce").astype(np.float64).to_numpy(),
+    }).dropna()
+    counts = points.value_counts(sort=False).reset_index(name="count")
+    if len(counts) <= max_points:
+        return counts
+
+    # Square grid with at most max_points cells over the distinct coordinates
+    bins = max(1, math.isqrt(max_points))
+    cells = np.zeros(len(counts), dtype=np.int64)
+    for axis in ("x", "y"):
+        values = counts[axis].to_numpy()
+        edges = np.linspace(values.min(), values.max(), bins + 1)
+        cells = cells * bins + np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+    weights = counts["count"].to_numpy(dtype=np.float64)
+    grouped = pd.DataFrame({
+        "cell": cells,
+        "wx": counts["x"].to_numpy() * weights,
+        "wy": counts["y"].to_numpy() * weights,
+        "count": counts["count"].to_numpy(),
+    }).groupby("cell").sum()
+    return pd.DataFrame({
+        "x": grouped["wx"] / grouped["count"],
+        "y": grouped["wy"] / grouped["count"],
+        "count": grouped["count"],
+    }).reset_index(drop=True)
+
+
+# Marker diameters in pixels growing with the square root of the counts
+def marker_sizes(counts: pd.Series, smallest: float = 6, largest: float = 30) -> np.ndarray:
+    root = np.sqrt(np.asarray(counts, dtype=np.float64))
+    if not len(root) or root.max() == root.min():
+        return np.full(len(root), (smallest + largest) / 2)
+    return smallest + (largest - smallest) * (root - root.min()) / (root.max() - root.min())
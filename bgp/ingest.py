@@ -0,0 +1,424 @@
+# Load BGP RIB dumps into the ipv4_ipv6 table
+#
+# Usage:
+#   python -m bgp.ingest typescript.IPV4.RR.txt typescript.IPV6.RR.txt --database data/routes.db --workers 8
+#
+# Routes are parsed in chunks (see bgp.parser) and written with one executemany
+# per chunk inside a single transaction. With more than one worker, every file is
+# split into byte ranges that are parsed on a process pool, which also computes
+# the derived columns and row tuples of each range; the parent only inserts them,
+# in file order, so the table is identical to a serial run. SQLite is used as the local stand-in for
+# the MySQL database; any DB-API connection can be passed to insert_routes() (for
+# MySQL, prepare_mysql() creates or migrates the table first).
+#
+# MRT TABLE_DUMP_V2 files (the binary RIB dumps of route collectors) are
+# recognized by their first record and read with bgp.mrt instead of bgp.parser.
+#
+# Besides the parsed columns every row stores its address family, prefix length,
+# hop_count and transit_as (derived with bgp.prefix and bgp.aspath), so that
+# filters and aggregates can run in the database (see bgp.backend), and two
+# 64 bit hashes used to diff snapshots (see bgp.snapshot): route_key identifies a
+# path (its Network and NextHop) and attributes covers the values a path update
+# can change.
+import argparse
+import collections
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from bgp import aspath, mrt, parser, pools, prefix
+
+# Default location of the local SQLite database
+DEFAULT_DATABASE = "data/routes.db"
+
+# Byte ranges per worker, so a slow range doesn't leave the other cores idle
+RANGES_PER_WORKER = 4
+
+# Name of the routes table
+TABLE = "ipv4_ipv6"
+
+# Columns derived from Network and Path when inserting
+DERIVED_COLUMNS = ["family", "prefix_length", "hop_count", "transit_as", "route_key", "attributes"]
+
+# Columns identifying a path (a Network's paths differ by next hop)
+KEY_COLUMNS = ["Network", "NextHop"]
+
+# Columns whose change makes a path update
+ATTRIBUTE_COLUMNS = ["Metric", "LocPrf", "Weight", "Path"]
+
+CREATE_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    Network TEXT,
+    NextHop TEXT,
+    Metric INTEGER,
+    LocPrf INTEGER,
+    Weight INTEGER,
+    Path TEXT,
+    family INTEGER,
+    prefix_length INTEGER,
+    hop_count INTEGER,
+    transit_as INTEGER,
+    route_key INTEGER,
+    attributes INTEGER
+)
+"""
+
+# Indexes on the columns the pages filter and group by (name -> columns)
+INDEXES = {
+    f"{TABLE}_family": "family, prefix_length",
+    f"{TABLE}_transit_as": "transit_as",
+    f"{TABLE}_next_hop": "NextHop",
+    f"{TABLE}_route_key": "route_key",
+}
+
+CREATE_INDEXES = [f"CREATE INDEX IF NOT EXISTS {name} ON {TABLE} ({columns})" for name, columns in INDEXES.items()]
+
+# The routes table in MySQL, with an id giving the insertion order (the order
+# pages are read in); text columns are indexed on a key length
+MYSQL_CREATE_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    Network VARCHAR(64),
+    NextHop VARCHAR(64),
+    Metric BIGINT,
+    LocPrf BIGINT,
+    Weight BIGINT,
+    Path TEXT,
+    family TINYINT,
+    prefix_length SMALLINT,
+    hop_count INT,
+    transit_as BIGINT,
+    route_key BIGINT,
+    attributes BIGINT
+)
+"""
+
+MYSQL_INDEXES = {**INDEXES, f"{TABLE}_next_hop": "NextHop(64)"}
+
+# Rows whose derived columns are computed per UPDATE batch when migrating a table
+FILL_BATCH_ROWS = 10_000
+
+
+# Summary of one ingest run
+@dataclass
+class IngestStats:
+    routes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def routes_per_second(self) -> float:
+        return self.routes / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.routes} routes inserted in {self.seconds:.2f}s ({self.routes_per_second:,.0f} routes/s)"
+
+
+# Rows of one chunk ready for insert_rows(), with what is needed to carry the
+# path positions over from the chunks before it (see carry_ordinals)
+@dataclass
+class RouteRows:
+    rows: list[tuple]
+    key_hashes: np.ndarray
+    ordinals: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+# Placeholder used by the connection's driver (sqlite3 uses "?", MySQL uses "%s")
+def placeholder(connection) -> str:
+    return "?" if isinstance(connection, sqlite3.Connection) else "%s"
+
+
+# Position of each route among the routes with the same Network and NextHop seen
+# so far: 0 for nearly every route, it only tells apart two paths of a prefix
+# through the same next hop (e.g. from two peers of a collector). The counts are
+# carried across chunks: `previous` is the number of routes per key hash in the
+# preceding chunks, which makes the positions independent of where chunks end.
+# Returns the positions and the counts for the next chunk.
+def path_ordinals(frame: pd.DataFrame, previous: pd.Series | None = None) -> tuple[np.ndarray, pd.Series]:
+    return _ordinals(key_hashes(frame), previous)
+
+
+# Hash of each route's Network and NextHop, the key path_ordinals() counts by
+def key_hashes(frame: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(frame[KEY_COLUMNS].astype(object), index=False).to_numpy()
+
+
+def _ordinals(hashes: np.ndarray, previous: pd.Series | None = None) -> tuple[np.ndarray, pd.Series]:
+    ordinals = pd.Series(hashes).groupby(hashes, sort=False).cumcount().to_numpy(dtype=np.int64)
+    counts = pd.Series(hashes).value_counts(sort=False)
+    if previous is not None and len(previous):
+        ordinals += previous.reindex(hashes, fill_value=0).to_numpy(dtype=np.int64)
+        counts = counts.add(previous, fill_value=0).astype(np.int64)
+    return ordinals, counts
+
+
+# 64 bit hashes of (Network, NextHop, path position) and of the path's
+# attributes, as signed integers so every database stores them
+def route_hashes(frame: pd.DataFrame, ordinals: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    keys = frame[KEY_COLUMNS].astype(object).assign(ordinal=ordinals)
+    attributes = frame[ATTRIBUTE_COLUMNS].astype(object)
+    return (pd.util.hash_pandas_object(keys, index=False).to_numpy().view(np.int64),
+            pd.util.hash_pandas_object(attributes, index=False).to_numpy().view(np.int64))
+
+
+# Family, prefix length, hop_count, transit_as and hashes of each route
+# The path positions come from a "path_ordinal" column when the caller computed
+# them across chunks, otherwise from this chunk alone
+def derived_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    networks = prefix.pack(frame["Network"])
+    paths = aspath.parse(frame["Path"])
+    transit_as = pd.array(paths.transit_as, dtype="Int64")
+    transit_as[paths.transit_as == aspath.NO_ASN] = pd.NA
+    if "path_ordinal" in frame:
+        ordinals = frame["path_ordinal"].to_numpy(dtype=np.int64)
+    else:
+        ordinals = path_ordinals(frame)[0]
+    route_key, attributes = route_hashes(frame, ordinals)
+    return pd.DataFrame({
+        "family": pd.array(networks.family, dtype="Int64"),
+        "prefix_length": pd.array(networks.length, dtype="Int64"),
+        "hop_count": pd.array(paths.hop_count, dtype="Int64"),
+        "transit_as": transit_as,
+        "route_key": route_key,
+        "attributes": attributes,
+    }, index=frame.index)
+
+
+# Convert a chunk into plain tuples, with None for missing values
+def _rows(frame: pd.DataFrame) -> list[tuple]:
+    values = pd.concat([frame[parser.COLUMNS], derived_columns(frame)], axis=1).astype(object)
+    values = values.where(values.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+# Row tuples of a chunk, with the path positions counted within the chunk alone
+# (this is the part of an ingest that runs in the workers)
+def route_rows(frame: pd.DataFrame) -> RouteRows:
+    hashes = key_hashes(frame)
+    ordinals = _ordinals(hashes)[0]
+    return RouteRows(_rows(frame.assign(path_ordinal=ordinals)), hashes, ordinals)
+
+
+# Parse a byte range with `parse` (parser.parse_range or mrt.parse_range) and
+# convert it with route_rows(), in a worker process
+def parse_range_rows(parse, *arguments) -> RouteRows:
+    return route_rows(parse(*arguments))
+
+
+# Shift the path positions of a chunk by the routes with the same key in the
+# chunks before it, re-hashing the route_key of the few rows that move. `counts`
+# maps key hashes to their routes so far and is updated in place (a dict, so
+# each chunk costs its own size rather than that of everything before it).
+def carry_ordinals(chunk: RouteRows, counts: dict[int, int]) -> None:
+    hashes, inverse, chunk_counts = np.unique(chunk.key_hashes, return_inverse=True, return_counts=True)
+    hashes = hashes.tolist()
+    previous = np.fromiter((counts.get(key, 0) for key in hashes), dtype=np.int64, count=len(hashes))
+    counts.update(zip(hashes, (previous + chunk_counts).tolist()))
+    offsets = previous[inverse.reshape(-1)]
+    shifted = np.flatnonzero(offsets)
+    if len(shifted):
+        columns = parser.COLUMNS + DERIVED_COLUMNS
+        frame = pd.DataFrame([chunk.rows[row] for row in shifted], columns=columns)
+        route_key = route_hashes(frame, chunk.ordinals[shifted] + offsets[shifted])[0]
+        position = columns.index("route_key")
+        for row, key in zip(shifted, route_key.tolist()):
+            values = chunk.rows[row]
+            chunk.rows[row] = values[:position] + (key,) + values[position + 1:]
+
+
+# Bulk insert row tuples (see route_rows), returns the number of rows written
+def insert_rows(connection, rows: list[tuple], table: str = TABLE) -> int:
+    columns = parser.COLUMNS + DERIVED_COLUMNS
+    placeholders = ", ".join([placeholder(connection)] * len(columns))
+    sql_query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    cursor = connection.cursor()
+    try:
+        cursor.executemany(sql_query, rows)
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+# Bulk insert one chunk of routes, returns the number of rows written
+def insert_routes(connection, frame: pd.DataFrame, table: str = TABLE) -> int:
+    return insert_rows(connection, _rows(frame), table)
+
+
+# Compute the derived columns of the rows stored without them (tables created
+# before the columns existed), a batch at a time in the order of `key`, a unique
+# column of the table (rowid in SQLite, id in MySQL). Returns the rows updated.
+def fill_derived_columns(connection, key: str, table: str = TABLE, batch_rows: int = FILL_BATCH_ROWS) -> int:
+    marker = placeholder(connection)
+    assignments = ", ".join(f"{column} = {marker}" for column in DERIVED_COLUMNS)
+    # The parser's column types, so the hashes match those of freshly ingested rows
+    dtypes = parser.empty_frame().dtypes.to_dict()
+    cursor = connection.cursor()
+    try:
+        filled, last_key, counts = 0, None, None
+        while True:
+            after = f" AND {key} > {marker}" if last_key is not None else ""
+            cursor.execute(f"SELECT {key}, {', '.join(parser.COLUMNS)} FROM {table} WHERE route_key IS NULL{after}"
+                           f" ORDER BY {key} LIMIT {int(batch_rows)}", () if last_key is None else (last_key,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            frame = pd.DataFrame(rows, columns=[key] + parser.COLUMNS).astype(dtypes)
+            ordinals, counts = path_ordinals(frame, counts)
+            values = derived_columns(frame.assign(path_ordinal=ordinals)).astype(object)
+            values = values.where(values.notna(), None).assign(key=frame[key].to_numpy())
+            cursor.executemany(f"UPDATE {table} SET {assignments} WHERE {key} = {marker}",
+                               list(values.itertuples(index=False, name=None)))
+            filled += len(frame)
+            last_key = rows[-1][0]
+        connection.commit()
+        return filled
+    finally:
+        cursor.close()
+
+
+# Open the local SQLite database and make sure the routes table and its indexes
+# exist; tables created before the derived columns get them added and filled
+def connect_sqlite(database: str = DEFAULT_DATABASE) -> sqlite3.Connection:
+    connection = sqlite3.connect(database)
+    connection.execute(CREATE_TABLE)
+    existing = {row[1] for row in connection.execute(f"PRAGMA table_info({TABLE})")}
+    missing = [column for column in DERIVED_COLUMNS if column not in existing]
+    for column in missing:
+        connection.execute(f"ALTER TABLE {TABLE} ADD COLUMN {column} INTEGER")
+    for statement in CREATE_INDEXES:
+        connection.execute(statement)
+    if missing:
+        fill_derived_columns(connection, "rowid")
+    return connection
+
+
+# Create the indexes of a MySQL table that don't exist yet (MySQL has no CREATE
+# INDEX IF NOT EXISTS)
+def create_mysql_indexes(connection, table: str, indexes: dict[str, str]) -> None:
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT DISTINCT index_name FROM information_schema.statistics"
+                       " WHERE table_schema = DATABASE() AND table_name = %s", (table,))
+        existing = {row[0].lower() for row in cursor.fetchall()}
+        for name, columns in indexes.items():
+            if name.lower() not in existing:
+                cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+    finally:
+        cursor.close()
+
+
+# Make sure the routes table of a MySQL database exists with the derived columns,
+# the id primary key and the indexes. A table created before (by the original
+# loader: Network, NextHop, Metric, LocPrf, Weight, Path only) gets the missing
+# columns added and the derived columns filled.
+def prepare_mysql(connection) -> None:
+    cursor = connection.cursor()
+    try:
+        cursor.execute(MYSQL_CREATE_TABLE)
+        cursor.execute("SELECT column_name FROM information_schema.columns"
+                       " WHERE table_schema = DATABASE() AND table_name = %s", (TABLE,))
+        existing = {row[0].lower() for row in cursor.fetchall()}
+        if "id" not in existing:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD COLUMN id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY FIRST")
+        missing = [column for column in DERIVED_COLUMNS if column.lower() not in existing]
+        for column in missing:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD COLUMN {column} BIGINT")
+    finally:
+        cursor.close()
+    create_mysql_indexes(connection, TABLE, MYSQL_INDEXES)
+    connection.commit()
+    if missing:
+        fill_derived_columns(connection, "id")
+
+
+# Parse dump files (show ip bgp text or MRT) into DataFrame chunks, in file order
+# With workers > 1 the byte ranges of all files are parsed on a process pool.
+def iter_files(file_names: list[str], workers: int = 1,
+               chunk_size: int = parser.DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    if workers <= 1:
+        for file_name in file_names:
+            if mrt.is_mrt(file_name):
+                yield from mrt.iter_file(file_name, chunk_size)
+            else:
+                yield from parser.iter_file(file_name, chunk_size)
+        return
+    yield from _map_ranges(file_names, workers, chunk_size)
+
+
+# Parse dump files into row tuples ready to insert, in file order
+# With workers > 1 the parsing, derived columns and tuples of every byte range
+# are computed on a process pool; path positions are still counted by
+# ingest_files(), across chunks, with carry_ordinals().
+def iter_file_rows(file_names: list[str], workers: int = 1,
+                   chunk_size: int = parser.DEFAULT_CHUNK_SIZE) -> Iterator[RouteRows]:
+    if workers <= 1:
+        for frame in iter_files(file_names, 1, chunk_size):
+            yield route_rows(frame)
+        return
+    yield from _map_ranges(file_names, workers, chunk_size, parse_range_rows)
+
+
+# Run `convert(parse_range, file_name, start, end, ...)` on the byte ranges of
+# all files on a process pool, yielding the results in file order. At most two
+# ranges per worker are in flight, which bounds the memory held by results
+# waiting to be consumed.
+def _map_ranges(file_names: list[str], workers: int, chunk_size: int, convert=None) -> Iterator:
+    tasks = []
+    for file_name in file_names:
+        if mrt.is_mrt(file_name):
+            for start, end in mrt.split_ranges(file_name, workers * RANGES_PER_WORKER):
+                tasks.append((mrt.parse_range, file_name, start, end, chunk_size))
+            continue
+        columns = parser.read_columns(file_name)
+        for start, end in parser.split_ranges(file_name, workers * RANGES_PER_WORKER):
+            tasks.append((parser.parse_range, file_name, start, end, columns, chunk_size))
+
+    with pools.process_pool(workers) as pool:
+        pending = collections.deque()
+        for task in tasks:
+            pending.append(pool.submit(convert, *task) if convert else pool.submit(*task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# Parse the given dump files and insert every route, committing once at the end
+def ingest_files(file_names: list[str], connection, chunk_size: int = parser.DEFAULT_CHUNK_SIZE,
+                 workers: int = 1) -> IngestStats:
+    stats = IngestStats()
+    start = time.perf_counter()
+    counts = {}
+    for chunk in iter_file_rows(file_names, workers, chunk_size):
+        carry_ordinals(chunk, counts)
+        stats.routes += insert_rows(connection, chunk.rows)
+    connection.commit()
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    argument_parser = argparse.ArgumentParser(description="Load BGP RIB dumps into the ipv4_ipv6 table")
+    argument_parser.add_argument("files", nargs="+", help="show ip bgp output files (.RR) or MRT RIB dumps")
+    argument_parser.add_argument("--database", default=DEFAULT_DATABASE, help="SQLite database file")
+    argument_parser.add_argument("--chunk-size", type=int, default=parser.DEFAULT_CHUNK_SIZE, help="routes per batch")
+    argument_parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parser processes (1 = serial)")
+    args = argument_parser.parse_args(argv)
+
+    connection = connect_sqlite(args.database)
+    try:
+        stats = ingest_files(args.files, connection, args.chunk_size, args.workers)
+    finally:
+        connection.close()
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
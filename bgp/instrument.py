@@ -0,0 +1,68 @@
+# Streamlit elements that record their serialization time and payload size
+#
+# Usage (in a page):
+#   instrument.plotly_chart("analytics", "hop_count", fig)
+#   instrument.dataframe("view_data", "page", page_df, hide_index=True)
+#
+# The time spent in the st.* call (Streamlit serializing the figure or frame and
+# queueing it for the browser) is recorded as the page's serialize stage. With
+# BGP_MEASURE_PAYLOADS=1 the payload is also measured, by serializing once more
+# the way Streamlit does (Plotly JSON, Arrow IPC for frames). That second copy
+# costs about as much as the render itself, so it is off by default.
+import os
+
+import pandas as pd
+import plotly.io
+import pyarrow as pa
+import streamlit as st
+
+from bgp import metrics
+
+# Whether payload sizes are measured
+MEASURE_PAYLOADS = os.environ.get("BGP_MEASURE_PAYLOADS", "0") == "1"
+
+
+# Size of a figure's JSON, as sent by st.plotly_chart
+def figure_bytes(figure) -> int:
+    return len(plotly.io.to_json(figure, validate=False).encode())
+
+
+# Size of a frame as an Arrow IPC stream, as sent by st.dataframe and st.table
+# (None when Arrow can't convert it; Streamlit then falls back on strings)
+def frame_bytes(frame) -> int | None:
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame()
+    try:
+        table = pa.Table.from_pandas(frame)
+    except (pa.ArrowException, TypeError, ValueError):
+        return None
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.size()
+
+
+def plotly_chart(page: str, element: str, figure, **kwargs):
+    if MEASURE_PAYLOADS:
+        metrics.record_payload(page, element, figure_bytes(figure))
+    with metrics.timed(page, metrics.SERIALIZE):
+        return st.plotly_chart(figure, **kwargs)
+
+
+def _record_frame(page: str, element: str, frame) -> None:
+    if MEASURE_PAYLOADS:
+        size = frame_bytes(frame)
+        if size is not None:
+            metrics.record_payload(page, element, size)
+
+
+def dataframe(page: str, element: str, frame, **kwargs):
+    _record_frame(page, element, frame)
+    with metrics.timed(page, metrics.SERIALIZE):
+        return st.dataframe(frame, **kwargs)
+
+
+def table(page: str, element: str, frame):
+    _record_frame(page, element, frame)
+    with metrics.timed(page, metrics.SERIALIZE):
+        return st.table(frame)
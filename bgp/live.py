@@ -0,0 +1,415 @@
+# Live BGP feed: an in-memory RIB kept current from a stream of updates
+#
+# Usage:
+#   python -m bgp.live replay typescript.IPV4.RR.txt --port 7900 --rate 50000
+#   python -m bgp.live consume tcp://127.0.0.1:7900
+#   BGP_LIVE_SOURCE=tcp://127.0.0.1:7900 streamlit run streamlit_app.py
+#
+# Updates arrive as `bgpdump -m` lines, read from a TCP socket ("tcp://host:port")
+# or from a file that is tailed as it grows:
+#
+#   BGP4MP|1700000000|A|10.0.0.1|65000|1.0.0.0/24|3356 13335|IGP|10.0.0.2|100|0|...
+#   BGP4MP|1700000000|W|10.0.0.1|65000|1.0.0.0/24
+#
+# RIB entries (TABLE_DUMP2|...|B|...) count as announcements, so a session's
+# initial table transfer and its updates are read alike. The RIB is keyed by
+# (peer, prefix) and keeps only the fields the aggregates need, a shared tuple of
+# family, prefix length, transit_as and hop_count, and it holds at most
+# max_routes routes. Each chunk of lines is parsed with the vectorized helpers of
+# bgp.prefix and bgp.aspath, and its effect on the counts is applied as one
+# Counter update. Every publish_interval the counts are rolled up into a
+# bgp.summary.Summary that the dashboard reads, so a page render never waits on
+# the consumer.
+#
+# `replay` stands in for a live feed: it announces every route of a dump, then
+# sends a steady stream of withdrawals, re-announcements and path changes.
+import argparse
+import asyncio
+import collections
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+
+from bgp import aspath, ingest, prefix, summary
+
+# Port used by `replay` and by sources given without one
+DEFAULT_PORT = 7900
+
+# Bytes read from the source at a time
+READ_BYTES = 1 << 16
+
+# Seconds between two published summaries
+PUBLISH_INTERVAL = 0.25
+
+# Largest number of routes held; announcements of new routes beyond it are dropped
+MAX_ROUTES = 4_000_000
+
+# Seconds between checks for new data at the end of a tailed file
+TAIL_INTERVAL = 0.1
+
+# Seconds to wait before reconnecting to a closed socket
+RECONNECT_INTERVAL = 1.0
+
+# Update kinds of the third field
+ANNOUNCE, RIB_ENTRY, WITHDRAW = "A", "B", "W"
+
+# Origin field values and their code at the end of a Path
+ORIGIN_CODES = {"IGP": "i", "EGP": "e", "INCOMPLETE": "?"}
+ORIGIN_NAMES = {code: name for name, code in ORIGIN_CODES.items()}
+
+# Updates written per tick by `replay`
+REPLAY_TICKS_PER_SECOND = 20
+
+
+# Progress of a feed
+@dataclass(frozen=True)
+class FeedStats:
+    updates: int = 0
+    announcements: int = 0
+    withdrawals: int = 0
+    # Announcements of new routes refused because the RIB was full
+    dropped: int = 0
+    # Lines that are not updates or hold an unparsable prefix
+    malformed: int = 0
+    routes: int = 0
+    updates_per_second: float = 0.0
+    # time.time() of the publication, 0 before the first one
+    published_at: float = 0.0
+    connected: bool = False
+
+    def __str__(self) -> str:
+        return (f"{self.routes:,} routes, {self.updates:,} updates ({self.updates_per_second:,.0f}/s), "
+                f"{self.withdrawals:,} withdrawals, {self.dropped:,} dropped, {self.malformed:,} malformed")
+
+
+# Routes of a feed and their aggregate counts
+class LiveRIB:
+    def __init__(self, max_routes: int = MAX_ROUTES):
+        self.max_routes = max_routes
+        # (peer, prefix) -> (family, prefix length, transit_as, hop_count)
+        self.routes: dict[tuple[str, str], tuple[int, int, int, int]] = {}
+        # Number of routes per (family, prefix length, transit_as, hop_count)
+        self.counts: collections.Counter = collections.Counter()
+        # One instance of each value tuple, shared by all routes that have it
+        self._values: dict[tuple[int, int, int, int], tuple[int, int, int, int]] = {}
+        self.stats = FeedStats()
+
+    # Apply a chunk of update lines in order
+    def apply(self, lines: list[str]) -> None:
+        updates = []
+        for line in lines:
+            fields = line.split("|")
+            if len(fields) > 6 and fields[2] in (ANNOUNCE, RIB_ENTRY) or len(fields) > 5 and fields[2] == WITHDRAW:
+                updates.append(fields)
+        announced = [fields for fields in updates if fields[2] != WITHDRAW]
+        networks = prefix.pack(pd.Series([fields[5] for fields in announced], dtype=object))
+        paths = aspath.parse(pd.Series([fields[6] for fields in announced], dtype=object))
+        values = iter(zip(networks.family.tolist(), networks.length.tolist(),
+                          paths.transit_as.tolist(), paths.hop_count.tolist()))
+
+        routes, shared = self.routes, self._values
+        added, removed = [], []
+        dropped = malformed = 0
+        for fields in updates:
+            key = (fields[3], fields[5])
+            if fields[2] == WITHDRAW:
+                old = routes.pop(key, None)
+                if old is not None:
+                    removed.append(old)
+                continue
+            value = next(values)
+            if not value[0]:
+                malformed += 1
+                continue
+            old = routes.get(key)
+            if old is None and len(routes) >= self.max_routes:
+                dropped += 1
+                continue
+            if old is not None:
+                removed.append(old)
+            routes[key] = value = shared.setdefault(value, value)
+            added.append(value)
+        self.counts.update(added)
+        self.counts.subtract(removed)
+
+        stats = self.stats
+        self.stats = replace(
+            stats,
+            updates=stats.updates + len(updates),
+            announcements=stats.announcements + len(announced),
+            withdrawals=stats.withdrawals + len(updates) - len(announced),
+            dropped=stats.dropped + dropped,
+            malformed=stats.malformed + len(lines) - len(updates) + malformed,
+            routes=len(routes),
+        )
+
+    # Aggregates of the current routes, in the form of the route table's summary
+    def summary(self) -> summary.Summary:
+        # Drop the value tuples no route has any more
+        self.counts = +self.counts
+        if len(self._values) > 2 * len(self.counts) + 1000:
+            self._values = {value: value for value in self.counts}
+        if not self.counts:
+            return summary.Summary()
+        counts = pd.Series(list(self.counts.values()), dtype=np.int64,
+                           index=pd.MultiIndex.from_tuples(list(self.counts.keys()),
+                                                           names=["family", "length", "transit_as", "hop_count"]))
+        transit_as = counts.groupby(level="transit_as").sum()
+        return summary.Summary(
+            rows=int(counts.sum()),
+            groups=counts.groupby(level=["family", "transit_as"]).sum(),
+            prefix_lengths=counts.groupby(level=["family", "length"]).sum(),
+            values={"hop_count": counts.groupby(level="hop_count").sum(),
+                    "transit_as": transit_as[transit_as.index >= 0]},
+        )
+
+
+# Chunks of bytes from a source, reconnecting to sockets and following files
+# `once` stops at the end of a file or when a socket closes
+async def _read_source(source: str, feed: "LiveFeed", once: bool = False):
+    if source.startswith("tcp://"):
+        host, _, port = source[len("tcp://"):].partition(":")
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(host, int(port or DEFAULT_PORT))
+            except OSError:
+                if once:
+                    raise
+                await asyncio.sleep(RECONNECT_INTERVAL)
+                continue
+            feed.connected = True
+            try:
+                while chunk := await reader.read(READ_BYTES):
+                    yield chunk
+            finally:
+                feed.connected = False
+                writer.close()
+            if once:
+                return
+            await asyncio.sleep(RECONNECT_INTERVAL)
+
+    while True:
+        try:
+            file = open(source, "rb")
+            break
+        except FileNotFoundError:
+            if once:
+                raise
+            await asyncio.sleep(RECONNECT_INTERVAL)
+    with file:
+        feed.connected = True
+        while True:
+            chunk = await asyncio.to_thread(file.read, READ_BYTES)
+            if chunk:
+                yield chunk
+                continue
+            if once:
+                return
+            # Start over when the file was truncated or replaced by a shorter one
+            if await asyncio.to_thread(lambda: file.tell() > _file_size(source)):
+                file.seek(0)
+            await asyncio.sleep(TAIL_INTERVAL)
+
+
+def _file_size(path: str) -> int:
+    try:
+        with open(path, "rb") as file:
+            return file.seek(0, 2)
+    except OSError:
+        return 0
+
+
+# Consumer of one source, publishing the RIB's summary at a fixed interval
+# The consumer runs on its own event loop in a background thread (start()); pages
+# only read `published`, which is replaced as a whole on every publication
+class LiveFeed:
+    def __init__(self, source: str, max_routes: int = MAX_ROUTES, publish_interval: float = PUBLISH_INTERVAL):
+        self.source = source
+        self.publish_interval = publish_interval
+        self.rib = LiveRIB(max_routes)
+        self.connected = False
+        self.published: tuple[summary.Summary, FeedStats] = (summary.Summary(), FeedStats())
+        # Exception that stopped the consumer thread, if any
+        self.error: Exception | None = None
+        self._thread: threading.Thread | None = None
+
+    # Run the consumer in a daemon thread; returns the feed
+    def start(self) -> "LiveFeed":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_in_thread, name="bgp-live-feed", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run_in_thread(self) -> None:
+        try:
+            asyncio.run(self.run())
+        except Exception as error:
+            self.error = error
+
+    # Read the source and apply its updates until it ends (with `once`) or forever
+    async def run(self, once: bool = False) -> None:
+        publisher = asyncio.create_task(self._publish_periodically())
+        try:
+            partial = b""
+            async for chunk in _read_source(self.source, self, once):
+                lines = (partial + chunk).split(b"\n")
+                # The last piece is an incomplete line, finished by the next chunk
+                partial = lines.pop()
+                self.rib.apply([line.decode("utf-8", "replace").rstrip("\r") for line in lines])
+            if partial:
+                self.rib.apply([partial.decode("utf-8", "replace")])
+        finally:
+            publisher.cancel()
+            self.publish()
+
+    async def _publish_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.publish_interval)
+            self.publish()
+
+    # Roll the RIB up into a new summary for the pages
+    def publish(self) -> None:
+        _, previous = self.published
+        now = time.time()
+        stats = self.rib.stats
+        rate = (stats.updates - previous.updates) / (now - previous.published_at) if previous.published_at else 0.0
+        self.published = (self.rib.summary(), replace(stats, updates_per_second=rate, published_at=now,
+                                                      connected=self.connected))
+
+
+# Routes of dump files as (peer, prefix, path, origin, next hop, LocPrf, Metric)
+# The next hop stands in for the peer, which `show ip bgp` output doesn't show
+def _dump_routes(file_names: list[str]) -> list[tuple[str, ...]]:
+    routes = []
+    for frame in ingest.iter_files(file_names):
+        parts = frame["Path"].str.rpartition(" ")
+        origin_names = parts[2].map(ORIGIN_NAMES).fillna("INCOMPLETE")
+        routes.extend(zip(frame["NextHop"].astype(str), frame["Network"].astype(str), parts[0], origin_names,
+                          frame["NextHop"].astype(str), frame["LocPrf"].astype(str).replace("<NA>", ""),
+                          frame["Metric"].astype(str).replace("<NA>", "")))
+    return routes
+
+
+def _update_line(kind: str, route: tuple[str, ...], path: str | None = None) -> str:
+    peer, network, route_path, origin, next_hop, locprf, metric = route
+    if kind == WITHDRAW:
+        return f"BGP4MP|{int(time.time())}|W|{peer}|0|{network}\n"
+    path = route_path if path is None else path
+    return f"BGP4MP|{int(time.time())}|{kind}|{peer}|0|{network}|{path}|{origin}|{next_hop}|{locprf}|{metric}|||\n"
+
+
+# Update lines of a replay: the table as RIB entries, then endless churn at random
+# (withdraw a route, announce it again, or prepend its first AS)
+def _replay_lines(routes: list[tuple[str, ...]], seed: int = 0):
+    for route in routes:
+        yield _update_line(RIB_ENTRY, route)
+    rng = random.Random(seed)
+    withdrawn = set()
+    while routes:
+        row = rng.randrange(len(routes))
+        route = routes[row]
+        if row in withdrawn:
+            withdrawn.discard(row)
+            yield _update_line(ANNOUNCE, route)
+        elif rng.random() < 0.5:
+            withdrawn.add(row)
+            yield _update_line(WITHDRAW, route)
+        else:
+            first = route[2].split(" ", 1)[0]
+            yield _update_line(ANNOUNCE, route, f"{first} {route[2]}" if first else route[2])
+
+
+# Write replay lines at `rate` updates per second (the table as fast as possible),
+# stopping after `updates` updates following the table if given
+async def _replay(write, drain, routes: list[tuple[str, ...]], rate: int, updates: int | None = None) -> None:
+    lines = _replay_lines(routes)
+    table = [next(lines) for _ in range(len(routes))]
+    for start in range(0, len(table), 10_000):
+        write("".join(table[start:start + 10_000]).encode())
+        await drain()
+    batch = max(1, rate // REPLAY_TICKS_PER_SECOND)
+    remaining = float("inf") if updates is None else updates
+    while remaining > 0:
+        started = time.perf_counter()
+        count = int(min(batch, remaining))
+        remaining -= count
+        write("".join(next(lines) for _ in range(count)).encode())
+        await drain()
+        await asyncio.sleep(max(0.0, 1 / REPLAY_TICKS_PER_SECOND - (time.perf_counter() - started)))
+
+
+async def _serve_replay(routes: list[tuple[str, ...]], port: int, rate: int, updates: int | None) -> None:
+    async def client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await _replay(writer.write, writer.drain, routes, rate, updates)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(client, "127.0.0.1", port)
+    async with server:
+        await server.serve_forever()
+
+
+async def _write_replay(routes: list[tuple[str, ...]], output: str, rate: int, updates: int | None) -> None:
+    with open(output, "ab") as file:
+        async def drain() -> None:
+            file.flush()
+
+        await _replay(file.write, drain, routes, rate, updates)
+
+
+async def _consume(source: str, once: bool) -> None:
+    feed = LiveFeed(source)
+    start = time.perf_counter()
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(1)
+            print(feed.published[1])
+
+    reporter = asyncio.create_task(report())
+    try:
+        await feed.run(once)
+    finally:
+        reporter.cancel()
+    seconds = time.perf_counter() - start
+    stats = feed.published[1]
+    print(f"{stats.updates:,} updates applied in {seconds:.2f}s ({stats.updates / seconds:,.0f} updates/s), "
+          f"{stats.routes:,} routes")
+
+
+def main(argv: list[str] | None = None) -> None:
+    argument_parser = argparse.ArgumentParser(description="Replay or consume a live BGP update feed")
+    commands = argument_parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="serve the routes of a dump as a stream of updates")
+    replay_parser.add_argument("files", nargs="+", help="show ip bgp output files (.RR) or MRT RIB dumps")
+    replay_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port to serve on")
+    replay_parser.add_argument("--output", help="append to this file instead of serving")
+    replay_parser.add_argument("--rate", type=int, default=10_000, help="updates per second after the table")
+    replay_parser.add_argument("--updates", type=int, help="stop after this many updates following the table")
+    consume_parser = commands.add_parser("consume", help="apply a feed to an in-memory RIB and report its progress")
+    consume_parser.add_argument("source", help="tcp://host:port or a file to tail")
+    consume_parser.add_argument("--once", action="store_true", help="stop at the end of the file or connection")
+    args = argument_parser.parse_args(argv)
+
+    try:
+        if args.command == "replay":
+            routes = _dump_routes(args.files)
+            if args.output:
+                asyncio.run(_write_replay(routes, args.output, args.rate, args.updates))
+            else:
+                asyncio.run(_serve_replay(routes, args.port, args.rate, args.updates))
+        else:
+            asyncio.run(_consume(args.source, args.once))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
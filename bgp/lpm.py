@@ -0,0 +1,121 @@
+# Longest prefix match over the loaded prefixes
+#
+# The prefixes of each family are flattened into sorted, non-overlapping address
+# intervals, each labelled with the row of the most specific prefix covering it
+# (or -1 where no prefix covers the addresses). A lookup is then one binary search
+# per address: np.searchsorted over uint32 starts for IPv4, and over 16-byte
+# big-endian keys for IPv6.
+import numpy as np
+import pandas as pd
+
+from bgp import prefix
+
+# No covering prefix
+NO_ROUTE = -1
+
+
+# Big-endian 16 byte keys; byte strings compare like the 128 bit numbers
+def _ipv6_keys(hi: np.ndarray, lo: np.ndarray) -> np.ndarray:
+    return np.stack([hi, lo], axis=1).astype(">u8").view("S16").ravel()
+
+
+# Sort the prefixes outermost first and drop repeated prefixes (additional paths),
+# keeping the first row of each
+def _unique_prefixes(starts: np.ndarray, lengths: np.ndarray, rows: np.ndarray):
+    order = np.lexsort((rows, lengths, starts))
+    starts, lengths, rows = starts[order], lengths[order], rows[order]
+    first = np.ones(len(starts), dtype=bool)
+    first[1:] = (starts[1:] != starts[:-1]) | (lengths[1:] != lengths[:-1])
+    return starts[first], lengths[first], rows[first]
+
+
+# Flatten nested prefixes into interval starts labelled with the most specific row
+# `starts`/`ends` are inclusive bounds as Python ints, sorted outermost first
+def _flatten(starts: list[int], ends: list[int], rows: list[int], top: int) -> tuple[list[int], list[int]]:
+    interval_starts = [0]
+    interval_rows = [NO_ROUTE]
+
+    def emit(start: int, row: int) -> None:
+        if interval_starts[-1] == start:
+            interval_rows[-1] = row
+        else:
+            interval_starts.append(start)
+            interval_rows.append(row)
+
+    # Stack of (end, row) for the prefixes enclosing the current position
+    stack: list[tuple[int, int]] = []
+    for start, end, row in zip(starts, ends, rows):
+        while stack and stack[-1][0] < start:
+            closed_end, _ = stack.pop()
+            if closed_end < top:
+                emit(closed_end + 1, stack[-1][1] if stack else NO_ROUTE)
+        emit(start, row)
+        stack.append((end, row))
+    while stack:
+        closed_end, _ = stack.pop()
+        if closed_end < top:
+            emit(closed_end + 1, stack[-1][1] if stack else NO_ROUTE)
+    return interval_starts, interval_rows
+
+
+# Longest prefix match index over one packed Network column
+class PrefixIndex:
+    def __init__(self, networks: prefix.PackedAddresses):
+        rows = np.arange(len(networks), dtype=np.int64)
+
+        # IPv4: mask off host bits, then flatten
+        ipv4 = networks.family == prefix.IPV4
+        lengths = networks.length[ipv4]
+        mask = prefix.ipv4_mask(lengths)
+        starts, lengths, ipv4_rows = _unique_prefixes(networks.ipv4[ipv4] & mask, lengths, rows[ipv4])
+        ends = starts | ~prefix.ipv4_mask(lengths)
+        interval_starts, interval_rows = _flatten(starts.tolist(), ends.tolist(), ipv4_rows.tolist(), 0xFFFFFFFF)
+        self.ipv4_starts = np.array(interval_starts, dtype=np.uint32)
+        self.ipv4_rows = np.array(interval_rows, dtype=np.int64)
+
+        # IPv6: same on 128 bit values, stored as 16 byte keys
+        ipv6 = networks.family == prefix.IPV6
+        lengths = networks.length[ipv6]
+        hi_mask, lo_mask = prefix.ipv6_mask(lengths)
+        hi, lo = networks.ipv6_hi[ipv6] & hi_mask, networks.ipv6_lo[ipv6] & lo_mask
+        keys, lengths, ipv6_rows = _unique_prefixes(_ipv6_keys(hi, lo), lengths, rows[ipv6])
+        words = keys.view(">u8").reshape(-1, 2).astype(np.uint64)
+        hi_mask, lo_mask = prefix.ipv6_mask(lengths)
+        starts = [(int(high) << 64) | int(low) for high, low in words]
+        ends = [(int(high | ~high_mask) << 64) | int(low | ~low_mask)
+                for (high, low), high_mask, low_mask in zip(words, hi_mask, lo_mask)]
+        interval_starts, interval_rows = _flatten(starts, ends, ipv6_rows.tolist(), (1 << 128) - 1)
+        self.ipv6_starts = _ipv6_keys(
+            np.array([start >> 64 for start in interval_starts], dtype=np.uint64),
+            np.array([start & 0xFFFFFFFFFFFFFFFF for start in interval_starts], dtype=np.uint64),
+        )
+        self.ipv6_rows = np.array(interval_rows, dtype=np.int64)
+
+        for array in (self.ipv4_starts, self.ipv4_rows, self.ipv6_starts, self.ipv6_rows):
+            array.setflags(write=False)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.ipv4_starts, self.ipv4_rows, self.ipv6_starts, self.ipv6_rows))
+
+    # Row of the longest matching prefix for every address (NO_ROUTE if none)
+    # Queries are sorted first so the binary searches walk memory in order
+    def lookup(self, addresses: prefix.PackedAddresses) -> np.ndarray:
+        result = np.full(len(addresses), NO_ROUTE, dtype=np.int64)
+        for family, starts, rows, keys in (
+            (prefix.IPV4, self.ipv4_starts, self.ipv4_rows, lambda selected: addresses.ipv4[selected]),
+            (prefix.IPV6, self.ipv6_starts, self.ipv6_rows,
+             lambda selected: _ipv6_keys(addresses.ipv6_hi[selected], addresses.ipv6_lo[selected])),
+        ):
+            selected = np.flatnonzero(addresses.family == family)
+            if not len(selected):
+                continue
+            queries = keys(selected)
+            order = np.argsort(queries, kind="stable")
+            positions = np.searchsorted(starts, queries[order], side="right") - 1
+            result[selected[order]] = rows[positions]
+        return result
+
+    # Row of the longest matching prefix for one address string (NO_ROUTE if none)
+    def lookup_one(self, address: str) -> int:
+        return int(self.lookup(prefix.pack(pd.Series([address], dtype=object)))[0])
@@ -0,0 +1,309 @@
+# Performance metrics of the dashboard
+#
+# Usage:
+#   with metrics.timed("analytics", metrics.AGGREGATE):
+#       ...
+#   open("metrics.prom", "w").write(metrics.prometheus_text())
+#
+# One registry per process, shared by every session and updated under a lock:
+#
+#   stage timings     wall time per page and stage (load, filter, aggregate,
+#                     figure, serialize), as Prometheus histograms
+#   cache lookups     calls and misses of the data layer's caches (bgp/data.py),
+#                     with the time spent loading on a miss
+#   memory            bytes held by each loaded dataset, measured when exported
+#                     (objects are watched through weak references, so an evicted
+#                     dataset disappears), and the process's resident set size
+#                     (where the platform reports it)
+#   payloads          bytes sent to the browser per chart and table (see
+#                     bgp/instrument.py)
+#
+# The admin page (app/admin.py) shows the registry and downloads prometheus_text().
+import functools
+import os
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Stages timed by the pages
+LOAD = "load"
+FILTER = "filter"
+AGGREGATE = "aggregate"
+FIGURE = "figure"
+SERIALIZE = "serialize"
+STAGES = (LOAD, FILTER, AGGREGATE, FIGURE, SERIALIZE)
+
+# Upper bounds (seconds) of the histogram buckets of the stage timings
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prefix of every exported metric name
+NAMESPACE = "bgp"
+
+
+# Wall times of one page stage
+@dataclass
+class Timing:
+    count: int = 0
+    total: float = 0.0
+    maximum: float = 0.0
+    last: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * len(BUCKETS))
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        self.last = seconds
+        for position, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[position] += 1
+                break
+
+
+# Lookups of one cache
+@dataclass
+class CacheStats:
+    requests: int = 0
+    misses: int = 0
+    load_seconds: float = 0.0
+
+    @property
+    def hits(self) -> int:
+        return max(self.requests - self.misses, 0)
+
+
+# Bytes sent for one chart or table
+@dataclass
+class Payload:
+    count: int = 0
+    total: int = 0
+    last: int = 0
+
+
+_lock = threading.Lock()
+_timings: dict[tuple[str, str], Timing] = {}
+_caches: dict[str, CacheStats] = {}
+_payloads: dict[tuple[str, str], Payload] = {}
+_watched: dict[tuple[str, str], weakref.ref] = {}
+_started = time.time()
+
+
+def record_stage(page: str, stage: str, seconds: float) -> None:
+    with _lock:
+        _timings.setdefault((page, stage), Timing()).add(seconds)
+
+
+# Time the block as one stage of a page
+@contextmanager
+def timed(page: str, stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(page, stage, time.perf_counter() - start)
+
+
+# Count every call of a cached function; wraps the st.cache_* decorated function
+# (cache_misses wraps the undecorated one, so only misses reach it)
+def cache_requests(name: str) -> Callable:
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _lock:
+                _caches.setdefault(name, CacheStats()).requests += 1
+            return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Count and time the calls that compute a cache entry
+def cache_misses(name: str) -> Callable:
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with _lock:
+                    stats = _caches.setdefault(name, CacheStats())
+                    stats.misses += 1
+                    stats.load_seconds += time.perf_counter() - start
+        return wrapper
+    return decorator
+
+
+# Report the bytes held by `value` (its nbytes) under kind and name while it is alive
+def watch(kind: str, name: str, value) -> None:
+    with _lock:
+        _watched[(kind, name)] = weakref.ref(value)
+
+
+def record_payload(page: str, element: str, size: int) -> None:
+    with _lock:
+        payload = _payloads.setdefault((page, element), Payload())
+        payload.count += 1
+        payload.total += size
+        payload.last = size
+
+
+# Resident set size of the process in bytes (peak size where /proc is missing,
+# None where neither is available)
+def resident_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return peak_resident_bytes()
+
+
+# Peak resident set size of the process in bytes (None without the resource module)
+def peak_resident_bytes() -> int | None:
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Bytes of every watched object still alive, dropping the collected ones
+def memory() -> dict[tuple[str, str], int]:
+    with _lock:
+        watched = list(_watched.items())
+    sizes = {}
+    for key, reference in watched:
+        value = reference()
+        if value is None:
+            with _lock:
+                if _watched.get(key) is reference:
+                    del _watched[key]
+            continue
+        sizes[key] = int(value.nbytes)
+    return sizes
+
+
+# Forget everything recorded so far
+def reset() -> None:
+    global _started
+    with _lock:
+        _timings.clear()
+        _caches.clear()
+        _payloads.clear()
+        _started = time.time()
+
+
+#################################################
+### TABLES OF THE ADMIN PAGE
+#################################################
+def timings_frame() -> pd.DataFrame:
+    with _lock:
+        rows = [(page, stage, timing.count, timing.total, timing.total / timing.count, timing.maximum, timing.last)
+                for (page, stage), timing in sorted(_timings.items()) if timing.count]
+    return pd.DataFrame(rows, columns=["page", "stage", "count", "total_seconds", "mean_seconds",
+                                       "max_seconds", "last_seconds"])
+
+
+def caches_frame() -> pd.DataFrame:
+    with _lock:
+        rows = [(name, stats.requests, stats.hits, stats.misses,
+                 stats.hits / stats.requests if stats.requests else None, stats.load_seconds)
+                for name, stats in sorted(_caches.items())]
+    return pd.DataFrame(rows, columns=["cache", "requests", "hits", "misses", "hit_ratio", "load_seconds"])
+
+
+def memory_frame() -> pd.DataFrame:
+    rows = [(kind, name, size) for (kind, name), size in sorted(memory().items())]
+    return pd.DataFrame(rows, columns=["kind", "name", "bytes"])
+
+
+def payloads_frame() -> pd.DataFrame:
+    with _lock:
+        rows = [(page, element, payload.count, payload.last, payload.total // payload.count, payload.total)
+                for (page, element), payload in sorted(_payloads.items()) if payload.count]
+    return pd.DataFrame(rows, columns=["page", "element", "count", "last_bytes", "mean_bytes", "total_bytes"])
+
+
+#################################################
+### PROMETHEUS EXPORT
+#################################################
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Everything recorded, in the Prometheus text exposition format (version 0.0.4)
+def prometheus_text() -> str:
+    with _lock:
+        timings = {key: (timing.count, timing.total, list(timing.buckets)) for key, timing in _timings.items()}
+        caches = {name: (stats.requests, stats.hits, stats.misses, stats.load_seconds)
+                  for name, stats in _caches.items()}
+        payloads = {key: (payload.count, payload.total, payload.last) for key, payload in _payloads.items()}
+        started = _started
+    lines = []
+
+    def family(name: str, kind: str, description: str, samples) -> None:
+        lines.append(f"# HELP {NAMESPACE}_{name} {description}")
+        lines.append(f"# TYPE {NAMESPACE}_{name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{NAMESPACE}_{name}{suffix}{_labels(**labels)} {_number(value)}")
+
+    histogram = []
+    for (page, stage), (count, total, buckets) in sorted(timings.items()):
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS, buckets):
+            cumulative += bucket
+            histogram.append(("_bucket", {"page": page, "stage": stage, "le": repr(bound)}, cumulative))
+        histogram.append(("_bucket", {"page": page, "stage": stage, "le": "+Inf"}, count))
+        histogram.append(("_sum", {"page": page, "stage": stage}, total))
+        histogram.append(("_count", {"page": page, "stage": stage}, count))
+    family("stage_seconds", "histogram", "Wall time of a page stage.", histogram)
+
+    family("cache_requests_total", "counter", "Calls of a cached data loader.",
+           [("", {"cache": name}, requests) for name, (requests, _, _, _) in sorted(caches.items())])
+    family("cache_hits_total", "counter", "Calls served from the cache.",
+           [("", {"cache": name}, hits) for name, (_, hits, _, _) in sorted(caches.items())])
+    family("cache_misses_total", "counter", "Calls that computed a cache entry.",
+           [("", {"cache": name}, misses) for name, (_, _, misses, _) in sorted(caches.items())])
+    family("cache_load_seconds_total", "counter", "Time spent computing cache entries.",
+           [("", {"cache": name}, seconds) for name, (_, _, _, seconds) in sorted(caches.items())])
+
+    family("dataset_bytes", "gauge", "Bytes held by a loaded dataset and its derived views.",
+           [("", {"kind": kind, "name": name}, size) for (kind, name), size in sorted(memory().items())])
+    resident, peak = resident_bytes(), peak_resident_bytes()
+    family("process_resident_bytes", "gauge", "Resident set size of the dashboard process.",
+           [("", {}, resident)] if resident is not None else [])
+    family("process_peak_resident_bytes", "gauge", "Peak resident set size of the dashboard process.",
+           [("", {}, peak)] if peak is not None else [])
+
+    family("payload_bytes_total", "counter", "Bytes sent to the browser for a chart or table.",
+           [("", {"page": page, "element": element}, total)
+            for (page, element), (_, total, _) in sorted(payloads.items())])
+    family("payload_renders_total", "counter", "Renders of a chart or table.",
+           [("", {"page": page, "element": element}, count)
+            for (page, element), (count, _, _) in sorted(payloads.items())])
+    family("payload_last_bytes", "gauge", "Bytes sent for the latest render of a chart or table.",
+           [("", {"page": page, "element": element}, last)
+            for (page, element), (_, _, last) in sorted(payloads.items())])
+
+    family("metrics_start_time_seconds", "gauge", "Unix time the metrics were last reset.", [("", {}, started)])
+    return "\n".join(lines) + "\n"
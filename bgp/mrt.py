@@ -0,0 +1,303 @@
+# Reader for MRT routing table dumps (RFC 6396, TABLE_DUMP_V2)
+#
+# Usage:
+#   python -m bgp.mrt rib.20241017.0000.mrt --csv data/data.csv
+#
+# Collectors write their RIB as MRT records: one RIB record per prefix, holding
+# one entry per peer that announced it. The file is memory-mapped (compressed
+# .gz/.bz2 dumps are decompressed into memory) and decoded with struct on a
+# memoryview, so record bodies are never copied. Routes sharing the same path
+# attributes, which most do, share one decoded attribute tuple: the attributes
+# are looked up in a cache keyed by a zero-copy slice of their bytes and only
+# decoded on a miss.
+#
+# Every RIB entry becomes one route with the columns of bgp.parser, in the same
+# order as `show ip bgp` (the paths of a prefix are consecutive): Network,
+# NextHop, Metric (MED), LocPrf (LOCAL_PREF), Weight (always 0, it is local to a
+# router) and Path (the AS_PATH followed by the origin code). bgp.ingest reads
+# MRT files through iter_file/parse_range just like text dumps.
+import argparse
+import bz2
+import gzip
+import mmap
+import os
+import socket
+import struct
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import pandas as pd
+
+from bgp import aspath, parser
+
+# MRT common header: timestamp, type, subtype, body length
+HEADER = struct.Struct(">IHHI")
+
+TABLE_DUMP_V2 = 13
+
+# RIB subtypes read: address family and whether entries carry a path identifier
+# (RIB_IPV4_UNICAST, RIB_IPV6_UNICAST and their ADD-PATH variants of RFC 8050)
+RIB_SUBTYPES = {
+    2: (socket.AF_INET, False),
+    4: (socket.AF_INET6, False),
+    8: (socket.AF_INET, True),
+    10: (socket.AF_INET6, True),
+}
+
+# Record types that may start an MRT file (TABLE_DUMP, TABLE_DUMP_V2, BGP4MP(_ET))
+MRT_TYPES = {12, 13, 16, 17}
+
+# BGP path attribute type codes
+ORIGIN, AS_PATH, NEXT_HOP, MULTI_EXIT_DISC, LOCAL_PREF, MP_REACH_NLRI = 1, 2, 3, 4, 5, 14
+
+# Attribute flag for a two byte length
+EXTENDED_LENGTH = 0x10
+
+# Origin codes as printed at the end of a path
+ORIGIN_CODES = {0: "i", 1: "e", 2: "?"}
+
+# AS_PATH segment types: AS_SET, AS_SEQUENCE, AS_CONFED_SEQUENCE, AS_CONFED_SET
+AS_SET, AS_SEQUENCE, AS_CONFED_SEQUENCE, AS_CONFED_SET = 1, 2, 3, 4
+
+# Decoded attribute sets kept per file before the cache is cleared
+MAX_CACHED_ATTRIBUTES = 100_000
+
+# Extensions of the compressed dumps the collectors publish
+COMPRESSED = {".gz": gzip.open, ".bz2": bz2.open}
+
+U16 = struct.Struct(">H")
+U32 = struct.Struct(">I")
+
+
+# Check whether a file is an MRT dump (rather than `show ip bgp` text) from the
+# type and subtype of its first record
+def is_mrt(file_name: str) -> bool:
+    opener = COMPRESSED.get(os.path.splitext(file_name)[1], open)
+    with opener(file_name, "rb") as file:
+        header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return False
+    _, record_type, subtype, _ = HEADER.unpack(header)
+    return record_type in MRT_TYPES and subtype < 0x100
+
+
+# Whole file as a read-only buffer: memory-mapped, or decompressed for .gz/.bz2
+@contextmanager
+def _buffer(file_name: str):
+    opener = COMPRESSED.get(os.path.splitext(file_name)[1])
+    if opener is not None:
+        with opener(file_name, "rb") as file:
+            data = file.read()
+        with memoryview(data) as view:
+            yield view
+        return
+    with open(file_name, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield memoryview(b"")
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                yield view
+
+
+# Text of an AS_PATH attribute (four byte ASNs, as in every TABLE_DUMP_V2 file),
+# formatted like `show ip bgp`: "3356 {174,2914}", confederations in brackets
+def _as_path(view: memoryview, position: int, end: int) -> str:
+    segments = []
+    while position + 2 <= end:
+        segment_type, count = view[position], view[position + 1]
+        asns = struct.unpack_from(f">{count}I", view, position + 2)
+        position += 2 + 4 * count
+        if segment_type == AS_SEQUENCE:
+            segments.append(" ".join(map(str, asns)))
+        elif segment_type == AS_SET:
+            segments.append("{" + ",".join(map(str, asns)) + "}")
+        elif segment_type == AS_CONFED_SEQUENCE:
+            segments.append("(" + " ".join(map(str, asns)) + ")")
+        elif segment_type == AS_CONFED_SET:
+            segments.append("[" + " ".join(map(str, asns)) + "]")
+    return " ".join(segment for segment in segments if segment)
+
+
+# Next hop of an MP_REACH_NLRI attribute
+# TABLE_DUMP_V2 stores it abbreviated to the next hop length and address; some
+# writers keep the AFI, SAFI and NLRI of the full attribute, which is detected
+# from the length. Of a global and link-local pair, the global address is kept.
+def _mp_next_hop(view: memoryview, position: int, length: int) -> str | None:
+    if length == 0:
+        return None
+    if view[position] + 1 > length or view[position] not in (4, 16, 32):
+        position += 3
+    size = view[position]
+    if size == 4:
+        return socket.inet_ntop(socket.AF_INET, view[position + 1:position + 5])
+    if size in (16, 32):
+        return socket.inet_ntop(socket.AF_INET6, view[position + 1:position + 17])
+    return None
+
+
+# NextHop, Metric, LocPrf and Path of a route from its path attributes
+def _attributes(view: memoryview, position: int, end: int, family: int) -> tuple:
+    next_hop = mp_next_hop = metric = locprf = None
+    path, origin = "", "?"
+    while position + 3 <= end:
+        flags, code = view[position], view[position + 1]
+        if flags & EXTENDED_LENGTH:
+            length = U16.unpack_from(view, position + 2)[0]
+            position += 4
+        else:
+            length = view[position + 2]
+            position += 3
+        if code == ORIGIN:
+            origin = ORIGIN_CODES.get(view[position], "?")
+        elif code == AS_PATH:
+            path = _as_path(view, position, position + length)
+        elif code == NEXT_HOP and length == 4:
+            next_hop = socket.inet_ntop(socket.AF_INET, view[position:position + 4])
+        elif code == MULTI_EXIT_DISC:
+            metric = U32.unpack_from(view, position)[0]
+        elif code == LOCAL_PREF:
+            locprf = U32.unpack_from(view, position)[0]
+        elif code == MP_REACH_NLRI:
+            mp_next_hop = _mp_next_hop(view, position, length)
+        position += length
+    # IPv6 routes carry their next hop in MP_REACH_NLRI, IPv4 routes in NEXT_HOP
+    if family == socket.AF_INET6 or next_hop is None:
+        next_hop = mp_next_hop or next_hop
+    return next_hop, metric, locprf, f"{path} {origin}" if path else origin
+
+
+# Decode one RIB record into the column lists; returns the number of routes
+def _read_rib(view: memoryview, position: int, family: int, add_path: bool,
+              columns: tuple[list, ...], cache: dict) -> int:
+    networks, next_hops, metrics, locprfs, paths = columns
+    prefix_length = view[position + 4]
+    size = (prefix_length + 7) // 8
+    address = view[position + 5:position + 5 + size].tobytes().ljust(4 if family == socket.AF_INET else 16, b"\0")
+    network = f"{socket.inet_ntop(family, address)}/{prefix_length}"
+    position += 5 + size
+    entry_count = U16.unpack_from(view, position)[0]
+    position += 2
+
+    # Peer index and originated time, then the path identifier with ADD-PATH
+    entry_header = 10 if add_path else 6
+    for _ in range(entry_count):
+        position += entry_header
+        length = U16.unpack_from(view, position)[0]
+        position += 2
+        key = view[position:position + length]
+        attributes = cache.get(key)
+        if attributes is None:
+            if len(cache) >= MAX_CACHED_ATTRIBUTES:
+                cache.clear()
+            attributes = cache[key] = _attributes(view, position, position + length, family)
+        position += length
+        next_hop, metric, locprf, path = attributes
+        networks.append(network)
+        next_hops.append(next_hop)
+        metrics.append(metric)
+        locprfs.append(locprf)
+        paths.append(path)
+    return entry_count
+
+
+# Routes of the column lists as a DataFrame with the types of bgp.parser
+def _frame(columns: tuple[list, ...]) -> pd.DataFrame:
+    networks, next_hops, metrics, locprfs, paths = columns
+    return pd.DataFrame({
+        "Network": pd.Series(networks, dtype=object),
+        "NextHop": pd.Series(next_hops, dtype=object),
+        "Metric": pd.array(metrics, dtype="Int64"),
+        "LocPrf": pd.array(locprfs, dtype="Int64"),
+        "Weight": pd.array([0] * len(networks), dtype="Int64"),
+        "Path": pd.Series(paths, dtype=object),
+    })
+
+
+# Decode the records in [start, end) of a buffer into DataFrame chunks of about
+# `chunk_size` routes (a chunk always ends on a record, so a prefix's paths stay
+# together); records other than unicast RIB records are skipped
+def _iter_frames(view: memoryview, start: int, end: int, chunk_size: int) -> Iterator[pd.DataFrame]:
+    # Keys of the cache are slices of the buffer; it is cleared before the buffer
+    # is released
+    cache = {}
+    try:
+        position = start
+        while position < end:
+            columns = ([], [], [], [], [])
+            routes = 0
+            while position < end and routes < chunk_size:
+                _, record_type, subtype, length = HEADER.unpack_from(view, position)
+                body = position + HEADER.size
+                position = body + length
+                if record_type == TABLE_DUMP_V2 and subtype in RIB_SUBTYPES:
+                    routes += _read_rib(view, body, *RIB_SUBTYPES[subtype], columns, cache)
+            if routes:
+                yield _frame(columns)
+    finally:
+        cache.clear()
+
+
+# Parse an MRT dump into DataFrame chunks
+def iter_file(file_name: str, chunk_size: int = parser.DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    with _buffer(file_name) as view:
+        yield from _iter_frames(view, 0, len(view), chunk_size)
+
+
+# Split a dump into about `parts` byte ranges on record boundaries, for parallel
+# parsing. MRT records have no sync marker, so boundaries are found by walking the
+# record headers. Compressed dumps are one range; its end is None (the end of the
+# decompressed data).
+def split_ranges(file_name: str, parts: int) -> list[tuple[int, int | None]]:
+    if os.path.splitext(file_name)[1] in COMPRESSED:
+        return [(0, None)]
+    size = os.path.getsize(file_name)
+    parts = max(1, min(parts, size // parser.MIN_RANGE_BYTES))
+    starts = [0]
+    with _buffer(file_name) as view:
+        position = 0
+        for part in range(1, parts):
+            cut = size * part // parts
+            while position < cut:
+                position += HEADER.size + HEADER.unpack_from(view, position)[3]
+            if starts[-1] < position < size:
+                starts.append(position)
+    return list(zip(starts, starts[1:] + [size]))
+
+
+# Parse one byte range of a dump (see split_ranges) into a single DataFrame
+def parse_range(file_name: str, start: int, end: int | None,
+                chunk_size: int = parser.DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    with _buffer(file_name) as view:
+        frames = list(_iter_frames(view, start, len(view) if end is None else end, chunk_size))
+    if not frames:
+        return parser.empty_frame()
+    return pd.concat(frames, ignore_index=True)
+
+
+# Parse a whole dump into a single DataFrame
+def parse_file(file_name: str, chunk_size: int = parser.DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    return parse_range(file_name, 0, None, chunk_size)
+
+
+def main(argv: list[str] | None = None) -> None:
+    argument_parser = argparse.ArgumentParser(description="Convert MRT RIB dumps to a route CSV")
+    argument_parser.add_argument("files", nargs="+", help="MRT TABLE_DUMP_V2 files (.mrt, .gz, .bz2)")
+    argument_parser.add_argument("--csv", required=True, help="CSV file to write, e.g. data/data.csv")
+    argument_parser.add_argument("--chunk-size", type=int, default=parser.DEFAULT_CHUNK_SIZE, help="routes per batch")
+    args = argument_parser.parse_args(argv)
+
+    start = time.perf_counter()
+    routes = 0
+    header = True
+    for file_name in args.files:
+        for frame in iter_file(file_name, args.chunk_size):
+            aspath.add_derived_columns(frame).to_csv(args.csv, mode="w" if header else "a", header=header, index=False)
+            header = False
+            routes += len(frame)
+    print(f"{routes} routes written to {args.csv} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
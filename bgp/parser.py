@@ -0,0 +1,227 @@
+# Parser for the command line output of `show ip bgp` / `show bgp ipv6 unicast`
+# (the typescript.IPV4.RR and typescript.IPV6.RR files).
+#
+# The file is read as a stream: lines are grouped into route records, records are
+# collected into batches and each batch is tokenized with vectorized pandas string
+# operations. Callers get typed DataFrame chunks and never hold the whole file in
+# memory.
+import io
+import itertools
+import os
+import re
+from typing import Iterable, Iterator, NamedTuple
+
+import pandas as pd
+
+# Columns of the ipv4_ipv6 table, in insertion order
+COLUMNS = ["Network", "NextHop", "Metric", "LocPrf", "Weight", "Path"]
+
+# Number of route records per DataFrame chunk
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Smallest byte range worth handing to a separate worker (see split_ranges)
+MIN_RANGE_BYTES = 4 << 20
+
+# Without a header line, a gap wider than this after the next hop means the
+# Metric column is empty (the rule used by the original extractor)
+METRIC_GAP = 15
+
+# Flag characters stored in front of each record for the Metric and LocPrf columns
+FILLED, EMPTY, UNKNOWN = "1", "0", "-"
+
+# A record line: the two column flags, a tab, then the status codes, network, next hop,
+# the gap after the next hop and the remaining fields.
+# The network is empty on the additional paths of a prefix.
+_RECORD_RE = re.compile(
+    r"^(?P<HasMetric>[10-])(?P<HasLocPrf>[10-])\t.{3}(?P<Network>\S*)[ \t]+(?P<NextHop>\S+)"
+    r"(?P<Gap>[ \t]+)(?P<Rest>\S.*?)[ \t]*$",
+    re.MULTILINE,
+)
+_GROUPS = list(_RECORD_RE.groupindex)
+
+
+# Column layout taken from the table header
+# Metric and LocPrf are right-aligned and end under the last letter of their header
+class Columns(NamedTuple):
+    metric_end: int
+    locprf_end: int
+
+
+# Read the column layout from a header line, or None if the line is not a header
+def parse_header(line: str) -> Columns | None:
+    if "Next Hop" not in line or "Metric" not in line or "LocPrf" not in line:
+        return None
+    return Columns(line.index("Metric") + len("Metric"), line.index("LocPrf") + len("LocPrf"))
+
+
+# Prefix a record with the Metric/LocPrf flags read from its last physical line
+def _record(text: str, tail: str, columns: Columns | None) -> str:
+    if columns is None:
+        return UNKNOWN + UNKNOWN + "\t" + text
+    metric_end, locprf_end = columns
+    has_metric = FILLED if len(tail) >= metric_end and tail[metric_end - 1] != " " else EMPTY
+    has_locprf = FILLED if len(tail) >= locprf_end and tail[locprf_end - 1] != " " else EMPTY
+    return has_metric + has_locprf + "\t" + text
+
+
+# Group the raw lines of a dump into record lines (see _RECORD_RE)
+# A record starts with "*" and continues on the following lines that start with a
+# space (long IPv6 prefixes and next hops wrap onto a new line). The last physical
+# line of a record keeps the column positions of Metric/LocPrf/Weight, which is
+# how empty columns are told apart once the record is joined onto one line.
+def iter_records(lines: Iterable[str], columns: Columns | None = None) -> Iterator[str]:
+    text = None
+    tail = ""
+    for line in lines:
+        if line.startswith("*"):
+            if text is not None:
+                yield _record(text, tail, columns)
+            text = line.strip()
+            tail = line
+        elif text is not None and line.startswith(" ") and not line.isspace():
+            text += " " + line.strip()
+            tail = line
+        else:
+            # Headers, footers and blank lines end the current record
+            if text is not None:
+                yield _record(text, tail, columns)
+                text = None
+            columns = parse_header(line) or columns
+    if text is not None:
+        yield _record(text, tail, columns)
+
+
+# Split the text after the next hop into Metric/LocPrf/Weight/Path
+# Rows are grouped by which optional columns are present so each group is a
+# single vectorized split
+def _split_fields(rest: pd.Series, has_metric: pd.Series, has_locprf: pd.Series) -> pd.DataFrame:
+    fields = pd.DataFrame(None, index=rest.index, columns=["Metric", "LocPrf", "Weight", "Path"], dtype=object)
+    for metric, locprf in itertools.product((True, False), repeat=2):
+        rows = (has_metric == metric) & (has_locprf == locprf)
+        if not rows.any():
+            continue
+        names = [name for name, present in (("Metric", metric), ("LocPrf", locprf)) if present] + ["Weight", "Path"]
+        tokens = rest[rows].str.split(n=len(names) - 1, expand=True).reindex(columns=range(len(names)))
+        tokens.columns = names
+        fields.loc[rows, names] = tokens
+    return fields
+
+
+# Tokenize a batch of record lines into a typed DataFrame
+# `previous_network` is the last network of the preceding batch, used when the
+# batch starts with an additional path of that prefix
+def records_to_frame(records: list[str], previous_network: str | None = None) -> pd.DataFrame:
+    # One regex pass over the whole batch; lines that are not route entries don't match
+    matched = pd.DataFrame(_RECORD_RE.findall("\n".join(records)), columns=_GROUPS, dtype=object)
+
+    # Without a header, fall back to the gap rule for Metric and assume LocPrf is set
+    gap_metric = matched["Gap"].str.len() <= METRIC_GAP
+    has_metric = (matched["HasMetric"] == FILLED) | ((matched["HasMetric"] == UNKNOWN) & gap_metric)
+    has_locprf = matched["HasLocPrf"] != EMPTY
+    fields = _split_fields(matched["Rest"], has_metric, has_locprf)
+
+    # Additional paths of a prefix leave the Network column blank
+    network = matched["Network"].mask(matched["Network"] == "")
+    if previous_network is not None and len(network) and pd.isna(network.iloc[0]):
+        network.iloc[0] = previous_network
+    network = network.ffill()
+
+    frame = pd.DataFrame({
+        "Network": network.astype(object),
+        "NextHop": matched["NextHop"].astype(object),
+        "Metric": pd.to_numeric(fields["Metric"], errors="coerce").astype("Int64"),
+        "LocPrf": pd.to_numeric(fields["LocPrf"], errors="coerce").astype("Int64"),
+        "Weight": pd.to_numeric(fields["Weight"], errors="coerce").astype("Int64"),
+        "Path": fields["Path"].fillna("").astype(object),
+    })
+    return frame.reset_index(drop=True)
+
+
+# Parse an iterable of lines into DataFrame chunks of at most `chunk_size` routes
+def iter_frames(lines: Iterable[str], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                columns: Columns | None = None) -> Iterator[pd.DataFrame]:
+    records = iter_records(lines, columns)
+    previous_network = None
+    while True:
+        batch = list(itertools.islice(records, chunk_size))
+        if not batch:
+            break
+        frame = records_to_frame(batch, previous_network)
+        if len(frame):
+            previous_network = frame["Network"].iloc[-1]
+            yield frame
+
+
+# Parse a dump file into DataFrame chunks
+def iter_file(file_name: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    with open(file_name, "r", encoding="utf-8", errors="replace") as file:
+        yield from iter_frames(file, chunk_size)
+
+
+# Read the column layout from the table header at the top of a dump
+def read_columns(file_name: str) -> Columns | None:
+    with open(file_name, "r", encoding="utf-8", errors="replace") as file:
+        for line in file:
+            if line.startswith("*"):
+                # Route records before any header
+                return None
+            columns = parse_header(line)
+            if columns is not None:
+                return columns
+    return None
+
+
+# Check whether a raw line starts a record that has its own network
+# (additional paths have a blank network and belong with the record above)
+def _starts_prefix(line: bytes) -> bool:
+    return line.startswith(b"*") and len(line) > 3 and not line[3:4].isspace()
+
+
+# Split a dump into about `parts` byte ranges for parallel parsing
+# Every range but the first starts on a line returned by _starts_prefix, so no
+# record and no group of additional paths is cut in two
+def split_ranges(file_name: str, parts: int) -> list[tuple[int, int]]:
+    size = os.path.getsize(file_name)
+    parts = max(1, min(parts, size // MIN_RANGE_BYTES))
+    starts = [0]
+    with open(file_name, "rb") as file:
+        for part in range(1, parts):
+            file.seek(max(size * part // parts, starts[-1]))
+            # Skip the (possibly partial) line under the cut
+            file.readline()
+            while True:
+                position = file.tell()
+                line = file.readline()
+                if not line or _starts_prefix(line):
+                    break
+            if starts[-1] < position < size:
+                starts.append(position)
+    return list(zip(starts, starts[1:] + [size]))
+
+
+# Parse one byte range of a dump into a single DataFrame
+# `columns` is the layout read from the top of the file with read_columns()
+def parse_range(file_name: str, start: int, end: int, columns: Columns | None = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    with open(file_name, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    # Decode the same way as open(file_name, "r") so ranges match iter_file()
+    lines = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="replace")
+    frames = list(iter_frames(lines, chunk_size, columns))
+    if not frames:
+        return empty_frame()
+    return pd.concat(frames, ignore_index=True)
+
+
+# Parse a whole dump file into a single DataFrame
+def parse_file(file_name: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    frames = list(iter_file(file_name, chunk_size))
+    if not frames:
+        return empty_frame()
+    return pd.concat(frames, ignore_index=True)
+
+
+# An empty DataFrame with the parser's column types
+def empty_frame() -> pd.DataFrame:
+    return records_to_frame([])
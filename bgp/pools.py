@@ -0,0 +1,20 @@
+# Process pools that are safe to start from the dashboard
+#
+# Usage:
+#   with pools.process_pool(4) as pool:
+#       results = list(pool.map(function, batches))
+#
+# The Streamlit server is multi-threaded, and forking a multi-threaded process
+# can leave the child waiting forever on a lock another thread held (Python 3.12
+# warns about it). Pools therefore start their workers from a fork server where
+# the platform has one, and as fresh interpreters otherwise (Windows). Functions
+# and arguments sent to the workers must be picklable.
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# How worker processes are started
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(START_METHOD))
@@ -0,0 +1,192 @@
+# Packed numeric form of the Network and NextHop columns
+#
+# Each value is parsed once into fixed-width integers: IPv4 as a uint32 address,
+# IPv6 as two uint64 words (high and low 64 bits), plus the prefix length and the
+# address family. Family splits, prefix length histograms and range filters are
+# then NumPy operations instead of regex scans over strings.
+import ipaddress
+import socket
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Address family codes (0 marks values that could not be parsed)
+IPV4 = 4
+IPV6 = 6
+
+# Full prefix length per family
+MAX_LENGTH = {IPV4: 32, IPV6: 128}
+
+_ADDRESS_RE = r"^(?P<address>[^/]+)(?:/(?P<length>\d+))?$"
+_ZERO_IPV6 = bytes(16)
+
+
+# Packed addresses of one column, one entry per row
+# Fields that don't apply to a row's family are 0
+@dataclass(frozen=True)
+class PackedAddresses:
+    family: np.ndarray   # uint8, IPV4 / IPV6 / 0
+    ipv4: np.ndarray     # uint32
+    ipv6_hi: np.ndarray  # uint64, bits 127..64
+    ipv6_lo: np.ndarray  # uint64, bits 63..0
+    length: np.ndarray   # uint8 prefix length (32/128 for plain addresses)
+
+    def __len__(self) -> int:
+        return len(self.family)
+
+    def take(self, rows: np.ndarray) -> "PackedAddresses":
+        return PackedAddresses(*(array[rows] for array in self._arrays()))
+
+    def _arrays(self) -> tuple[np.ndarray, ...]:
+        return self.family, self.ipv4, self.ipv6_hi, self.ipv6_lo, self.length
+
+    # Make every array read-only (packed columns are shared between sessions)
+    def freeze(self) -> "PackedAddresses":
+        for array in self._arrays():
+            array.setflags(write=False)
+        return self
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self._arrays())
+
+
+# Parse dotted-quad strings (already validated as IPv4-looking) into uint32
+def _pack_ipv4(addresses: pa.Array) -> tuple[np.ndarray, np.ndarray]:
+    octets = pc.split_pattern(addresses, ".")
+    valid = pc.equal(pc.list_value_length(octets), 4).to_numpy(zero_copy_only=False)
+    values = np.zeros(len(addresses), dtype=np.uint32)
+    if valid.any():
+        flat = pc.list_flatten(octets.filter(pa.array(valid)))
+        numbers = _to_int(flat).reshape(-1, 4)
+        valid_rows = np.flatnonzero(valid)
+        in_range = (numbers >= 0).all(axis=1) & (numbers <= 255).all(axis=1)
+        numbers = numbers.astype(np.uint32)
+        packed = (numbers[:, 0] << 24) | (numbers[:, 1] << 16) | (numbers[:, 2] << 8) | numbers[:, 3]
+        values[valid_rows] = np.where(in_range, packed, 0)
+        valid[valid_rows[~in_range]] = False
+    return values, valid
+
+
+# Cast decimal strings to int64, with -1 for anything that isn't a number
+def _to_int(strings: pa.Array) -> np.ndarray:
+    digits = pc.match_substring_regex(strings, r"^\d{1,10}$")
+    cleaned = pc.if_else(digits, strings, pa.scalar("-1"))
+    return pc.cast(cleaned, pa.int64()).to_numpy(zero_copy_only=False)
+
+
+def _ipv6_bytes(address: str) -> bytes:
+    try:
+        return socket.inet_pton(socket.AF_INET6, address)
+    except (OSError, ValueError):
+        return b""
+
+
+# Parse IPv6 strings into (high, low) uint64 words
+# inet_pton handles the "::" and embedded IPv4 forms; invalid values give zeros
+def _pack_ipv6(addresses: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    packed = [_ipv6_bytes(address) for address in addresses]
+    valid = np.fromiter((len(value) == 16 for value in packed), dtype=bool, count=len(packed))
+    words = np.frombuffer(b"".join(value or _ZERO_IPV6 for value in packed), dtype=">u8").reshape(-1, 2)
+    return words[:, 0].astype(np.uint64), words[:, 1].astype(np.uint64), valid
+
+
+# Parse a column of addresses or prefixes ("10.0.0.0/8", "2001:db8::/32", "192.0.2.1")
+# Categorical columns are parsed once per category
+def pack(values: pd.Series) -> PackedAddresses:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = pack(pd.Series(values.cat.categories.astype(str)))
+        codes = values.cat.codes.to_numpy()
+        packed = categories.take(np.where(codes >= 0, codes, 0))
+        if (codes < 0).any():
+            packed.family[codes < 0] = 0
+        return packed
+
+    count = len(values)
+    strings = pa.array(values, type=pa.string(), from_pandas=True)
+    parts = pc.extract_regex(strings, _ADDRESS_RE)
+    address = pc.struct_field(parts, [0])
+    length_text = pc.struct_field(parts, [1])
+
+    has_colon = pc.fill_null(pc.match_substring(address, ":"), False).to_numpy(zero_copy_only=False)
+    has_dot = pc.fill_null(pc.match_substring(address, "."), False).to_numpy(zero_copy_only=False)
+
+    family = np.zeros(count, dtype=np.uint8)
+    ipv4 = np.zeros(count, dtype=np.uint32)
+    ipv6_hi = np.zeros(count, dtype=np.uint64)
+    ipv6_lo = np.zeros(count, dtype=np.uint64)
+
+    ipv4_rows = np.flatnonzero(has_dot & ~has_colon)
+    if len(ipv4_rows):
+        values4, valid4 = _pack_ipv4(address.take(pa.array(ipv4_rows)))
+        ipv4[ipv4_rows] = values4
+        family[ipv4_rows[valid4]] = IPV4
+
+    ipv6_rows = np.flatnonzero(has_colon)
+    if len(ipv6_rows):
+        hi, lo, valid6 = _pack_ipv6(address.take(pa.array(ipv6_rows)).to_pylist())
+        ipv6_hi[ipv6_rows] = hi
+        ipv6_lo[ipv6_rows] = lo
+        family[ipv6_rows[valid6]] = IPV6
+
+    # Prefix length, defaulting to a host route; out of range lengths are invalid
+    lengths = _to_int(pc.fill_null(length_text, ""))
+    full = np.where(family == IPV6, 128, 32)
+    lengths = np.where(lengths < 0, full, lengths)
+    family[lengths > full] = 0
+    length = np.where(family > 0, lengths, 0).astype(np.uint8)
+
+    return PackedAddresses(family, ipv4, ipv6_hi, ipv6_lo, length)
+
+
+# Number of prefixes of each length for one family (index = prefix length)
+def length_histogram(packed: PackedAddresses, family: int) -> np.ndarray:
+    return np.bincount(packed.length[packed.family == family], minlength=MAX_LENGTH[family] + 1)
+
+
+# Network mask for each prefix length: uint32 for IPv4, (high, low) uint64 for IPv6
+def ipv4_mask(length: np.ndarray) -> np.ndarray:
+    length = np.asarray(length, dtype=np.uint64)
+    return ((np.uint64(0xFFFFFFFF) << (np.uint64(32) - length)) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def ipv6_mask(length: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    length = np.asarray(length, dtype=np.int64)
+    return _word_mask(np.clip(length, 0, 64)), _word_mask(np.clip(length - 64, 0, 64))
+
+
+# Mask with the top `bits` bits of a 64 bit word set
+def _word_mask(bits: np.ndarray) -> np.ndarray:
+    ones = np.uint64(0xFFFFFFFFFFFFFFFF)
+    bits = np.asarray(bits, dtype=np.uint64)
+    # A shift by 64 is undefined, so full masks are handled separately
+    return np.where(bits >= 64, ones, ~(ones >> np.minimum(bits, np.uint64(63))))
+
+
+# Rows whose prefix lies inside `prefix` (e.g. "10.0.0.0/8" matches 10.1.0.0/16),
+# optionally limited to prefix lengths in [min_length, max_length]
+def within(packed: PackedAddresses, prefix: str, min_length: int = 0, max_length: int = 128) -> np.ndarray:
+    network = ipaddress.ip_network(prefix, strict=False)
+    length = packed.length
+    rows = (length >= max(min_length, network.prefixlen)) & (length <= max_length)
+    if network.version == 4:
+        mask = ipv4_mask(np.uint64(network.prefixlen))
+        return rows & (packed.family == IPV4) & ((packed.ipv4 & mask) == np.uint32(int(network.network_address)))
+    value = int(network.network_address)
+    hi_mask, lo_mask = ipv6_mask(np.int64(network.prefixlen))
+    return (rows & (packed.family == IPV6)
+            & ((packed.ipv6_hi & hi_mask) == np.uint64(value >> 64))
+            & ((packed.ipv6_lo & lo_mask) == np.uint64(value & 0xFFFFFFFFFFFFFFFF)))
+
+
+# Format packed IPv4 values back to dotted quads (for display)
+def format_ipv4(values: np.ndarray) -> list[str]:
+    return [str(ipaddress.IPv4Address(int(value))) for value in values]
+
+
+# Format packed IPv6 words back to text (for display)
+def format_ipv6(hi: np.ndarray, lo: np.ndarray) -> list[str]:
+    return [str(ipaddress.IPv6Address((int(high) << 64) | int(low))) for high, low in zip(hi, lo)]
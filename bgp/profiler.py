@@ -0,0 +1,394 @@
+# Streaming column profile of a route table
+#
+# Usage (the analytics page builds and caches it per file version as well):
+#   python -m bgp.profiler data/data.csv --workers 4
+#
+# One pass over the table, a bounded number of rows at a time: the memory-mapped
+# columnar cache when it is fresh, otherwise the CSV itself in byte ranges (the
+# cache isn't built for this, since building it loads the whole CSV). Every chunk
+# is profiled on its own and the results are merged, so chunks can be profiled on
+# a process pool in any order.
+#
+# Per column: type, non-null and null counts; for numeric columns also min/max,
+# mean/std (merged with Chan's formulas) and a quantile sketch. The sketch keeps
+# exact value counts while a column has at most MAX_EXACT_VALUES distinct values
+# (the route table's small integer columns), then switches to logarithmic buckets
+# (DDSketch) whose quantiles are within SKETCH_ACCURACY relative error. Both are
+# mergeable and small, whatever the number of rows. The profile is stored as a
+# JSON file next to the CSV, tagged with the CSV content hash.
+import argparse
+import collections
+import json
+import math
+import os
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+
+from bgp import aspath, cache, pools, summary
+
+# Extension of the profile file written next to the CSV
+PROFILE_EXTENSION = ".profile.json"
+
+# Rows profiled at a time from the columnar cache
+BATCH_ROWS = 1_000_000
+
+# Bytes of CSV parsed at a time
+RANGE_BYTES = 32 << 20
+
+# Distinct values counted exactly before a sketch switches to buckets
+MAX_EXACT_VALUES = 2048
+
+# Relative error of the quantiles of a bucketed sketch
+SKETCH_ACCURACY = 0.01
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+# Quantiles reported by describe()
+QUANTILES = (0.25, 0.5, 0.75)
+
+# Arrow types of the CSV columns (see cache.CSV_DTYPES)
+CSV_TYPES = {column: pa.string() if dtype.startswith("string") else pa.int64()
+             for column, dtype in cache.CSV_DTYPES.items()}
+
+
+# Representative value of the logarithmic bucket of each value
+# Bucket k holds magnitudes in (gamma^(k-1), gamma^k]; its representative
+# 2 gamma^k / (gamma + 1) is within SKETCH_ACCURACY of all of them
+def _bucket(values: np.ndarray) -> np.ndarray:
+    magnitude = np.abs(values)
+    with np.errstate(divide="ignore"):
+        exponent = np.ceil(np.log(magnitude) / _LOG_GAMMA)
+    return np.where(magnitude > 0, np.sign(values) * 2 * _GAMMA ** exponent / (_GAMMA + 1), 0.0)
+
+
+# Sorted distinct values with their summed counts
+def _aggregate(values: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    keys, inverse = np.unique(values, return_inverse=True)
+    totals = np.zeros(len(keys), dtype=np.int64)
+    np.add.at(totals, inverse, counts)
+    return keys, totals
+
+
+# Mergeable quantile sketch: a histogram of exact values, or of bucket representatives
+@dataclass
+class QuantileSketch:
+    values: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float64))
+    counts: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    exact: bool = True
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> "QuantileSketch":
+        keys, counts = np.unique(values, return_counts=True)
+        return cls(keys, counts.astype(np.int64))._bounded()
+
+    # Switch to buckets once there are too many exact values
+    def _bounded(self) -> "QuantileSketch":
+        if self.exact and len(self.values) > MAX_EXACT_VALUES:
+            return self.bucketed()
+        return self
+
+    def bucketed(self) -> "QuantileSketch":
+        if not self.exact:
+            return self
+        return QuantileSketch(*_aggregate(_bucket(self.values), self.counts), exact=False)
+
+    def __add__(self, other: "QuantileSketch") -> "QuantileSketch":
+        left, right = (self, other) if self.exact == other.exact else (self.bucketed(), other.bucketed())
+        values, counts = _aggregate(np.concatenate([left.values, right.values]),
+                                    np.concatenate([left.counts, right.counts]))
+        return QuantileSketch(values, counts, left.exact)._bounded()
+
+    # Quantile with linear interpolation between values, as pandas does
+    def quantile(self, q: float) -> float:
+        if not len(self.values):
+            return float("nan")
+        return summary._quantile(self.values, np.cumsum(self.counts), q)
+
+
+# Profile of one column
+@dataclass
+class ColumnProfile:
+    dtype: str
+    count: int = 0
+    nulls: int = 0
+    # Numeric columns only (sketch is None otherwise)
+    minimum: float = math.nan
+    maximum: float = math.nan
+    mean: float = 0.0
+    m2: float = 0.0
+    sketch: QuantileSketch | None = None
+
+    @property
+    def numeric(self) -> bool:
+        return self.sketch is not None
+
+    @classmethod
+    def from_array(cls, array: pa.ChunkedArray) -> "ColumnProfile":
+        if pa.types.is_dictionary(array.type):
+            array = pa.chunked_array([chunk.dictionary_decode() for chunk in array.chunks],
+                                     array.type.value_type)
+        profile = cls(_type_name(array.type), count=len(array) - array.null_count, nulls=array.null_count)
+        if pa.types.is_integer(array.type) or pa.types.is_floating(array.type):
+            values = pc.drop_null(array).to_numpy().astype(np.float64, copy=False)
+            profile.sketch = QuantileSketch.from_values(values)
+            if len(values):
+                profile.minimum, profile.maximum = float(values.min()), float(values.max())
+                profile.mean = float(values.mean())
+                profile.m2 = float(np.square(values - profile.mean).sum())
+        return profile
+
+    def __add__(self, other: "ColumnProfile") -> "ColumnProfile":
+        count = self.count + other.count
+        merged = ColumnProfile(self.dtype, count, self.nulls + other.nulls)
+        if self.sketch is None or other.sketch is None:
+            return merged
+        merged.sketch = self.sketch + other.sketch
+        merged.minimum = float(np.fmin(self.minimum, other.minimum))
+        merged.maximum = float(np.fmax(self.maximum, other.maximum))
+        if count:
+            delta = other.mean - self.mean
+            merged.mean = self.mean + delta * other.count / count
+            merged.m2 = self.m2 + other.m2 + delta * delta * self.count * other.count / count
+        return merged
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    # count/mean/std/min/quartiles/max, as DataFrame.describe() reports them
+    def describe(self) -> pd.Series:
+        statistics = {"count": float(self.count), "mean": self.mean if self.count else math.nan, "std": self.std,
+                      "min": self.minimum}
+        statistics.update({f"{q:.0%}": self.sketch.quantile(q) for q in QUANTILES})
+        statistics["max"] = self.maximum
+        return pd.Series(statistics)
+
+    def to_dict(self) -> dict:
+        values = {"dtype": self.dtype, "count": self.count, "nulls": self.nulls}
+        if self.sketch is not None:
+            values.update(minimum=_json_float(self.minimum), maximum=_json_float(self.maximum), mean=self.mean,
+                          m2=self.m2, exact=self.sketch.exact, values=self.sketch.values.tolist(),
+                          counts=self.sketch.counts.tolist())
+        return values
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "ColumnProfile":
+        profile = cls(_stored_type_name(values["dtype"]), values["count"], values["nulls"])
+        if "values" in values:
+            profile.minimum = math.nan if values["minimum"] is None else values["minimum"]
+            profile.maximum = math.nan if values["maximum"] is None else values["maximum"]
+            profile.mean, profile.m2 = values["mean"], values["m2"]
+            profile.sketch = QuantileSketch(np.array(values["values"], dtype=np.float64),
+                                            np.array(values["counts"], dtype=np.int64), values["exact"])
+        return profile
+
+
+# Profile of a table; combine with + to profile more rows
+@dataclass
+class Profile:
+    rows: int = 0
+    columns: dict[str, ColumnProfile] = field(default_factory=dict)
+    # Content hash of the file this profile was built from
+    digest: str = ""
+
+    @classmethod
+    def from_table(cls, table: pa.Table) -> "Profile":
+        return cls(table.num_rows, {name: ColumnProfile.from_array(table.column(name))
+                                    for name in table.column_names})
+
+    def __add__(self, other: "Profile") -> "Profile":
+        columns = dict(self.columns)
+        for name, column in other.columns.items():
+            columns[name] = columns[name] + column if name in columns else column
+        return Profile(self.rows + other.rows, columns, other.digest or self.digest)
+
+    # Column overview like DataFrame.info(): non-null count and type per column
+    def info(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "Non-Null Count": [column.count for column in self.columns.values()],
+            "Dtype": [column.dtype for column in self.columns.values()],
+        }, index=list(self.columns))
+
+    # Null count per column, as in Summary
+    @property
+    def nulls(self) -> dict[str, int]:
+        return {name: column.nulls for name, column in self.columns.items()}
+
+    # Descriptive statistics of the numeric columns like DataFrame.describe()
+    # Quartiles are exact for columns with few distinct values, approximate otherwise
+    def describe(self) -> pd.DataFrame:
+        return pd.DataFrame({name: column.describe() for name, column in self.columns.items()
+                             if column.numeric and column.count})
+
+    # Columns whose quartiles come from buckets rather than exact values
+    def approximate_columns(self) -> list[str]:
+        return [name for name, column in self.columns.items() if column.numeric and not column.sketch.exact]
+
+    def to_dict(self) -> dict:
+        return {"rows": self.rows, "columns": {name: column.to_dict() for name, column in self.columns.items()},
+                "digest": self.digest}
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "Profile":
+        return cls(values["rows"], {name: ColumnProfile.from_dict(column) for name, column in values["columns"].items()},
+                   values["digest"])
+
+
+# Name of a column's type as read from the CSV, whatever the storage (the cache
+# narrows integers to uint8/uint32... and dictionary-encodes strings), so the
+# cache and the CSV give the same profile
+def _type_name(data_type: pa.DataType) -> str:
+    if pa.types.is_integer(data_type):
+        return "int64"
+    if pa.types.is_floating(data_type):
+        return "double"
+    if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+        return "string"
+    return str(data_type)
+
+
+# The same for a type name stored in a profile file
+def _stored_type_name(name: str) -> str:
+    try:
+        return _type_name(pa.type_for_alias(name))
+    except ValueError:
+        return name
+
+
+def _json_float(value: float) -> float | None:
+    return None if math.isnan(value) else value
+
+
+# Location of the profile file for a CSV file (data/data.csv -> data/data.profile.json)
+def profile_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + PROFILE_EXTENSION
+
+
+#################################################
+### CHUNKS
+#################################################
+# Add hop_count and transit_as when a CSV chunk only has Path (as the cache does)
+def _with_derived_columns(table: pa.Table) -> pa.Table:
+    if "Path" not in table.column_names or {"hop_count", "transit_as"} <= set(table.column_names):
+        return table
+    derived = aspath.add_derived_columns(pd.DataFrame({"Path": table.column("Path").to_pandas()}))
+    for column in ("hop_count", "transit_as"):
+        if column not in table.column_names:
+            table = table.append_column(column, pa.Array.from_pandas(derived[column]))
+    return table
+
+
+# Profile rows [start, stop) of the columnar cache, BATCH_ROWS at a time
+def profile_cache_rows(path: str, start: int, stop: int) -> Profile:
+    table = feather.read_table(path, memory_map=True)
+    profile = Profile()
+    for batch_start in range(start, stop, BATCH_ROWS):
+        profile = profile + Profile.from_table(table.slice(batch_start, min(BATCH_ROWS, stop - batch_start)))
+    return profile
+
+
+# Profile one byte range of a CSV (whole lines after the header)
+def profile_csv_range(csv_path: str, start: int, end: int, names: list[str]) -> Profile:
+    with open(csv_path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    table = pa_csv.read_csv(
+        pa.py_buffer(data),
+        read_options=pa_csv.ReadOptions(column_names=names),
+        convert_options=pa_csv.ConvertOptions(column_types={name: CSV_TYPES[name] for name in names if name in CSV_TYPES},
+                                              strings_can_be_null=True),
+    )
+    return Profile.from_table(_with_derived_columns(table))
+
+
+# Byte ranges of whole lines after the header, about RANGE_BYTES each (at least `parts`)
+def split_csv(csv_path: str, parts: int = 1) -> tuple[list[str], list[tuple[int, int]]]:
+    size = os.path.getsize(csv_path)
+    with open(csv_path, "rb") as file:
+        header = file.readline()
+        starts = [file.tell()]
+        parts = max(parts, math.ceil((size - starts[0]) / RANGE_BYTES), 1)
+        for part in range(1, parts):
+            file.seek(max(starts[0] + (size - starts[0]) * part // parts, starts[-1]))
+            file.readline()
+            position = file.tell()
+            if starts[-1] < position < size:
+                starts.append(position)
+    names = header.decode("utf-8").strip().split(",")
+    return names, [(start, end) for start, end in zip(starts, starts[1:] + [size]) if start < end]
+
+
+# Profiling tasks as (function, *args): row ranges of the cache when it is fresh,
+# otherwise byte ranges of the CSV
+def tasks(csv_path: str, parts: int = 1) -> list[tuple]:
+    if cache.is_fresh(csv_path):
+        path = cache.cache_path(csv_path)
+        rows = feather.read_table(path, memory_map=True).num_rows
+        step = max(1, min(BATCH_ROWS, math.ceil(rows / parts)))
+        return [(profile_cache_rows, path, start, min(start + step, rows)) for start in range(0, rows, step)]
+    names, ranges = split_csv(csv_path, parts)
+    return [(profile_csv_range, csv_path, start, end, names) for start, end in ranges]
+
+
+# Profile a route CSV in one pass, on `workers` processes when above 1
+# At most two tasks per worker are in flight, and each task profiles a bounded
+# number of rows, so memory doesn't grow with the table
+def build(csv_path: str, digest: str = "", workers: int = 1) -> Profile:
+    profile = Profile()
+    work = tasks(csv_path, workers)
+    if workers <= 1 or len(work) == 1:
+        for function, *args in work:
+            profile = profile + function(*args)
+    else:
+        with pools.process_pool(workers) as pool:
+            pending = collections.deque()
+            for task in work:
+                pending.append(pool.submit(*task))
+                if len(pending) >= 2 * workers:
+                    profile = profile + pending.popleft().result()
+            while pending:
+                profile = profile + pending.popleft().result()
+    profile.digest = digest
+    return profile
+
+
+# Read a profile file, or None if it is missing or unreadable
+def read(path: str) -> Profile | None:
+    try:
+        with open(path, "r") as file:
+            return Profile.from_dict(json.load(file))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# Write a profile file (moved in place so readers never see a partial file)
+def write(profile: Profile, path: str) -> None:
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w") as file:
+        json.dump(profile.to_dict(), file)
+    os.replace(temporary_path, path)
+
+
+def main(argv: list[str] | None = None) -> None:
+    argument_parser = argparse.ArgumentParser(description="Profile the columns of route CSV files")
+    argument_parser.add_argument("files", nargs="+", help="CSV files, e.g. data/data.csv")
+    argument_parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes (1 = serial)")
+    args = argument_parser.parse_args(argv)
+
+    for csv_path in args.files:
+        start = time.perf_counter()
+        profile = build(csv_path, cache.file_digest(csv_path), args.workers)
+        write(profile, profile_path(csv_path))
+        print(f"{csv_path} -> {profile_path(csv_path)} ({profile.rows:,} rows) in {time.perf_counter() - start:.2f}s")
+        print(profile.describe().to_string())
+
+
+if __name__ == "__main__":
+    main()
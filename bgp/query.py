@@ -0,0 +1,77 @@
+# Filtered, paged access to a loaded route table
+#
+# Filters are evaluated on the columnar data the dataset already holds: the packed
+# Network arrays for family and prefix length, categorical codes for NextHop and
+# transit_as, and the NumPy values of LocPrf. The family filter narrows the scan
+# to that family's row slice (rows are ordered by family), and the other
+# predicates run only inside it. A query yields row positions; a page is then
+# materialized from those positions only, so no step copies or sends the full
+# table.
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bgp import prefix
+
+# Rows per page offered by the raw data view
+PAGE_SIZES = [50, 100, 500, 1000]
+
+
+# Filter on the route table; empty tuples and None mean "any"
+# Frozen so it can key the cache of matching rows
+@dataclass(frozen=True)
+class RouteFilter:
+    family: int | None = None
+    transit_as: tuple[int, ...] = ()
+    next_hops: tuple[str, ...] = ()
+    min_length: int = 0
+    max_length: int = 128
+    min_locprf: int | None = None
+    max_locprf: int | None = None
+
+
+# Rows of a categorical (or plain) column whose value is one of `values`
+def _isin(column: pd.Series, values: tuple) -> np.ndarray:
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Compare the small integer codes instead of the values
+        categories = column.cat.categories
+        if pd.api.types.is_integer_dtype(categories.dtype):
+            values = tuple(int(value) for value in values)
+        codes = categories.get_indexer(list(values))
+        return np.isin(column.cat.codes.to_numpy(), codes[codes >= 0])
+    return column.isin(values).to_numpy(dtype=bool, na_value=False)
+
+
+# Positions of the rows matching the filter, in table order
+# `family_rows` maps a family to its (start, end) row slice
+def matching_rows(frame: pd.DataFrame, networks: prefix.PackedAddresses,
+                  family_rows: dict[int, tuple[int, int]], route_filter: RouteFilter) -> np.ndarray:
+    start, end = family_rows.get(route_filter.family, (0, len(frame)))
+    part = frame.iloc[start:end]
+    selected = np.ones(end - start, dtype=bool)
+
+    if route_filter.min_length > 0 or route_filter.max_length < 128:
+        length = networks.length[start:end]
+        selected &= (length >= route_filter.min_length) & (length <= route_filter.max_length)
+    if route_filter.transit_as:
+        selected &= _isin(part["transit_as"], route_filter.transit_as)
+    if route_filter.next_hops:
+        selected &= _isin(part["NextHop"], route_filter.next_hops)
+    if route_filter.min_locprf is not None or route_filter.max_locprf is not None:
+        locprf = part["LocPrf"].to_numpy(dtype=np.float64, na_value=np.nan)
+        if route_filter.min_locprf is not None:
+            selected &= locprf >= route_filter.min_locprf
+        if route_filter.max_locprf is not None:
+            selected &= locprf <= route_filter.max_locprf
+    return np.flatnonzero(selected) + start
+
+
+# One page of the matching rows, copied out of the shared frame
+def page(frame: pd.DataFrame, rows: np.ndarray, number: int, size: int) -> pd.DataFrame:
+    return frame.iloc[rows[number * size:(number + 1) * size]]
+
+
+# Number of pages needed for `count` rows (at least one, so an empty result has a page)
+def page_count(count: int, size: int) -> int:
+    return max(1, -(-count // size))
@@ -0,0 +1,305 @@
+# Snapshot-aware ingest: store each RIB dump as the changes since the previous one
+#
+# Usage:
+#   python -m bgp.snapshot typescript.IPV4.RR.txt typescript.IPV6.RR.txt --database data/routes.db
+#
+# Every run records a snapshot (one dump, possibly split over several files). Its
+# routes are joined with the current table on route_key (a hash of the Network
+# and NextHop of the path, see bgp.ingest): keys only in the dump are added, keys
+# only in the table are withdrawn, and keys in both whose attribute hash differs
+# (Metric, LocPrf, Weight, Path) are changed. A path moving to another next hop is
+# a withdrawal and an addition. Only those rows are written: to route_changes, and applied to the
+# current ipv4_ipv6 table. The first snapshot is stored as all additions (the
+# base), so any snapshot's table can be rebuilt from base + deltas
+# (rebuild_current). Routes already in ipv4_ipv6 without a snapshot (loaded by
+# bgp.ingest) are only replaced by the base snapshot when asked to (--replace).
+import argparse
+import datetime
+import sqlite3
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bgp import ingest, parser
+
+CHANGES_TABLE = "route_changes"
+SNAPSHOTS_TABLE = "snapshots"
+
+# Change types
+ADD = "add"
+WITHDRAW = "withdraw"
+CHANGE = "change"
+
+# Rows deleted per executemany batch
+DELETE_BATCH_ROWS = 10_000
+
+# Route keys per SELECT ... IN (...) query (below SQLite's parameter limit)
+SELECT_BATCH_KEYS = 500
+
+CREATE_SNAPSHOTS_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {SNAPSHOTS_TABLE} (
+    snapshot_id INTEGER PRIMARY KEY,
+    taken_at TEXT,
+    source TEXT,
+    routes INTEGER,
+    added INTEGER,
+    withdrawn INTEGER,
+    changed INTEGER
+)
+"""
+
+# Changed and added rows hold the new route; withdrawn rows hold the old one
+CREATE_CHANGES_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+    snapshot_id INTEGER,
+    change_type VARCHAR(8),
+    Network TEXT,
+    NextHop TEXT,
+    Metric INTEGER,
+    LocPrf INTEGER,
+    Weight INTEGER,
+    Path TEXT,
+    family INTEGER,
+    prefix_length INTEGER,
+    hop_count INTEGER,
+    transit_as INTEGER,
+    route_key INTEGER,
+    attributes INTEGER
+)
+"""
+
+CHANGES_INDEXES = {
+    f"{CHANGES_TABLE}_snapshot": "snapshot_id, change_type",
+    f"{CHANGES_TABLE}_route_key": "route_key, snapshot_id",
+}
+
+# Columns of a route row, as stored in ipv4_ipv6 and route_changes
+ROUTE_COLUMNS = parser.COLUMNS + ingest.DERIVED_COLUMNS
+
+
+# Result of ingesting one snapshot
+@dataclass
+class SnapshotStats:
+    snapshot_id: int
+    routes: int = 0
+    added: int = 0
+    withdrawn: int = 0
+    changed: int = 0
+    dropped: int = 0
+    seconds: float = 0.0
+
+    # Share of the snapshot's routes that had to be written
+    @property
+    def written_fraction(self) -> float:
+        return (self.added + self.withdrawn + self.changed) / self.routes if self.routes else 0.0
+
+    def __str__(self) -> str:
+        dropped = f", {self.dropped} routes ingested without snapshots dropped" if self.dropped else ""
+        return (f"snapshot {self.snapshot_id}: {self.routes} routes, {self.added} added, {self.withdrawn} withdrawn, "
+                f"{self.changed} changed ({self.written_fraction:.1%} written){dropped} in {self.seconds:.2f}s")
+
+
+# Open the local SQLite database with the route and snapshot tables
+def connect_sqlite(database: str = ingest.DEFAULT_DATABASE):
+    connection = ingest.connect_sqlite(database)
+    create_tables(connection)
+    return connection
+
+
+# Create the snapshot tables (for connections not opened by connect_sqlite, e.g.
+# MySQL, whose routes table is prepared by ingest.prepare_mysql)
+def create_tables(connection) -> None:
+    sqlite = isinstance(connection, sqlite3.Connection)
+    cursor = connection.cursor()
+    try:
+        for statement in [CREATE_SNAPSHOTS_TABLE, CREATE_CHANGES_TABLE]:
+            cursor.execute(statement)
+        if sqlite:
+            for name, columns in CHANGES_INDEXES.items():
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {CHANGES_TABLE} ({columns})")
+    finally:
+        cursor.close()
+    if not sqlite:
+        ingest.create_mysql_indexes(connection, CHANGES_TABLE, CHANGES_INDEXES)
+    connection.commit()
+
+
+def _fetch_all(connection, sql: str, parameters: tuple = ()) -> list[tuple]:
+    cursor = connection.cursor()
+    try:
+        cursor.execute(sql, parameters)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _execute(connection, sql: str, parameters: tuple = ()) -> None:
+    cursor = connection.cursor()
+    try:
+        cursor.execute(sql, parameters)
+    finally:
+        cursor.close()
+
+
+# Parse a dump into one frame, with path positions counted over the whole dump
+def read_dump(file_names: list[str], workers: int = 1) -> pd.DataFrame:
+    frames = list(ingest.iter_files(file_names, workers))
+    frame = pd.concat(frames, ignore_index=True) if frames else parser.empty_frame()
+    return frame.assign(path_ordinal=ingest.path_ordinals(frame)[0])
+
+
+# Compare a dump with the current table
+# Returns the added and changed rows of the dump (with a "change_type" column) and
+# the withdrawn rows of the table
+def diff(connection, frame: pd.DataFrame, table: str = ingest.TABLE) -> tuple[pd.DataFrame, pd.DataFrame]:
+    route_key, attributes = ingest.route_hashes(frame, frame["path_ordinal"].to_numpy())
+    current = pd.DataFrame(_fetch_all(connection, f"SELECT route_key, attributes FROM {table}"),
+                           columns=["route_key", "attributes"], dtype=np.int64).drop_duplicates("route_key")
+
+    # Hash join on route_key: position of each dump row in the current table
+    positions = pd.Index(current["route_key"]).get_indexer(route_key)
+    found = positions >= 0
+    changed = np.zeros(len(frame), dtype=bool)
+    changed[found] = current["attributes"].to_numpy()[positions[found]] != attributes[found]
+    withdrawn = np.ones(len(current), dtype=bool)
+    withdrawn[positions[found]] = False
+
+    updates = frame[~found | changed].assign(change_type=np.where(found, CHANGE, ADD)[~found | changed])
+    withdrawn_keys = tuple(current["route_key"].to_numpy()[withdrawn].tolist())
+    withdrawals = _rows_by_key(connection, withdrawn_keys, table)
+    return updates, withdrawals
+
+
+# Rows of the table with the given route keys
+def _rows_by_key(connection, keys: tuple[int, ...], table: str) -> pd.DataFrame:
+    rows = []
+    marker = ingest.placeholder(connection)
+    for start in range(0, len(keys), SELECT_BATCH_KEYS):
+        batch = keys[start:start + SELECT_BATCH_KEYS]
+        rows += _fetch_all(connection, f"SELECT {', '.join(ROUTE_COLUMNS)} FROM {table} "
+                                       f"WHERE route_key IN ({', '.join([marker] * len(batch))})", batch)
+    return pd.DataFrame(rows, columns=ROUTE_COLUMNS)
+
+
+# Delete the rows with the given route keys from a table
+def _delete_keys(connection, keys: np.ndarray, table: str) -> None:
+    cursor = connection.cursor()
+    try:
+        sql = f"DELETE FROM {table} WHERE route_key = {ingest.placeholder(connection)}"
+        for start in range(0, len(keys), DELETE_BATCH_ROWS):
+            cursor.executemany(sql, [(int(key),) for key in keys[start:start + DELETE_BATCH_ROWS]])
+    finally:
+        cursor.close()
+
+
+# Write rows with their change type to route_changes
+def _insert_changes(connection, snapshot_id: int, change: pd.Series, rows: pd.DataFrame) -> None:
+    if not len(rows):
+        return
+    values = rows[ROUTE_COLUMNS].astype(object)
+    values = values.where(values.notna(), None)
+    values.insert(0, "change_type", change.to_numpy())
+    values.insert(0, "snapshot_id", snapshot_id)
+    columns = ["snapshot_id", "change_type"] + ROUTE_COLUMNS
+    placeholders = ", ".join([ingest.placeholder(connection)] * len(columns))
+    cursor = connection.cursor()
+    try:
+        cursor.executemany(f"INSERT INTO {CHANGES_TABLE} ({', '.join(columns)}) VALUES ({placeholders})",
+                           list(values.itertuples(index=False, name=None)))
+    finally:
+        cursor.close()
+
+
+# Ingest one dump as a new snapshot, writing only its changes
+# The base snapshot holds every route, so routes ingested without snapshots are
+# dropped first; that is refused unless `replace` is set or there are none.
+def ingest_snapshot(file_names: list[str], connection, taken_at: str | None = None,
+                    workers: int = 1, replace: bool = False) -> SnapshotStats:
+    start = time.perf_counter()
+    snapshot_id = int(_fetch_all(connection, f"SELECT COALESCE(MAX(snapshot_id), 0) + 1 FROM {SNAPSHOTS_TABLE}")[0][0])
+    dropped = 0
+    if snapshot_id == 1:
+        dropped = int(_fetch_all(connection, f"SELECT COUNT(*) FROM {ingest.TABLE}")[0][0])
+        if dropped and not replace:
+            raise ValueError(f"{ingest.TABLE} holds {dropped} routes ingested without snapshots; "
+                             f"the base snapshot would drop them (use --replace)")
+    frame = read_dump(file_names, workers)
+    if dropped:
+        _execute(connection, f"DELETE FROM {ingest.TABLE}")
+    updates, withdrawals = diff(connection, frame)
+    stats = SnapshotStats(snapshot_id, routes=len(frame), added=int((updates["change_type"] == ADD).sum()),
+                          withdrawn=len(withdrawals), changed=int((updates["change_type"] == CHANGE).sum()),
+                          dropped=dropped)
+
+    # Record the deltas (the hashes are among the derived columns)
+    derived = ingest.derived_columns(updates) if len(updates) else pd.DataFrame(columns=ingest.DERIVED_COLUMNS)
+    _insert_changes(connection, snapshot_id, updates["change_type"], pd.concat([updates, derived], axis=1))
+    _insert_changes(connection, snapshot_id, pd.Series(WITHDRAW, index=withdrawals.index), withdrawals)
+
+    # Apply them to the current table
+    changed_keys = derived.loc[(updates["change_type"] == CHANGE).to_numpy(), "route_key"].to_numpy() \
+        if len(updates) else np.zeros(0, dtype=np.int64)
+    _delete_keys(connection, np.concatenate([withdrawals["route_key"].to_numpy(dtype=np.int64), changed_keys]),
+                 ingest.TABLE)
+    if len(updates):
+        ingest.insert_routes(connection, updates)
+
+    marker = ingest.placeholder(connection)
+    _execute(connection, f"INSERT INTO {SNAPSHOTS_TABLE} (snapshot_id, taken_at, source, routes, added, withdrawn, "
+                         f"changed) VALUES ({', '.join([marker] * 7)})",
+             (snapshot_id, taken_at or datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+              ", ".join(file_names), stats.routes, stats.added, stats.withdrawn, stats.changed))
+    connection.commit()
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+# Rebuild the current table as of a snapshot (the latest by default) from the
+# base snapshot and the deltas: the last change of every route key up to that
+# snapshot, unless it is a withdrawal
+def rebuild_current(connection, snapshot_id: int | None = None, table: str = ingest.TABLE) -> int:
+    if snapshot_id is None:
+        snapshot_id = int(_fetch_all(connection, f"SELECT COALESCE(MAX(snapshot_id), 0) FROM {SNAPSHOTS_TABLE}")[0][0])
+    marker = ingest.placeholder(connection)
+    _execute(connection, f"DELETE FROM {table}")
+    _execute(connection, f"""
+        INSERT INTO {table} ({', '.join(ROUTE_COLUMNS)})
+        SELECT {', '.join(ROUTE_COLUMNS)} FROM {CHANGES_TABLE} latest
+        WHERE latest.snapshot_id = (
+            SELECT MAX(snapshot_id) FROM {CHANGES_TABLE}
+            WHERE route_key = latest.route_key AND snapshot_id <= {marker}
+        ) AND latest.change_type <> {marker}
+    """, (snapshot_id, WITHDRAW))
+    connection.commit()
+    return int(_fetch_all(connection, f"SELECT COUNT(*) FROM {table}")[0][0])
+
+
+def main(argv: list[str] | None = None) -> None:
+    argument_parser = argparse.ArgumentParser(description="Ingest a RIB dump as a snapshot of changes")
+    argument_parser.add_argument("files", nargs="*", help="show ip bgp output files (.RR) or MRT RIB dumps of one dump")
+    argument_parser.add_argument("--database", default=ingest.DEFAULT_DATABASE, help="SQLite database file")
+    argument_parser.add_argument("--taken-at", help="time of the dump (ISO 8601, default now)")
+    argument_parser.add_argument("--workers", type=int, default=1, help="parser processes (1 = serial)")
+    argument_parser.add_argument("--rebuild", type=int, nargs="?", const=0, metavar="SNAPSHOT",
+                                 help="rebuild ipv4_ipv6 from the deltas (as of SNAPSHOT, default the latest)")
+    argument_parser.add_argument("--replace", action="store_true",
+                                 help="let the first snapshot drop routes ingested without snapshots")
+    args = argument_parser.parse_args(argv)
+
+    connection = connect_sqlite(args.database)
+    try:
+        if args.rebuild is not None:
+            routes = rebuild_current(connection, args.rebuild or None)
+            print(f"{ingest.TABLE} rebuilt with {routes} routes")
+        else:
+            print(ingest_snapshot(args.files, connection, args.taken_at, args.workers, args.replace))
+    except ValueError as error:
+        argument_parser.error(str(error))
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
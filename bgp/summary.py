@@ -0,0 +1,287 @@
+# Precomputed aggregates of the route table
+#
+# Usage (after the CSV is produced; the pages also rebuild it when stale):
+#   python -m bgp.summary data/data.csv
+#
+# A Summary holds everything the analytics page shows: prefix counts by address
+# family and transit_as, prefix length counts, a value histogram of each numeric
+# column (hop_count, LocPrf, ...) and per-column null counts. Histograms are exact
+# and mergeable, so descriptive statistics and quartiles are derived from them,
+# and appending routes only adds the counts of the new rows. The summary is
+# stored as a small JSON file next to the CSV, tagged with the CSV content hash.
+import argparse
+import json
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from bgp import aspath, cache, prefix
+
+# Extension of the summary file written next to the CSV
+SUMMARY_EXTENSION = ".summary.json"
+
+# Numeric columns whose value histograms are kept
+VALUE_COLUMNS = ["Metric", "LocPrf", "Weight", "hop_count", "transit_as"]
+
+# Rows summarized at a time when building from the columnar cache
+BATCH_ROWS = 1_000_000
+
+
+# Location of the summary file for a CSV file (data/data.csv -> data/data.summary.json)
+def summary_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + SUMMARY_EXTENSION
+
+
+# Add two count Series, aligning on their index
+def _add_counts(left: pd.Series, right: pd.Series) -> pd.Series:
+    if left.empty:
+        return right
+    if right.empty:
+        return left
+    return left.add(right, fill_value=0).astype(np.int64)
+
+
+# Aggregates of a route table; combine with + to summarize appended rows
+@dataclass
+class Summary:
+    rows: int = 0
+    dtypes: dict[str, str] = field(default_factory=dict)
+    nulls: dict[str, int] = field(default_factory=dict)
+    # Prefix count per (family, transit_as); transit_as -1 for missing values
+    groups: pd.Series = field(default_factory=lambda: pd.Series(dtype=np.int64))
+    # Prefix count per (family, prefix length)
+    prefix_lengths: pd.Series = field(default_factory=lambda: pd.Series(dtype=np.int64))
+    # Count per value of each numeric column (nulls excluded)
+    values: dict[str, pd.Series] = field(default_factory=dict)
+    # Content hash of the file this summary was built from
+    digest: str = ""
+
+    # Summarize one chunk of rows
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "Summary":
+        summary = cls(rows=len(frame), dtypes={column: str(dtype) for column, dtype in frame.dtypes.items()})
+        summary.nulls = {column: int(count) for column, count in frame.isnull().sum().items()}
+
+        if "Network" in frame:
+            networks = prefix.pack(frame["Network"])
+            family = pd.Series(networks.family, name="family")
+            if "transit_as" in frame:
+                transit_as = pd.Series(_to_int(frame["transit_as"]), name="transit_as")
+                summary.groups = pd.concat([family, transit_as], axis=1).value_counts()
+            summary.prefix_lengths = pd.concat(
+                [family, pd.Series(networks.length, name="length")], axis=1).value_counts()
+
+        for column in VALUE_COLUMNS:
+            if column in frame:
+                values = pd.Series(_to_int(frame[column]))
+                summary.values[column] = values[values >= 0].value_counts()
+        return summary
+
+    def __add__(self, other: "Summary") -> "Summary":
+        values = dict(self.values)
+        for column, counts in other.values.items():
+            values[column] = _add_counts(values[column], counts) if column in values else counts
+        nulls = {column: self.nulls.get(column, 0) + other.nulls.get(column, 0)
+                 for column in {**self.nulls, **other.nulls}}
+        return Summary(
+            rows=self.rows + other.rows,
+            dtypes=self.dtypes or other.dtypes,
+            nulls=nulls,
+            groups=_add_counts(self.groups, other.groups),
+            prefix_lengths=_add_counts(self.prefix_lengths, other.prefix_lengths),
+            values=values,
+            digest=other.digest,
+        )
+
+    # Number of prefixes per family
+    def family_count(self, family: int) -> int:
+        return int(self.length_histogram(family).sum())
+
+    # Family, transit_as and count of each group as arrays, for transit_counts()
+    @cached_property
+    def _group_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        index = self.groups.index
+        return (index.get_level_values("family").to_numpy(),
+                index.get_level_values("transit_as").to_numpy(),
+                self.groups.to_numpy())
+
+    # Number of IPv4 and IPv6 prefixes whose transit_as is in the given set
+    # A sum over the small group table, so any candidate set is answered in
+    # well under a millisecond regardless of the number of routes
+    def transit_counts(self, transit_as_numbers) -> tuple[int, int]:
+        if self.groups.empty:
+            return 0, 0
+        family, transit_as, count = self._group_arrays
+        is_transit = np.isin(transit_as, np.fromiter(transit_as_numbers, dtype=np.int64))
+        return (int(count[is_transit & (family == prefix.IPV4)].sum()),
+                int(count[is_transit & (family == prefix.IPV6)].sum()))
+
+    # Number of prefixes per transit_as, largest first
+    def transit_as_counts(self) -> pd.Series:
+        if self.groups.empty:
+            return pd.Series(dtype=np.int64)
+        counts = self.groups.groupby(level="transit_as").sum()
+        return counts[counts.index >= 0].sort_values(ascending=False)
+
+    # Number of prefixes of each length for one family (index = prefix length)
+    def length_histogram(self, family: int) -> np.ndarray:
+        histogram = np.zeros(prefix.MAX_LENGTH[family] + 1, dtype=np.int64)
+        if not self.prefix_lengths.empty:
+            counts = self.prefix_lengths[self.prefix_lengths.index.get_level_values("family") == family]
+            histogram[counts.index.get_level_values("length").to_numpy()] = counts.to_numpy()
+        return histogram
+
+    # Count of rows for each value of a column, sorted by value
+    def value_counts(self, column: str) -> pd.Series:
+        return self.values.get(column, pd.Series(dtype=np.int64)).sort_index()
+
+    # Column overview like DataFrame.info(): non-null count and dtype per column
+    def info(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "Non-Null Count": [self.rows - self.nulls.get(column, 0) for column in self.dtypes],
+            "Dtype": list(self.dtypes.values()),
+        }, index=list(self.dtypes))
+
+    # Descriptive statistics like DataFrame.describe(), computed from the histograms
+    def describe(self) -> pd.DataFrame:
+        return pd.DataFrame({column: _describe(self.value_counts(column)) for column in self.values
+                             if self.values[column].sum() > 0})
+
+    # Serialize to JSON-compatible data
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "dtypes": self.dtypes,
+            "nulls": self.nulls,
+            "groups": [[int(family), int(asn), int(count)] for (family, asn), count in self.groups.items()],
+            "prefix_lengths": [[int(family), int(length), int(count)]
+                               for (family, length), count in self.prefix_lengths.items()],
+            "values": {column: [[int(value), int(count)] for value, count in counts.items()]
+                       for column, counts in self.values.items()},
+            "digest": self.digest,
+        }
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "Summary":
+        return cls(
+            rows=values["rows"],
+            dtypes=values["dtypes"],
+            nulls=values["nulls"],
+            groups=_counts(values["groups"], ["family", "transit_as"]),
+            prefix_lengths=_counts(values["prefix_lengths"], ["family", "length"]),
+            values={column: pd.Series(dict(map(tuple, counts)), dtype=np.int64)
+                    for column, counts in values["values"].items()},
+            digest=values["digest"],
+        )
+
+
+# Integer values of a column, with -1 for missing values
+def _to_int(column: pd.Series) -> np.ndarray:
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Convert the categories once and index them with the codes
+        categories = _to_int(pd.Series(column.cat.categories))
+        codes = column.cat.codes.to_numpy()
+        return np.where(codes >= 0, categories[codes], -1)
+    return pd.to_numeric(column, errors="coerce").astype("Int64").fillna(-1).to_numpy(dtype=np.int64)
+
+
+# Count Series with a two level index from [[key1, key2, count], ...]
+def _counts(records: list[list[int]], names: list[str]) -> pd.Series:
+    if not records:
+        return pd.Series(dtype=np.int64)
+    frame = pd.DataFrame(records, columns=names + ["count"])
+    return frame.set_index(names)["count"].astype(np.int64)
+
+
+# Quantile with linear interpolation (as pandas does) from a sorted value histogram
+def _quantile(values: np.ndarray, cumulative: np.ndarray, q: float) -> float:
+    position = q * (cumulative[-1] - 1)
+    lower = values[np.searchsorted(cumulative, math.floor(position), side="right")]
+    upper = values[np.searchsorted(cumulative, math.ceil(position), side="right")]
+    return float(lower + (upper - lower) * (position - math.floor(position)))
+
+
+# count/mean/std/min/quartiles/max of a column from its value histogram
+def _describe(counts: pd.Series) -> pd.Series:
+    values = counts.index.to_numpy(dtype=np.float64)
+    weights = counts.to_numpy(dtype=np.float64)
+    total = weights.sum()
+    mean = (values * weights).sum() / total
+    std = math.sqrt((weights * (values - mean) ** 2).sum() / (total - 1)) if total > 1 else float("nan")
+    cumulative = np.cumsum(counts.to_numpy())
+    return pd.Series({
+        "count": total,
+        "mean": mean,
+        "std": std,
+        "min": values[0],
+        "25%": _quantile(values, cumulative, 0.25),
+        "50%": _quantile(values, cumulative, 0.5),
+        "75%": _quantile(values, cumulative, 0.75),
+        "max": values[-1],
+    })
+
+
+# Summarize a route CSV chunk by chunk from its columnar cache
+def build(csv_path: str, digest: str = "") -> Summary:
+    summary = Summary()
+    for frame in cache.iter_table(csv_path, BATCH_ROWS):
+        summary = summary + Summary.from_frame(frame)
+    summary.digest = digest
+    return summary
+
+
+# Read a summary file, or None if it is missing or unreadable
+def read(path: str) -> Summary | None:
+    try:
+        with open(path, "r") as file:
+            return Summary.from_dict(json.load(file))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# Write a summary file (moved in place so readers never see a partial file)
+def write(summary: Summary, path: str) -> None:
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w") as file:
+        json.dump(summary.to_dict(), file)
+    os.replace(temporary_path, path)
+
+
+# Append routes to a route CSV and add their counts to its summary
+# (the summary is rebuilt first if it doesn't match the current CSV)
+# Parser frames get their hop_count/transit_as columns derived from Path first
+def append(csv_path: str, frame: pd.DataFrame) -> Summary:
+    header = pd.read_csv(csv_path, nrows=0).columns
+    frame = aspath.add_derived_columns(frame)
+    missing = [column for column in header if column not in frame]
+    if missing:
+        raise ValueError(f"Routes to append are missing columns: {', '.join(missing)}")
+    path = summary_path(csv_path)
+    current = read(path)
+    if current is None or current.digest != cache.file_digest(csv_path):
+        current = build(csv_path, cache.file_digest(csv_path))
+    frame[list(header)].to_csv(csv_path, mode="a", header=False, index=False)
+    updated = current + Summary.from_frame(frame)
+    updated.digest = cache.file_digest(csv_path)
+    write(updated, path)
+    return updated
+
+
+def main(argv: list[str] | None = None) -> None:
+    argument_parser = argparse.ArgumentParser(description="Build the summary store for route CSV files")
+    argument_parser.add_argument("files", nargs="+", help="CSV files, e.g. data/data.csv")
+    args = argument_parser.parse_args(argv)
+
+    for csv_path in args.files:
+        start = time.perf_counter()
+        write(build(csv_path, cache.file_digest(csv_path)), summary_path(csv_path))
+        print(f"{csv_path} -> {summary_path(csv_path)} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
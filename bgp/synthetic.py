@@ -0,0 +1,310 @@
+# Deterministic synthetic RIB dumps at full-table scale
+#
+# Usage:
+#   python -m bgp.synthetic --routes 1000000 --rr data/synthetic.RR --csv data/data.csv
+#
+# Routes are drawn from fixed distributions close to a border router's view of
+# the Internet table: the prefix length mix of each family (weights from the
+# public IPv4/IPv6 tables), AS paths of 1 to 8 ASes with prepending and rare
+# AS_SETs, most routes learned from the six transit providers of
+# data/transitASN.txt and the rest from a few peers, and Zipf-distributed origin
+# ASes. LocPrf follows the provider type and Metric is set on part of the routes,
+# and some prefixes have a second path through another provider.
+#
+# Every chunk of routes is drawn from its own generator seeded with (seed, chunk
+# number), so the same arguments always write the same bytes, and chunks are
+# written as they are drawn: 10M routes need no more memory than 1M. Networks of
+# one prefix length never repeat: the k-th network of a length is an affine
+# permutation of k over that length's address space.
+import argparse
+import time
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from bgp import aspath
+
+# Routes per generated chunk (part of the output's definition: changing it
+# changes the generated routes)
+CHUNK_ROUTES = 1_000_000
+
+# Share of IPv4 routes; IPv4 routes come first, then IPv6 as in two dump files
+IPV4_SHARE = 0.82
+
+# Relative number of prefixes per length
+IPV4_LENGTH_WEIGHTS = {
+    8: 15, 9: 15, 10: 40, 11: 100, 12: 300, 13: 600, 14: 1_100, 15: 2_000, 16: 13_000, 17: 8_000,
+    18: 14_000, 19: 26_000, 20: 45_000, 21: 55_000, 22: 120_000, 23: 100_000, 24: 560_000,
+}
+IPV6_LENGTH_WEIGHTS = {
+    28: 500, 29: 7_000, 30: 1_000, 31: 500, 32: 25_000, 33: 3_000, 34: 2_000, 35: 1_500, 36: 6_000,
+    38: 2_000, 39: 1_500, 40: 12_000, 41: 1_000, 42: 4_000, 43: 1_000, 44: 15_000, 45: 3_000,
+    46: 5_000, 47: 4_000, 48: 95_000, 56: 300, 64: 300,
+}
+
+# Neighbouring ASes (the transit_as of their routes): share of routes, LocPrf,
+# and the next hop of each family. The first six are the transit providers.
+NEIGHBOURS = [
+    # ASN, share, LocPrf, IPv4 next hop, IPv6 next hop
+    (3356, 0.18, 100, "10.0.0.1", "2001:db8::1"),
+    (174, 0.15, 100, "10.0.0.2", "2001:db8::2"),
+    (1299, 0.14, 100, "10.0.0.3", "2001:db8::3"),
+    (2914, 0.12, 100, "10.0.0.4", "2001:db8::4"),
+    (3257, 0.08, 100, "10.0.0.5", "2001:db8::5"),
+    (6762, 0.06, 100, "10.0.0.6", "2001:db8::6"),
+    (6939, 0.12, 150, "196.201.213.117", "2001:db8:1::1"),
+    (13335, 0.03, 150, "196.201.213.118", "2001:db8:1::2"),
+    (15169, 0.03, 150, "196.201.213.119", "2001:db8:1::3"),
+    (16509, 0.03, 150, "196.201.213.120", "2001:db8:1::4"),
+    (8075, 0.02, 150, "196.201.213.121", "2001:db8:1::5"),
+    (20940, 0.02, 150, "196.201.213.122", "2001:db8:1::6"),
+    (32934, 0.02, 150, "196.201.213.123", "2001:db8:1::7"),
+]
+
+# Share of routes by number of distinct ASes in the path (1 to 8)
+PATH_LENGTH_WEIGHTS = [0.04, 0.22, 0.34, 0.23, 0.10, 0.04, 0.02, 0.01]
+
+# Share of paths prepending their origin 1 to 3 more times, and ending in an AS_SET
+PREPEND_SHARE = 0.08
+AS_SET_SHARE = 0.0005
+
+# Share of prefixes with a second path through another neighbour
+MULTIPATH_SHARE = 0.08
+
+# Share of routes with a Metric, and with a lowered LocPrf (traffic engineering)
+METRIC_SHARE = 0.4
+DEPREFERENCED_SHARE = 0.01
+DEPREFERENCED_LOCPRF = 80
+
+# Share of routes with an incomplete (?) origin instead of IGP (i)
+INCOMPLETE_ORIGIN_SHARE = 0.03
+
+# Sizes of the AS pools: ASes in the middle of paths, and origin ASes (Zipf
+# distributed with ORIGIN_ZIPF)
+MIDDLE_ASES = 400
+ORIGIN_ASES = 80_000
+ORIGIN_ZIPF = 1.2
+
+# Multipliers of the affine permutations of network numbers (odd, and prime to
+# the 223 usable first octets of IPv4)
+IPV4_MULTIPLIER = 2_654_435_761
+IPV6_MULTIPLIER = 11_400_714_819_323_198_485
+
+# Table header written at the top of a .RR file; the columns below line up with it
+RR_HEADER = (
+    "BGP table version is 1, local router ID is 10.0.0.254\n"
+    "Status codes: s suppressed, d damped, h history, * valid, > best, i - internal,\n"
+    "              r RIB-failure, S Stale, m multipath, b backup-path, f RT-Filter,\n"
+    "Origin codes: i - IGP, e - EGP, ? - incomplete\n"
+    "\n"
+    "     Network          Next Hop            Metric LocPrf Weight Path\n"
+)
+
+# Width of the Network and Next Hop columns of a record (status codes included)
+NETWORK_WIDTH = 20
+NEXT_HOP_WIDTH = 21
+
+
+def _weights(values) -> np.ndarray:
+    weights = np.asarray(values, dtype=np.float64)
+    return weights / weights.sum()
+
+
+# Origin and middle AS pools, the same for every chunk of a seed
+# ASNs span the 16 and 32 bit ranges, leaving out the neighbours
+def _as_pools(seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng([seed, 0xA5])
+    candidates = np.setdiff1d(np.arange(1_000, 400_000), [asn for asn, *_ in NEIGHBOURS])
+    pool = rng.choice(candidates, MIDDLE_ASES + ORIGIN_ASES, replace=False)
+    return pool[:MIDDLE_ASES], pool[MIDDLE_ASES:]
+
+
+# k-th networks of an IPv4 prefix length as packed addresses, first octet 1 to 223
+def _ipv4_networks(length: int, k: np.ndarray, seed: int) -> np.ndarray:
+    space = 223 << (length - 8)
+    value = ((IPV4_MULTIPLIER % space) * k.astype(np.uint64) + np.uint64((seed * 7_919 + 12_345) % space)) % np.uint64(space)
+    return (value + np.uint64(1 << (length - 8))) << np.uint64(32 - length)
+
+
+# High 64 bits of the k-th networks of an IPv6 prefix length (<= 64) in 2000::/3
+def _ipv6_networks(length: int, k: np.ndarray, seed: int) -> np.ndarray:
+    mask = np.uint64((1 << (length - 3)) - 1)
+    with np.errstate(over="ignore"):
+        value = (np.uint64(IPV6_MULTIPLIER) * k.astype(np.uint64) + np.uint64(seed * 7_919 + 12_345)) & mask
+    return np.uint64(1 << 61) | (value << np.uint64(64 - length))
+
+
+def _format_ipv4(addresses: np.ndarray, lengths: np.ndarray) -> list[str]:
+    octets = [((addresses >> np.uint64(shift)) & np.uint64(255)).tolist() for shift in (24, 16, 8, 0)]
+    return [f"{a}.{b}.{c}.{d}/{length}" for a, b, c, d, length in zip(*octets, lengths.tolist())]
+
+
+# IPv6 networks whose low 64 bits are zero: the trailing zero groups are the
+# longest zero run, so the canonical text ends in "::"
+def _format_ipv6(high: np.ndarray, lengths: np.ndarray) -> list[str]:
+    groups = [((high >> np.uint64(shift)) & np.uint64(0xFFFF)).tolist() for shift in (48, 32, 16, 0)]
+    networks = []
+    for a, b, c, d, length in zip(*groups, lengths.tolist()):
+        words = [a, b, c, d]
+        while words and not words[-1]:
+            words.pop()
+        networks.append(":".join(f"{word:x}" for word in words) + f"::/{length}")
+    return networks
+
+
+# Draw one chunk of routes
+# `counts` holds the number of networks drawn so far per (family, length) and is
+# updated, so networks stay distinct across chunks
+def _chunk(seed: int, number: int, start: int, end: int, ipv4_routes: int,
+           counts: dict[tuple[int, int], int], pools: tuple[np.ndarray, np.ndarray]) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, number])
+    rows = end - start
+    is_ipv6 = np.arange(start, end) >= ipv4_routes
+
+    # Second paths repeat the prefix of the row above, within one family and chunk
+    extra = rng.random(rows) < MULTIPATH_SHARE
+    extra[0] = False
+    extra[1:] &= is_ipv6[1:] == is_ipv6[:-1]
+    # A prefix has at most one path per neighbour; a longer run starts a new prefix
+    path_number = np.arange(rows) - np.maximum.accumulate(np.where(extra, 0, np.arange(rows)))
+    extra &= path_number % len(NEIGHBOURS) != 0
+    primary = np.flatnonzero(~extra)
+    network_row = np.maximum.accumulate(np.where(extra, 0, np.arange(rows)))
+    path_number = np.arange(rows) - network_row
+
+    # Networks of the primary rows
+    lengths = np.zeros(rows, dtype=np.int64)
+    networks = np.empty(rows, dtype=object)
+    for family_is_ipv6, weights in ((False, IPV4_LENGTH_WEIGHTS), (True, IPV6_LENGTH_WEIGHTS)):
+        family_rows = primary[is_ipv6[primary] == family_is_ipv6]
+        choices = np.array(list(weights))
+        family_lengths = choices[rng.choice(len(choices), len(family_rows), p=_weights(list(weights.values())))]
+        lengths[family_rows] = family_lengths
+        for length in np.unique(family_lengths):
+            length_rows = family_rows[family_lengths == length]
+            key = (6 if family_is_ipv6 else 4, int(length))
+            k = np.arange(counts.get(key, 0), counts.get(key, 0) + len(length_rows))
+            counts[key] = counts.get(key, 0) + len(length_rows)
+            length_array = np.full(len(length_rows), length)
+            if family_is_ipv6:
+                networks[length_rows] = _format_ipv6(_ipv6_networks(int(length), k, seed), length_array)
+            else:
+                networks[length_rows] = _format_ipv4(_ipv4_networks(int(length), k, seed), length_array)
+    networks = networks[network_row]
+
+    # Neighbour of each path; the further paths of a prefix go through the other
+    # neighbours in turn from a random one, so no two paths of a prefix share one
+    neighbour_weights = _weights([share for _, share, *_ in NEIGHBOURS])
+    neighbour = rng.choice(len(NEIGHBOURS), rows, p=neighbour_weights)
+    shift = rng.integers(1, len(NEIGHBOURS), rows)
+    offset = (shift[network_row] + path_number - 2) % (len(NEIGHBOURS) - 1) + 1
+    neighbour[extra] = (neighbour[network_row[extra]] + offset[extra]) % len(NEIGHBOURS)
+    neighbour_asns = np.array([asn for asn, *_ in NEIGHBOURS], dtype=np.int64)
+    transit_as = neighbour_asns[neighbour]
+
+    # AS paths: neighbour, middle ASes, origin (shared by the paths of a prefix),
+    # then the origin prepended
+    middle_pool, origin_pool = pools
+    origin = origin_pool[np.minimum(rng.zipf(ORIGIN_ZIPF, rows), ORIGIN_ASES) - 1][network_row]
+    distinct = 1 + rng.choice(len(PATH_LENGTH_WEIGHTS), rows, p=_weights(PATH_LENGTH_WEIGHTS))
+    last = np.where(distinct >= 2, origin, transit_as)
+    prepends = np.where(rng.random(rows) < PREPEND_SHARE, rng.integers(1, 4, rows), 0)
+    tokens = distinct + prepends
+    offsets = np.zeros(rows + 1, dtype=np.int64)
+    np.cumsum(tokens, out=offsets[1:])
+    token_rows = np.repeat(np.arange(rows), tokens)
+    position = np.arange(offsets[-1]) - offsets[:-1][token_rows]
+    middle = middle_pool[rng.integers(0, len(middle_pool), offsets[-1])]
+    asns = np.where(position == 0, transit_as[token_rows],
+                    np.where(position < distinct[token_rows] - 1, middle, last[token_rows]))
+    path_array = pc.binary_join(pa.ListArray.from_arrays(pa.array(offsets), pa.array(asns).cast(pa.string())), " ")
+    origin_codes = np.where(rng.random(rows) < INCOMPLETE_ORIGIN_SHARE, "?", "i")
+    paths = pc.binary_join_element_wise(path_array, pa.array(origin_codes), " ").to_numpy(zero_copy_only=False)
+    # A few paths end in an AS_SET of aggregated origins
+    for row in np.flatnonzero(rng.random(rows) < AS_SET_SHARE):
+        members = origin_pool[rng.integers(0, ORIGIN_ASES, 2)]
+        body, code = paths[row].rsplit(" ", 1)
+        paths[row] = f"{body} {{{members[0]},{members[1]}}} {code}"
+
+    locprf = np.array([value for _, _, value, *_ in NEIGHBOURS], dtype=np.int64)[neighbour]
+    locprf[rng.random(rows) < DEPREFERENCED_SHARE] = DEPREFERENCED_LOCPRF
+    metric = pd.array(np.where(rng.random(rows) < 0.5, 0, rng.integers(1, 1_000, rows)), dtype="Int64")
+    metric[rng.random(rows) >= METRIC_SHARE] = pd.NA
+    next_hops = np.array([[ipv4, ipv6] for *_, ipv4, ipv6 in NEIGHBOURS], dtype=object)
+
+    return pd.DataFrame({
+        "Network": networks,
+        "NextHop": next_hops[neighbour, is_ipv6.astype(np.int64)],
+        "Metric": metric,
+        "LocPrf": pd.array(locprf, dtype="Int64"),
+        "Weight": pd.array(np.zeros(rows, dtype=np.int64), dtype="Int64"),
+        "Path": paths.astype(object),
+    })
+
+
+# Generate `routes` routes in DataFrame chunks with the columns of bgp.parser
+def iter_routes(routes: int, seed: int = 0) -> Iterator[pd.DataFrame]:
+    ipv4_routes = round(routes * IPV4_SHARE)
+    counts: dict[tuple[int, int], int] = {}
+    pools = _as_pools(seed)
+    for number, start in enumerate(range(0, routes, CHUNK_ROUTES)):
+        yield _chunk(seed, number, start, min(start + CHUNK_ROUTES, routes), ipv4_routes, counts, pools)
+
+
+# Records of a chunk in `show ip bgp` layout, matching RR_HEADER
+# Networks too long for their column go on a line of their own, as the router does
+def rr_lines(frame: pd.DataFrame) -> list[str]:
+    networks = frame["Network"].tolist()
+    first_path = np.r_[True, frame["Network"].to_numpy()[1:] != frame["Network"].to_numpy()[:-1]].tolist()
+    metrics = ["" if pd.isna(value) else str(value) for value in frame["Metric"].tolist()]
+    lines = []
+    for network, best, next_hop, metric, locprf, weight, path in zip(
+            networks, first_path, frame["NextHop"].tolist(), metrics, frame["LocPrf"].tolist(),
+            frame["Weight"].tolist(), frame["Path"].tolist()):
+        start = f"*>i{network}" if best else "* i"
+        if len(start) >= NETWORK_WIDTH:
+            lines.append(start + "\n")
+            start = ""
+        lines.append(f"{start:<{NETWORK_WIDTH}}{next_hop:<{NEXT_HOP_WIDTH}}{metric:>7}{locprf:>7}{weight:>7} {path}\n")
+    return lines
+
+
+# Write routes as a .RR dump and/or a route CSV (with hop_count and transit_as)
+def write(routes: int, rr_path: str | None = None, csv_path: str | None = None, seed: int = 0) -> None:
+    rr_file = open(rr_path, "w") if rr_path else None
+    try:
+        if rr_file:
+            rr_file.write(RR_HEADER)
+        for number, frame in enumerate(iter_routes(routes, seed)):
+            if rr_file:
+                rr_file.writelines(rr_lines(frame))
+            if csv_path:
+                aspath.add_derived_columns(frame).to_csv(csv_path, mode="a" if number else "w",
+                                                         header=not number, index=False)
+        if rr_file:
+            rr_file.write(f"\nTotal number of prefixes {routes}\n")
+    finally:
+        if rr_file:
+            rr_file.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    argument_parser = argparse.ArgumentParser(description="Generate a synthetic full-table RIB dump")
+    argument_parser.add_argument("--routes", type=int, default=1_000_000, help="number of routes, e.g. 100000, 1000000, 10000000")
+    argument_parser.add_argument("--seed", type=int, default=0, help="seed of the generator")
+    argument_parser.add_argument("--rr", help=".RR file to write (show ip bgp output)")
+    argument_parser.add_argument("--csv", help="route CSV to write, e.g. data/data.csv")
+    args = argument_parser.parse_args(argv)
+    if not args.rr and not args.csv:
+        argument_parser.error("give --rr and/or --csv")
+
+    start = time.perf_counter()
+    write(args.routes, args.rr, args.csv, args.seed)
+    print(f"{args.routes} routes written in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ st.logo("./img/round_analytics.png")
 
 # Initialize session state for storing application options
 # This ensures that certain variables persist across page reloads
+# Session state holds only small filter parameters; data is shared by every
+# session through the caches of bgp/data.py
 if "options" not in st.session_state:
     st.session_state.options = None
 
@@ -40,12 +42,44 @@ data_page = st.Page(
     title="Raw Data", 
 )
 
+# Route Lookup page
+# Links to the lookup.py script
+lookup_page = st.Page(
+    "./app/lookup.py",
+    title="Route Lookup",
+)
+
+# AS Paths page
+# Links to the as_paths.py script
+as_paths_page = st.Page(
+    "./app/as_paths.py",
+    title="AS Paths",
+)
+
+# Routing Churn page
+# Links to the churn.py script
+churn_page = st.Page(
+    "./app/churn.py",
+    title="Routing Churn",
+)
+
+# Performance page
+# Links to the admin.py script
+admin_page = st.Page(
+    "./app/admin.py",
+    title="Performance",
+)
+
 # Create navigation menu with defined pages
 # Allows user to switch between different pages of the application
 selected_page = st.navigation([
     analytics_page,   # Analytics Dashboard page
     ai_page,          # AI/ML Implementation page
-    data_page         # Raw Data page
+    data_page,        # Raw Data page
+    lookup_page,      # Route Lookup page
+    as_paths_page,    # AS Paths page
+    churn_page,       # Routing Churn page
+    admin_page        # Performance page
 ])
 
 # Run the selected page
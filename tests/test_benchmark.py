@@ -0,0 +1,34 @@
+# Exit status of `python -m bgp.benchmark --compare`, the regression gate of CI
+import json
+
+import pytest
+
+from bgp import benchmark
+
+
+def _results(medians: dict[str, float]) -> dict:
+    return {"results": {"1000": {stage: {"seconds": [median] * 3, "min": median, "median": median}
+                                 for stage, median in medians.items()}}}
+
+
+def _compare_exit_code(tmp_path, before: dict, after: dict) -> int:
+    paths = []
+    for name, report in (("before.json", before), ("after.json", after)):
+        path = tmp_path / name
+        path.write_text(json.dumps(report))
+        paths.append(str(path))
+    with pytest.raises(SystemExit) as exit_info:
+        benchmark.main(["--compare", *paths])
+    return exit_info.value.code
+
+
+def test_compare_exits_1_when_an_early_stage_regressed(tmp_path):
+    before = _results({"parse": 0.1, "cache_build": 0.1})
+    after = _results({"parse": 0.2, "cache_build": 0.1})
+    assert _compare_exit_code(tmp_path, before, after) == 1
+
+
+def test_compare_exits_0_without_regression(tmp_path):
+    before = _results({"parse": 0.1, "hop_histogram": 0.001})
+    after = _results({"parse": 0.1, "hop_histogram": 0.003})
+    assert _compare_exit_code(tmp_path, before, after) == 0